@@ -0,0 +1,36 @@
+"""
+Django management command to store the structures of split mongo courses in full
+where they would otherwise take many deltas to rebuild, e.g. after lowering
+structure_snapshot_interval.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from xmodule.modulestore.django import modulestore
+from xmodule.modulestore.exceptions import ItemNotFoundError
+from xmodule.modulestore.locator import CourseLocator
+
+
+class Command(BaseCommand):
+    "Rebuild the full snapshots of the structures of courses in the split Mongo datastore"
+
+    help = "Rebuild the full snapshots of the structures of courses in the split Mongo datastore"
+    args = "locator [locator ...]"
+
+    def handle(self, *args, **options):
+        if len(args) < 1:
+            raise CommandError(
+                "compact_split_structures requires at least one argument (locator)"
+            )
+
+        locators = []
+        for arg in args:
+            try:
+                locators.append(CourseLocator(url=arg))
+            except ValueError:
+                raise CommandError("Invalid locator string {}".format(arg))
+
+        for locator in locators:
+            try:
+                count = modulestore('split').compact_structures(locator)
+            except ItemNotFoundError:
+                raise CommandError("No course found with locator {}".format(locator))
+            print("Stored {} structures of {} in full".format(count, locator))
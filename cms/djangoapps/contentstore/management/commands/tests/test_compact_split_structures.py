@@ -0,0 +1,64 @@
+"""
+Unittests for compacting the structures of split mongo courses
+"""
+import unittest
+from StringIO import StringIO
+from mock import patch
+
+from django.core.management import CommandError, call_command
+from django.test.utils import override_settings
+from contentstore.management.commands.compact_split_structures import Command
+from contentstore.tests.modulestore_config import TEST_MODULESTORE
+from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
+from xmodule.modulestore.tests.persistent_factories import PersistentCourseFactory, ItemFactory
+from xmodule.modulestore.django import modulestore
+# pylint: disable=E1101
+
+
+class TestArgParsing(unittest.TestCase):
+    """
+    Tests for parsing arguments for the `compact_split_structures` management command
+    """
+    def setUp(self):
+        self.command = Command()
+
+    def test_no_args(self):
+        errstring = "compact_split_structures requires at least one argument"
+        with self.assertRaisesRegexp(CommandError, errstring):
+            self.command.handle()
+
+    def test_invalid_locator(self):
+        errstring = "Invalid locator string !?!"
+        with self.assertRaisesRegexp(CommandError, errstring):
+            self.command.handle("!?!")
+
+
+@override_settings(MODULESTORE=TEST_MODULESTORE)
+class TestCompactSplitStructures(ModuleStoreTestCase):
+    """
+    Unit tests for compacting the structures of a split-mongo course from command line
+    """
+    def setUp(self):
+        super(TestCompactSplitStructures, self).setUp()
+        self.store = modulestore('split')
+        self.course = PersistentCourseFactory()
+        self.locator = self.course.location.version_agnostic()
+
+    def test_nonexistent_locator(self):
+        errstring = "No course found with locator"
+        with self.assertRaisesRegexp(CommandError, errstring):
+            Command().handle("edx://no.such.course")
+
+    @patch("sys.stdout", new_callable=StringIO)
+    def test_happy_path(self, mock_stdout):
+        with patch.object(self.store, 'structure_snapshot_interval', 10):
+            for _ in range(4):
+                ItemFactory.create(parent_location=self.locator)
+        head = self.store.get_course(self.locator).location.version_guid
+        self.assertIsNotNone(self.store.db_connection.get_structure_delta(head))
+
+        call_command("compact_split_structures", str(self.locator.as_course_locator()))
+
+        self.assertIsNone(self.store.db_connection.get_structure_delta(head))
+        self.assertEqual(len(self.store.get_course(self.locator).children), 4)
+        self.assertIn("Stored 1 structures", mock_stdout.getvalue())
@@ -234,6 +234,10 @@ MIDDLEWARE_CLASSES = (
 # Clickjacking protection can be enabled by setting this to 'DENY'
 X_FRAME_OPTIONS = 'ALLOW'
 
+# Studio reads what it has just written, so it reads from the primary
+# (see DOC_STORE_READ_PREFERENCE in lms/envs/common.py)
+DOC_STORE_READ_PREFERENCE = 'PRIMARY'
+
 ############# XBlock Configuration ##########
 
 # Import after sys.path fixup
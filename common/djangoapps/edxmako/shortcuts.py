@@ -104,6 +104,34 @@ def render_to_string(template_name, dictionary, context=None, namespace='main'):
     return template.render_unicode(**context_dictionary)
 
 
+def compile_template(template_name, namespace='main'):
+    """
+    Returns a function rendering the template `template_name` with a dict, for
+    templates that only use the context they are given, like the capa input
+    type templates.
+
+    Unlike `render_to_string`, the template is only looked up the first time it
+    is rendered, and the dict is passed to it as-is, without the request
+    context, settings or marketing links.  Requests in a microsite still go
+    through `render_to_string`, so that the microsite can override the template.
+    """
+    templates = []
+
+    def render(dictionary):
+        """Renders the compiled template with `dictionary`."""
+        if microsite.is_request_in_microsite():
+            return render_to_string(template_name, dictionary, namespace=namespace)
+        if not templates:
+            templates.append(lookup_template(namespace, template_name))
+        return templates[0].render_unicode(**dictionary)
+
+    return render
+
+# Lets callers that are only given the render function, like capa, compile
+# their templates once.
+render_to_string.compile_template = compile_template
+
+
 def render_to_response(template_name, dictionary=None, context_instance=None, namespace='main', **kwargs):
     """
     Returns a HttpResponse whose content is filled with the result of calling
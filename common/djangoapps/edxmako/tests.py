@@ -2,7 +2,7 @@ from django.test import TestCase
 from django.test.utils import override_settings
 from django.core.urlresolvers import reverse
 from edxmako import add_lookup, LOOKUP
-from edxmako.shortcuts import marketing_link
+from edxmako.shortcuts import marketing_link, compile_template
 from mock import patch
 from util.testing import UrlResetMixin
 
@@ -26,6 +26,16 @@ class ShortcutsTests(UrlResetMixin, TestCase):
             link = marketing_link('ABOUT')
             self.assertEquals(link, expected_link)
 
+    @patch('edxmako.shortcuts.lookup_template')
+    def test_compile_template(self, mock_lookup):
+        mock_lookup.return_value.render_unicode.return_value = u'<div/>'
+        render = compile_template('test.html')
+        self.assertEquals(render({'value': 1}), u'<div/>')
+        self.assertEquals(render({'value': 2}), u'<div/>')
+        # the template is only looked up once, and gets the dict as-is
+        mock_lookup.assert_called_once_with('main', 'test.html')
+        mock_lookup.return_value.render_unicode.assert_called_with(value=2)
+
 
 class AddLookupTests(TestCase):
     """
@@ -9,6 +9,7 @@ from pymongo import MongoClient
 from pymongo.errors import PyMongoError
 
 from track.backends import BaseBackend
+from xmodule.mongo_utils import get_read_preference
 
 
 log = logging.getLogger(__name__)
@@ -29,7 +30,9 @@ class MongoBackend(BaseBackend):
           - `password`: collection user password
           - `database`: name of the database
           - `collection`: name of the collection
-          - `extra`: parameters to pymongo.MongoClient not listed above
+          - `extra`: parameters to pymongo.MongoClient not listed above,
+            e.g. `max_pool_size`, `socketTimeoutMS` or `read_preference`
+            (a pymongo ReadPreference or its name)
 
         """
 
@@ -56,6 +59,10 @@ class MongoBackend(BaseBackend):
         # Make timezone aware by default
         extra['tz_aware'] = extra.get('tz_aware', True)
 
+        # Read preferences can be given by name in the settings
+        if 'read_preference' in extra:
+            extra['read_preference'] = get_read_preference(extra['read_preference'])
+
         # Connect to database and get collection
 
         self.connection = MongoClient(
@@ -10,6 +10,7 @@ import numbers
 import numpy
 import scipy.constants
 import functions
+from lru import LRUCache
 
 from pyparsing import (
     Word, Literal, CaselessLiteral, ZeroOrMore, MatchFirst, Optional, Forward,
@@ -73,6 +74,12 @@ SUFFIXES = {
 }
 
 
+# How many parsed expressions to keep around. FormulaResponse evaluates the
+# same few expressions at many sample points, so even a small cache avoids
+# almost all re-parsing.
+PARSE_CACHE_SIZE = 1000
+
+
 class UndefinedVariable(Exception):
     """
     Indicate when a student inputs a variable which was not expected.
@@ -228,9 +235,8 @@ def evaluator(variables, functions, math_expr, case_sensitive=False):
     if math_expr.strip() == "":
         return float('nan')
 
-    # Parse the tree.
-    math_interpreter = ParseAugmenter(math_expr, case_sensitive)
-    math_interpreter.parse_algebra()
+    # Parse the tree, or reuse a previous parse of the same expression.
+    math_interpreter = parse_expression(math_expr, case_sensitive)
 
     # Get our variables together.
     all_variables, all_functions = add_defaults(variables, functions, case_sensitive)
@@ -238,24 +244,166 @@ def evaluator(variables, functions, math_expr, case_sensitive=False):
     # ...and check them
     math_interpreter.check_variables(all_variables, all_functions)
 
-    # Create a recursion to evaluate the tree.
-    if case_sensitive:
-        casify = lambda x: x
-    else:
-        casify = lambda x: x.lower()  # Lowercase for case insens.
+    return math_interpreter.evaluate(all_variables, all_functions)
+
+
+def evaluator_vectorized(variables_list, functions, math_expr, case_sensitive=False):
+    """
+    Evaluate an expression at many points; return a list of the results.
+
+    `variables_list` is a list of variable dictionaries, as would be passed to
+    `evaluator`, one per point. When every point defines the same numeric
+    variables, the expression is evaluated once over NumPy arrays holding the
+    values for all points. Anything that can't be computed that way (e.g.
+    `fact`, the `||` operator or a floating point error at some point) falls
+    back to calling `evaluator` for each point in turn, so the results and
+    exceptions are always the same as the scalar ones.
+    """
+    def evaluate_each():
+        """The scalar fallback."""
+        return [
+            evaluator(variables, functions, math_expr, case_sensitive)
+            for variables in variables_list
+        ]
+
+    if not variables_list or math_expr.strip() == "":
+        return evaluate_each()
+
+    math_interpreter = parse_expression(math_expr, case_sensitive)
+
+    names = set(variables_list[0])
+    if any(set(variables) != names for variables in variables_list):
+        return evaluate_each()
+    arrays = {}
+    for name in names:
+        values = numpy.array([variables[name] for variables in variables_list])
+        if values.dtype.kind in 'biu':
+            # Integer arrays have different power and division rules.
+            values = values.astype(float)
+        elif values.dtype.kind not in 'fc':
+            return evaluate_each()
+        arrays[name] = values
+
+    all_variables, all_functions = add_defaults(arrays, functions, case_sensitive)
+    math_interpreter.check_variables(all_variables, all_functions)
+
+    try:
+        with numpy.errstate(divide='raise', over='raise', invalid='raise'):
+            result = math_interpreter.evaluate(all_variables, all_functions)
+    except Exception:  # pylint: disable=broad-except
+        return evaluate_each()
+
+    if numpy.ndim(result) == 0:
+        # The expression doesn't depend on any of the variables.
+        return [result] * len(variables_list)
+    if numpy.shape(result) != (len(variables_list),) or result.dtype.kind not in 'fc':
+        return evaluate_each()
+    return list(result)
+
+
+PARSE_CACHE = LRUCache(PARSE_CACHE_SIZE)
+
+
+def parse_expression(math_expr, case_sensitive=False):
+    """
+    Return a parsed `ParseAugmenter` for `math_expr`.
+
+    Parsed expressions are kept in a least-recently-used cache keyed by the
+    expression and its case sensitivity, so repeated calls with the same
+    expression skip pyparsing entirely. The returned object is shared between
+    callers and must not be modified.
+    """
+    key = (math_expr, case_sensitive)
+    math_interpreter = PARSE_CACHE.get(key)
+    if math_interpreter is None:
+        math_interpreter = ParseAugmenter(math_expr, case_sensitive)
+        math_interpreter.parse_algebra()
+        PARSE_CACHE.set(key, math_interpreter)
+    return math_interpreter
+
+
+_GRAMMAR = None
+
+
+def get_grammar():
+    """
+    Return the pyparsing grammar for algebraic expressions.
+
+    The grammar is built on first use and then shared by every parse.
+    """
+    global _GRAMMAR  # pylint: disable=global-statement
+    if _GRAMMAR is None:
+        _GRAMMAR = _build_grammar()
+    return _GRAMMAR
+
+
+def _build_grammar():
+    """
+    Build the grammar used by `ParseAugmenter.parse_algebra`.
+
+    Parsing with it gives a `pyparsing.ParseResult` with proper groupings to
+    reflect parenthesis and order of operations. All operators are left in the
+    tree and strings of numbers are not parsed into their float versions.
+    """
+    # 0.33 or 7 or .34 or 16.
+    number_part = Word(nums)
+    inner_number = (number_part + Optional("." + Optional(number_part))) | ("." + number_part)
+    # pyparsing allows spaces between tokens--`Combine` prevents that.
+    inner_number = Combine(inner_number)
+
+    # SI suffixes and percent.
+    number_suffix = MatchFirst(Literal(k) for k in SUFFIXES.keys())
+
+    # 0.33k or 17
+    plus_minus = Literal('+') | Literal('-')
+    number = Group(
+        Optional(plus_minus) +
+        inner_number +
+        Optional(CaselessLiteral("E") + Optional(plus_minus) + number_part) +
+        Optional(number_suffix)
+    )
+    number = number("number")
+
+    # Predefine recursive variables.
+    expr = Forward()
+
+    # Handle variables passed in. They must start with letters/underscores
+    # and may contain numbers afterward.
+    inner_varname = Word(alphas + "_", alphanums + "_")
+    varname = Group(inner_varname)("variable")
+
+    # Same thing for functions.
+    function = Group(inner_varname + Suppress("(") + expr + Suppress(")"))("function")
+
+    atom = number | function | varname | "(" + expr + ")"
+    atom = Group(atom)("atom")
+
+    # Do the following in the correct order to preserve order of operation.
+    pow_term = atom + ZeroOrMore("^" + atom)
+    pow_term = Group(pow_term)("power")
+
+    par_term = pow_term + ZeroOrMore('||' + pow_term)  # 5k || 4k
+    par_term = Group(par_term)("parallel")
 
-    evaluate_actions = {
-        'number': eval_number,
-        'variable': lambda x: all_variables[casify(x[0])],
-        'function': lambda x: all_functions[casify(x[0])](x[1]),
-        'atom': eval_atom,
-        'power': eval_power,
-        'parallel': eval_parallel,
-        'product': eval_product,
-        'sum': eval_sum
-    }
+    prod_term = par_term + ZeroOrMore((Literal('*') | Literal('/')) + par_term)  # 7 * 5 / 4
+    prod_term = Group(prod_term)("product")
 
-    return math_interpreter.reduce_tree(evaluate_actions)
+    sum_term = Optional(plus_minus) + prod_term + ZeroOrMore(plus_minus + prod_term)  # -5 + 4 - 3
+    sum_term = Group(sum_term)("sum")
+
+    # Finish the recursion.
+    expr << sum_term  # pylint: disable=W0104
+    return expr + stringEnd
+
+
+# Operators of 'sum' and 'product' branches, resolved once when a tree is
+# compiled by `ParseAugmenter.compile_tree`.
+COMPILED_OPERATORS = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.truediv
+}
 
 
 class ParseAugmenter(object):
@@ -277,23 +425,7 @@ class ParseAugmenter(object):
         self.tree = None
         self.variables_used = set()
         self.functions_used = set()
-
-        def vpa(tokens):
-            """
-            When a variable is recognized, store it in `variables_used`.
-            """
-            varname = tokens[0][0]
-            self.variables_used.add(varname)
-
-        def fpa(tokens):
-            """
-            When a function is recognized, store it in `functions_used`.
-            """
-            varname = tokens[0][0]
-            self.functions_used.add(varname)
-
-        self.variable_parse_action = vpa
-        self.function_parse_action = fpa
+        self.compiled = None
 
     def parse_algebra(self):
         """
@@ -307,57 +439,24 @@ class ParseAugmenter(object):
         really gross. For debugging, use something like
           print OBJ.tree.asXML()
         """
-        # 0.33 or 7 or .34 or 16.
-        number_part = Word(nums)
-        inner_number = (number_part + Optional("." + Optional(number_part))) | ("." + number_part)
-        # pyparsing allows spaces between tokens--`Combine` prevents that.
-        inner_number = Combine(inner_number)
-
-        # SI suffixes and percent.
-        number_suffix = MatchFirst(Literal(k) for k in SUFFIXES.keys())
-
-        # 0.33k or 17
-        plus_minus = Literal('+') | Literal('-')
-        number = Group(
-            Optional(plus_minus) +
-            inner_number +
-            Optional(CaselessLiteral("E") + Optional(plus_minus) + number_part) +
-            Optional(number_suffix)
-        )
-        number = number("number")
-
-        # Predefine recursive variables.
-        expr = Forward()
-
-        # Handle variables passed in. They must start with letters/underscores
-        # and may contain numbers afterward.
-        inner_varname = Word(alphas + "_", alphanums + "_")
-        varname = Group(inner_varname)("variable")
-        varname.setParseAction(self.variable_parse_action)
-
-        # Same thing for functions.
-        function = Group(inner_varname + Suppress("(") + expr + Suppress(")"))("function")
-        function.setParseAction(self.function_parse_action)
-
-        atom = number | function | varname | "(" + expr + ")"
-        atom = Group(atom)("atom")
-
-        # Do the following in the correct order to preserve order of operation.
-        pow_term = atom + ZeroOrMore("^" + atom)
-        pow_term = Group(pow_term)("power")
-
-        par_term = pow_term + ZeroOrMore('||' + pow_term)  # 5k || 4k
-        par_term = Group(par_term)("parallel")
-
-        prod_term = par_term + ZeroOrMore((Literal('*') | Literal('/')) + par_term)  # 7 * 5 / 4
-        prod_term = Group(prod_term)("product")
-
-        sum_term = Optional(plus_minus) + prod_term + ZeroOrMore(plus_minus + prod_term)  # -5 + 4 - 3
-        sum_term = Group(sum_term)("sum")
-
-        # Finish the recursion.
-        expr << sum_term  # pylint: disable=W0104
-        self.tree = (expr + stringEnd).parseString(self.math_expr)[0]
+        self.tree = get_grammar().parseString(self.math_expr)[0]
+        self.find_names(self.tree)
+
+    def find_names(self, node):
+        """
+        Record the variables and functions used in the tree below `node`.
+
+        Store them in `variables_used` and `functions_used`.
+        """
+        for child in node:
+            if not isinstance(child, ParseResults):
+                continue
+            child_name = child.getName()
+            if child_name == 'variable':
+                self.variables_used.add(child[0])
+            elif child_name == 'function':
+                self.functions_used.add(child[0])
+            self.find_names(child)
 
     def reduce_tree(self, handle_actions, terminal_converter=None):
         """
@@ -397,6 +496,101 @@ class ParseAugmenter(object):
         # Find the value of the entire tree.
         return handle_node(self.tree)
 
+    def compile_tree(self):
+        """
+        Turn `self.tree` into a function of `(variables, functions)`.
+
+        The tree is walked only once; the returned closure evaluates the
+        expression for any values of the variables without looking at the
+        parse tree again. `variables` and `functions` are the dictionaries
+        returned by `add_defaults`.
+        """
+        if self.case_sensitive:
+            casify = lambda x: x
+        else:
+            casify = lambda x: x.lower()  # Lowercase for case insens.
+
+        def compile_node(node):
+            """
+            Return a closure computing the value of `node`.
+            """
+            node_name = node.getName()
+            if node_name == 'number':
+                value = eval_number(node)
+                return lambda variables, functions: value
+            if node_name == 'variable':
+                varname = casify(node[0])
+                return lambda variables, functions: variables[varname]
+            if node_name == 'function':
+                funcname = casify(node[0])
+                argument = compile_node(node[1])
+                return lambda variables, functions: functions[funcname](argument(variables, functions))
+
+            if node_name not in ('atom', 'power', 'parallel', 'product', 'sum'):  # pragma: no cover
+                raise Exception(u"Unknown branch name '{}'".format(node_name))
+
+            # Operators are looked at only here, so that the closures below
+            # work the same on numbers and on arrays of numbers.
+            kids = [compile_node(k) for k in node if isinstance(k, ParseResults)]
+            if node_name == 'atom':
+                # An atom is a number, variable or function, possibly
+                # wrapped in parentheses: its value is that of the branch.
+                return kids[0]
+            if len(kids) == 1 and node_name in ('power', 'parallel'):
+                # These are the identity on a single input.
+                return kids[0]
+
+            if node_name == 'power':
+                # Exponentiate right to left, as `eval_power` does.
+                kids.reverse()
+
+                def power(variables, functions):
+                    """Compute a ^ b ^ c..."""
+                    result = kids[0](variables, functions)
+                    for kid in kids[1:]:
+                        result = kid(variables, functions) ** result
+                    return result
+                return power
+
+            if node_name == 'parallel':
+                return lambda variables, functions: eval_parallel([kid(variables, functions) for kid in kids])
+
+            # Pair each operand of a sum or product with the operator that
+            # applies it to the running total, like `eval_sum`/`eval_product`.
+            if node_name == 'sum':
+                start, current_op = 0.0, operator.add
+            else:
+                start, current_op = 1.0, operator.mul
+            operations = []
+            remaining_kids = iter(kids)
+            for k in node:
+                if isinstance(k, ParseResults):
+                    operations.append((current_op, next(remaining_kids)))
+                else:
+                    current_op = COMPILED_OPERATORS[k]
+
+            def combine(variables, functions):
+                """Apply each operation in turn to the running total."""
+                total = start
+                for operation, kid in operations:
+                    total = operation(total, kid(variables, functions))
+                return total
+            return combine
+
+        return compile_node(self.tree)
+
+    def evaluate(self, variables, functions):
+        """
+        Return the value of the parsed expression.
+
+        `variables` and `functions` are the complete dictionaries returned by
+        `add_defaults`, checked with `check_variables`. The tree is compiled
+        on first use and the result reused for later evaluations.
+        """
+        if self.compiled is None:
+            self.compiled = self.compile_tree()
+        return self.compiled(variables, functions)
+
     def check_variables(self, valid_variables, valid_functions):
         """
         Confirm that all the variables used in the tree are valid/defined.
@@ -0,0 +1,99 @@
+"""
+The least-recently-used cache shared by the parser and the previewer, and by
+the other packages of edx-platform which keep computed values in process.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    Map keys to values, forgetting the least recently used beyond `max_size`
+    entries, and if `max_bytes` is given, beyond values whose sizes (as passed
+    to `set`) add up to `max_bytes`.
+
+    Keeps count of hits and misses, reported by `stats()`.
+
+    Safe to share between threads.
+    """
+    def __init__(self, max_size, max_bytes=None):
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.size_in_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """
+        Return the value stored for `key`, marking it as recently used.
+        """
+        with self._lock:
+            try:
+                value, size = self._entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self._entries[key] = (value, size)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, size=0):
+        """
+        Store `value` for `key`, dropping the oldest entries if needed.
+
+        `size` counts against `max_bytes`.  A value bigger than `max_bytes`
+        on its own isn't stored at all.
+        """
+        with self._lock:
+            self._pop(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self.size_in_bytes += size
+            while len(self._entries) > self.max_size or (
+                self.max_bytes is not None and self.size_in_bytes > self.max_bytes
+            ):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size_in_bytes -= evicted_size
+
+    def delete(self, key):
+        """
+        Forget the value stored for `key`, if any.
+        """
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        """
+        Forget everything.  The hit and miss counts are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.size_in_bytes = 0
+
+    def stats(self):
+        """
+        Return a dict of statistics about this cache.
+        """
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_size,
+            'size': self.size_in_bytes,
+            'max_size': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    def _pop(self, key):
+        """
+        Remove the entry for `key`, if any.  The caller holds the lock.
+        """
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size_in_bytes -= entry[1]
+
+    def __len__(self):
+        return len(self._entries)
@@ -8,7 +8,15 @@ Because intermediate values of the render contain more data than simply the
 string of latex, store it in a custom class `LatexRendered`.
 """
 
-from calc import ParseAugmenter, DEFAULT_VARIABLES, DEFAULT_FUNCTIONS, SUFFIXES
+from pyparsing import ParseException
+
+from calc import parse_expression, DEFAULT_VARIABLES, DEFAULT_FUNCTIONS, SUFFIXES
+from lru import LRUCache
+
+# How many rendered previews to keep. Previews are requested as students
+# type, so the same few prefixes of popular answers come back again and again.
+PREVIEW_CACHE_SIZE = 5000
+PREVIEW_CACHE = LRUCache(PREVIEW_CACHE_SIZE)
 
 
 class LatexRendered(object):
@@ -358,14 +366,35 @@ def latex_preview(math_expr, variables=(), functions=(), case_sensitive=False):
     Convert `math_expr` into latex, guaranteeing its parse-ability.
 
     Analagous to `evaluator`.
+
+    Rendered previews, and parse errors, are cached by expression and the
+    variables and functions they are rendered with.
     """
     # No need to go further
     if math_expr.strip() == "":
         return ""
 
+    key = (math_expr, frozenset(variables), frozenset(functions), case_sensitive)
+    cached = PREVIEW_CACHE.get(key)
+    if cached is None:
+        try:
+            cached = render_latex(math_expr, variables, functions, case_sensitive)
+        except ParseException as err:
+            # Half-typed formulas fail to parse; remember those too.
+            cached = err
+        PREVIEW_CACHE.set(key, cached)
+
+    if isinstance(cached, ParseException):
+        raise cached
+    return cached
+
+
+def render_latex(math_expr, variables, functions, case_sensitive):
+    """
+    Do the work of `latex_preview`, without any caching.
+    """
     # Parse tree
-    latex_interpreter = ParseAugmenter(math_expr, case_sensitive)
-    latex_interpreter.parse_algebra()
+    latex_interpreter = parse_expression(math_expr, case_sensitive)
 
     # Get our variables together.
     variables, functions = add_defaults(variables, functions, case_sensitive)
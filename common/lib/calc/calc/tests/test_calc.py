@@ -558,3 +558,119 @@ class EvaluatorTest(unittest.TestCase):
             calc.evaluator({'r1': 5}, {}, "r1+r2")
         with self.assertRaisesRegexp(calc.UndefinedVariable, 'r1 r3'):
             calc.evaluator(variables, {}, "r1*r3", case_sensitive=True)
+
+
+class ParseCacheTest(unittest.TestCase):
+    """
+    Test that parsed expressions are reused between evaluations.
+    """
+
+    def test_grammar_is_built_once(self):
+        self.assertIs(calc.get_grammar(), calc.get_grammar())
+
+    def test_parse_is_reused(self):
+        first = calc.parse_expression("x^2 + sin(y)")
+        self.assertIs(first, calc.parse_expression("x^2 + sin(y)"))
+        self.assertIsNot(first, calc.parse_expression("x^2 + sin(y)", case_sensitive=True))
+        self.assertEqual(first.variables_used, set(['x', 'y']))
+        self.assertEqual(first.functions_used, set(['sin']))
+
+    def test_cache_is_bounded(self):
+        old_size = calc.PARSE_CACHE.max_size
+        calc.PARSE_CACHE.max_size = 2
+        try:
+            first = calc.parse_expression("1+1")
+            calc.parse_expression("1+2")
+            calc.parse_expression("1+3")
+            self.assertIsNot(first, calc.parse_expression("1+1"))
+        finally:
+            calc.PARSE_CACHE.max_size = old_size
+
+    def test_variables_checked_on_every_call(self):
+        self.assertEqual(calc.evaluator({'x': 2.0}, {}, "x*3"), 6.0)
+        self.assertEqual(calc.evaluator({'x': 5.0}, {}, "x*3"), 15.0)
+        with self.assertRaisesRegexp(calc.UndefinedVariable, 'x'):
+            calc.evaluator({}, {}, "x*3")
+
+    def test_compiled_tree_matches_reduce_tree(self):
+        variables, functions = calc.add_defaults({'x': 0.3, 'R1': 4.0}, {'f': lambda y: y + 1}, False)
+        for expr in ["-x^2^0.5 + (3-x)/2*pi", "f(sin(x)) || R1", "2.5k*x - 3e-2 + 7%",
+                     "((x))", "i*e^(j*x)", "r1 || 0"]:
+            parsed = calc.parse_expression(expr)
+            reduced = parsed.reduce_tree({
+                'number': calc.eval_number,
+                'variable': lambda x: variables[x[0].lower()],
+                'function': lambda x: functions[x[0].lower()](x[1]),
+                'atom': calc.eval_atom,
+                'power': calc.eval_power,
+                'parallel': calc.eval_parallel,
+                'product': calc.eval_product,
+                'sum': calc.eval_sum
+            })
+            compiled = parsed.evaluate(variables, functions)
+            if numpy.isnan(reduced):
+                self.assertTrue(numpy.isnan(compiled))
+            else:
+                self.assertEqual(reduced, compiled)
+
+
+class VectorizedEvaluatorTest(unittest.TestCase):
+    """
+    Test that `evaluator_vectorized` agrees with `evaluator` at every point.
+    """
+
+    def assert_same_as_scalar(self, variables_list, math_expr, functions=None):
+        """
+        Check `evaluator_vectorized` against calling `evaluator` on each point.
+        """
+        functions = functions or {}
+        expected = [calc.evaluator(variables, functions, math_expr) for variables in variables_list]
+        results = calc.evaluator_vectorized(variables_list, functions, math_expr)
+        self.assertEqual(len(results), len(expected))
+        for result, value in zip(results, expected):
+            if numpy.isnan(value):
+                self.assertTrue(numpy.isnan(result))
+            else:
+                self.assertAlmostEqual(result, value)
+
+    def test_real_expressions(self):
+        points = [{'x': x, 'y': 2.0 - x} for x in numpy.linspace(0.1, 1.9, 20)]
+        for expr in ["x^2 + y^2", "-x^y^0.5", "sin(x)/cos(y) - 3*x", "sqrt(x*y) * pi",
+                     "arcsec(x + 1) + coth(y)", "(x+1)/(y+3)*2k", "10"]:
+            self.assert_same_as_scalar(points, expr)
+
+    def test_complex_expressions(self):
+        points = [{'x': x} for x in numpy.linspace(-2, 2, 10)]
+        self.assert_same_as_scalar(points, "e^(i*x) + x*j")
+        self.assert_same_as_scalar(points, "sqrt(x + 0*i)")
+
+    def test_integer_values(self):
+        self.assert_same_as_scalar([{'n': 1}, {'n': 2}, {'n': 3}], "n^-1 + 1/n")
+
+    def test_scalar_fallback(self):
+        # Factorials, parallel resistors and domain errors can't be computed
+        # over arrays, but the results must still be correct.
+        points = [{'n': 3}, {'n': 4}, {'n': 5}]
+        self.assert_same_as_scalar(points, "fact(n)")
+        self.assert_same_as_scalar(points, "n || 2")
+        self.assert_same_as_scalar(points, "n || 0")
+        self.assert_same_as_scalar([{'x': 1.0}, {'x': -1.0}], "sqrt(x)")
+
+    def test_scalar_errors_are_raised(self):
+        with self.assertRaises(ValueError):
+            calc.evaluator_vectorized([{'x': 1.0}, {'x': -0.5}], {}, "fact(x)")
+        with self.assertRaises(ZeroDivisionError):
+            calc.evaluator_vectorized([{'x': 1.0}, {'x': 0.0}], {}, "1/x")
+        with self.assertRaisesRegexp(calc.UndefinedVariable, 'y'):
+            calc.evaluator_vectorized([{'x': 1.0}], {}, "x+y")
+
+    def test_custom_functions(self):
+        self.assert_same_as_scalar(
+            [{'x': 1.0}, {'x': 2.0}],
+            "f(x) + g(x)",
+            {'f': numpy.sin, 'g': lambda x: float(x) * 2}
+        )
+
+    def test_empty_inputs(self):
+        self.assertEqual(calc.evaluator_vectorized([], {}, "x"), [])
+        self.assertTrue(all(numpy.isnan(v) for v in calc.evaluator_vectorized([{'x': 1}, {'x': 2}], {}, " ")))
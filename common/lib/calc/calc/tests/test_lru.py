@@ -0,0 +1,63 @@
+"""
+Unit tests for lru.py
+"""
+
+import unittest
+from calc.lru import LRUCache
+
+
+class TestLRUCache(unittest.TestCase):
+    """
+    Test the LRU cache shared by calc, chem, symmath, capa and the modulestores.
+    """
+
+    def test_eviction_order(self):
+        lru = LRUCache(2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        # Using 'a' makes 'b' the least recently used.
+        self.assertEqual(lru.get('a'), 1)
+        lru.set('c', 3)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual(lru.get('a'), 1)
+        self.assertEqual(lru.get('c'), 3)
+        self.assertEqual(len(lru), 2)
+
+    def test_delete(self):
+        lru = LRUCache(2)
+        lru.set('a', 1, 4)
+        lru.delete('a')
+        lru.delete('b')
+        self.assertIsNone(lru.get('a'))
+        self.assertEqual(len(lru), 0)
+        self.assertEqual(lru.stats()['size'], 0)
+
+    def test_stats(self):
+        lru = LRUCache(10)
+        lru.set('a', 1)
+        lru.get('a')
+        lru.get('b')
+        self.assertEqual(
+            lru.stats(),
+            {'entries': 1, 'max_entries': 10, 'size': 0, 'max_size': None, 'hits': 1, 'misses': 1}
+        )
+        # Clearing the cache doesn't lose the statistics.
+        lru.clear()
+        self.assertEqual(
+            lru.stats(),
+            {'entries': 0, 'max_entries': 10, 'size': 0, 'max_size': None, 'hits': 1, 'misses': 1}
+        )
+
+    def test_max_size(self):
+        lru = LRUCache(10, max_bytes=10)
+        lru.set('a', 1, 4)
+        lru.set('b', 2, 4)
+        # 'a' is evicted to make room for 'c'.
+        lru.set('c', 3, 4)
+        self.assertIsNone(lru.get('a'))
+        self.assertEqual(lru.get('b'), 2)
+        self.assertEqual(lru.stats()['size'], 8)
+        # Values too big for the cache aren't stored.
+        lru.set('d', 4, 11)
+        self.assertIsNone(lru.get('d'))
+        self.assertEqual(len(lru), 2)
@@ -249,3 +249,34 @@ class LatexPreviewTest(unittest.TestCase):
                 bad_exceptions[math] = None
 
         self.assertEquals({}, bad_exceptions)
+
+
+class LatexPreviewCacheTest(unittest.TestCase):
+    """
+    Test the caching of rendered previews.
+    """
+    def setUp(self):
+        super(LatexPreviewCacheTest, self).setUp()
+        preview.PREVIEW_CACHE.clear()
+
+    def test_render_is_cached(self):
+        self.assertEquals(preview.latex_preview('x^2', variables=['x']), 'x^{2}')
+        self.assertEquals(len(preview.PREVIEW_CACHE), 1)
+        self.assertEquals(preview.latex_preview('x^2', variables=['x']), 'x^{2}')
+        self.assertEquals(len(preview.PREVIEW_CACHE), 1)
+
+    def test_context_is_part_of_the_key(self):
+        """
+        Renders with different variables or functions are cached separately.
+        """
+        preview.latex_preview('f(x)', functions=['f'])
+        preview.latex_preview('f(x)', functions=['f'], variables=['x'])
+        preview.latex_preview('f(x)', functions=['f'], case_sensitive=True)
+        preview.latex_preview('f(x)', functions=('f',))
+        self.assertEquals(len(preview.PREVIEW_CACHE), 3)
+
+    def test_parse_errors_are_cached(self):
+        for _ in range(2):
+            with self.assertRaises(pyparsing.ParseException):
+                preview.latex_preview('11+')
+        self.assertEquals(len(preview.PREVIEW_CACHE), 1)
@@ -0,0 +1,12 @@
+"""
+Benchmarks for the capa and calc hot paths.
+
+`capa.benchmarks.problems` holds representative problems and the answers used
+to grade them; `capa.benchmarks.run` times them and writes the results as
+JSON.  Everything runs in process: custom python code is executed without
+codejail, and nothing talks to the network, so results are repeatable on a
+developer machine or a CI worker.
+
+    python -m capa.benchmarks.run --output results.json
+
+"""
@@ -0,0 +1,232 @@
+"""
+Representative capa problems for the benchmarks.
+
+Each `BenchmarkProblem` has the problem xml and a dict of answers to grade,
+keyed by answer id.  With the problem id "1" used by the benchmarks, the
+inputs of the n-th response are "1_<n+1>_1", "1_<n+1>_2", etc.  The answers
+aren't all correct: grading wrong answers costs as much as grading right ones.
+"""
+
+import textwrap
+from collections import namedtuple
+
+BenchmarkProblem = namedtuple('BenchmarkProblem', ['name', 'xml', 'answers'])  # pylint: disable=invalid-name
+
+
+FORMULA = BenchmarkProblem(
+    'formula',
+    textwrap.dedent("""
+        <problem>
+          <p>Enter an expression equivalent to x^2 sin(y) + sqrt(z)/(x+y).</p>
+          <formularesponse type="ci" samples="x,y,z@1,1,1:3,3,3#20" answer="x^2*sin(y) + sqrt(z)/(x+y)">
+            <responseparam type="tolerance" default="0.0001"/>
+            <formulaequationinput size="40"/>
+          </formularesponse>
+          <p>Enter the derivative of e^(-a t) cos(w t) with respect to t.</p>
+          <formularesponse type="cs" samples="a,w,t@0.1,1,0:2,5,10#20" answer="-e^(-a*t)*(a*cos(w*t) + w*sin(w*t))">
+            <responseparam type="tolerance" default="0.0001"/>
+            <formulaequationinput size="40"/>
+          </formularesponse>
+        </problem>
+    """),
+    {
+        '1_2_1': 'sin(y)*x*x + z^0.5/(y+x)',
+        '1_3_1': '-a*e^(-a*t)*cos(w*t) - w*e^(-a*t)*sin(w*t)',
+    },
+)
+
+
+NUMERICAL = BenchmarkProblem(
+    'numerical',
+    textwrap.dedent("""
+        <problem>
+          <p>What is the speed of light, in m/s?</p>
+          <numericalresponse answer="2.998e8">
+            <responseparam type="tolerance" default="1%"/>
+            <formulaequationinput size="20"/>
+          </numericalresponse>
+          <p>What is the length of the diagonal of a square with sides of length pi?</p>
+          <numericalresponse answer="sqrt(2)*pi">
+            <responseparam type="tolerance" default="0.001"/>
+            <formulaequationinput size="20"/>
+          </numericalresponse>
+          <p>What is the equivalent resistance of 10 and 15 ohm resistors in parallel, in kohm?</p>
+          <numericalresponse answer="6e-3">
+            <responseparam type="tolerance" default="0.00001"/>
+            <formulaequationinput size="20"/>
+          </numericalresponse>
+        </problem>
+    """),
+    {
+        '1_2_1': '3e8',
+        '1_3_1': '4.4429',
+        '1_4_1': '(10||15)/1000',
+    },
+)
+
+
+CUSTOM_SCRIPT = BenchmarkProblem(
+    'custom_script',
+    textwrap.dedent("""
+        <problem>
+          <script type="loncapa/python">
+        import random
+        a = random.randint(2, 9)
+        b = random.randint(2, 9)
+
+        def check_sum(expect, ans):
+            try:
+                return abs(float(ans) - (a + b)) &lt; 1e-6
+            except ValueError:
+                return False
+
+        def check_pair(expect, ans):
+            values = sorted(float(value) for value in ans.split(','))
+            return {'ok': values == sorted([a, b]), 'msg': 'Checked %d values' % len(values)}
+          </script>
+          <p>What is $a + $b?</p>
+          <customresponse cfn="check_sum">
+            <textline size="10"/>
+          </customresponse>
+          <p>Enter $a and $b, separated by a comma.</p>
+          <customresponse cfn="check_pair">
+            <textline size="10"/>
+          </customresponse>
+        </problem>
+    """),
+    {
+        '1_2_1': '11',
+        '1_3_1': '5, 6',
+    },
+)
+
+
+CHEMICAL = BenchmarkProblem(
+    'chemical',
+    textwrap.dedent("""
+        <problem>
+          <p>Balance the combustion of methane.</p>
+          <customresponse>
+            <chemicalequationinput size="50"/>
+            <answer type="loncapa/python">
+        if chemcalc.chemical_equations_equal(submission[0], 'CH4 + 2O2 -> CO2 + 2H2O'):
+            correct = ['correct']
+        else:
+            correct = ['incorrect']
+            </answer>
+          </customresponse>
+          <p>Write the dissociation of calcium phosphate.</p>
+          <customresponse>
+            <chemicalequationinput size="50"/>
+            <answer type="loncapa/python">
+        if chemcalc.chemical_equations_equal(submission[0], 'Ca3(PO4)2(s) -> 3Ca^{2+}(aq) + 2PO4^{3-}(aq)'):
+            correct = ['correct']
+        else:
+            correct = ['incorrect']
+            </answer>
+          </customresponse>
+        </problem>
+    """),
+    {
+        '1_2_1': '2O2 + CH4 -> 2H2O + CO2',
+        '1_3_1': 'Ca3(PO4)2(s) -> 3Ca^{2+}(aq) + 2PO4^{2-}(aq)',
+    },
+)
+
+
+CHOICE = BenchmarkProblem(
+    'choice',
+    textwrap.dedent("""
+        <problem>
+          <p>Which of these is a noble gas?</p>
+          <multiplechoiceresponse>
+            <choicegroup type="MultipleChoice" shuffle="true">
+              <choice correct="false">Nitrogen</choice>
+              <choice correct="false">Oxygen</choice>
+              <choice correct="true">Argon</choice>
+              <choice correct="false">Chlorine</choice>
+              <choice correct="false">Hydrogen</choice>
+              <choice correct="false" fixed="true">None of the above</choice>
+            </choicegroup>
+          </multiplechoiceresponse>
+          <p>Which of these is a prime number?</p>
+          <multiplechoiceresponse>
+            <choicegroup type="MultipleChoice" answer-pool="4">
+              <choice correct="false">4</choice>
+              <choice correct="true" explanation-id="prime7">7</choice>
+              <choice correct="false">9</choice>
+              <choice correct="false">15</choice>
+              <choice correct="true" explanation-id="prime13">13</choice>
+              <choice correct="false">21</choice>
+              <choice correct="false">25</choice>
+            </choicegroup>
+          </multiplechoiceresponse>
+          <solutionset>
+            <solution explanation-id="prime7">
+              <div class="detailed-solution"><p>7 is only divisible by 1 and 7.</p></div>
+            </solution>
+            <solution explanation-id="prime13">
+              <div class="detailed-solution"><p>13 is only divisible by 1 and 13.</p></div>
+            </solution>
+          </solutionset>
+        </problem>
+    """),
+    {
+        '1_2_1': 'choice_2',
+        '1_3_1': 'choice_1',
+    },
+)
+
+
+def large_options_problem(num_options=200):
+    """
+    Return a problem with a dropdown and a list of checkboxes of `num_options` choices each.
+    """
+    options = ["option %d" % index for index in xrange(num_options)]
+    choices = "\n".join(
+        '<choice correct="{0}">Choice {1}</choice>'.format('true' if index % 10 == 0 else 'false', index)
+        for index in xrange(num_options)
+    )
+    xml = textwrap.dedent("""
+        <problem>
+          <p>Pick the right option.</p>
+          <optionresponse>
+            <optioninput options="({options})" correct="{correct}"/>
+          </optionresponse>
+          <p>Check all the multiples of ten.</p>
+          <choiceresponse>
+            <checkboxgroup direction="vertical">
+              {choices}
+            </checkboxgroup>
+          </choiceresponse>
+        </problem>
+    """).format(
+        options=",".join("'%s'" % option for option in options),
+        correct=options[num_options // 2],
+        choices=choices,
+    )
+    answers = {
+        '1_2_1': options[num_options // 2],
+        '1_3_1': ['choice_%d' % index for index in xrange(0, num_options, 10)],
+    }
+    return BenchmarkProblem('large_options', xml, answers)
+
+
+PROBLEMS = [
+    FORMULA,
+    NUMERICAL,
+    CUSTOM_SCRIPT,
+    CHEMICAL,
+    CHOICE,
+    large_options_problem(),
+]
+
+
+# Expressions for the calc.evaluator benchmarks, and the variables they use.
+CALC_EXPRESSIONS = [
+    ('arithmetic', {}, '(1 + 2.5e3) * 4 / 7 - 3^2'),
+    ('polynomial', {'x': 1.5}, '3*x^4 - 2*x^3 + x^2 - 7*x + 11'),
+    ('functions', {'x': 0.7, 'y': 2.1}, 'sin(x)^2 + cos(y)^2 + sqrt(x*y) + ln(y) + arctan(x/y)'),
+    ('suffixes', {'R': 1.0}, '10k*R + 4.7M||2.2k + 3m'),
+    ('parallel', {'a': 10, 'b': 15, 'c': 30}, 'a||b||c + (a+b)||c'),
+]
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+"""
+Time the capa and calc hot paths, and write the results as JSON.
+
+For each problem in `capa.benchmarks.problems` this times constructing the
+`LoncapaProblem`, rendering it with `get_html`, and grading its answers with
+`grade_answers`.  It also times `calc.evaluator` on a few expressions, with
+and without its parse cache, and `calc.evaluator_vectorized` at many points.
+
+Each benchmark calls its function `number` times, `repeat` times over, and
+reports the best and median time per call.  The best time is the one to
+compare between runs: the others mostly measure noise from the machine.
+"""
+
+import argparse
+import datetime
+import gettext
+import json
+import logging
+import os
+import platform
+import re
+import sys
+import timeit
+
+import fs.osfs
+import numpy
+from mako.lookup import TemplateLookup
+
+import calc
+from capa.capa_problem import LoncapaProblem, LoncapaSystem
+from capa.benchmarks.problems import PROBLEMS, CALC_EXPRESSIONS
+
+log = logging.getLogger('capa.benchmarks')
+
+BENCHMARKS_DIR = os.path.dirname(os.path.realpath(__file__))
+TEMPLATES_DIR = os.path.join(os.path.dirname(BENCHMARKS_DIR), 'templates')
+
+# The problem id and seed the problems are built with.
+PROBLEM_ID = '1'
+SEED = 1
+
+# How many points to evaluate expressions at with calc.evaluator_vectorized.
+VECTORIZED_POINTS = 1000
+
+
+def benchmark_render_template():
+    """
+    Return a `render_template` function that renders the capa templates with mako.
+
+    Like the LMS's, it can compile templates ahead of time, so the benchmarks
+    measure the same code path as production.
+    """
+    lookup = TemplateLookup(directories=[TEMPLATES_DIR], default_filters=['decode.utf8'])
+
+    def render_template(template_name, dictionary):
+        """Render a capa template"""
+        return lookup.get_template(template_name).render_unicode(**dictionary)
+
+    def compile_template(template_name):
+        """Look up a capa template once, and return a function rendering it"""
+        template = lookup.get_template(template_name)
+        return lambda dictionary: template.render_unicode(**dictionary)
+
+    render_template.compile_template = compile_template
+    return render_template
+
+
+def benchmark_capa_system():
+    """
+    Return a `LoncapaSystem` that runs everything in process.
+
+    Python code in problems is executed without codejail, and nothing is
+    cached, so every call does the full amount of work.
+    """
+    return LoncapaSystem(
+        ajax_url='/benchmark-ajax-url',
+        anonymous_student_id='student',
+        cache=None,
+        can_execute_unsafe_code=lambda: True,
+        DEBUG=False,
+        filestore=fs.osfs.OSFS(BENCHMARKS_DIR),
+        i18n=gettext.NullTranslations(),
+        node_path=os.environ.get("NODE_PATH", "/usr/local/lib/node_modules"),
+        render_template=benchmark_render_template(),
+        seed=SEED,
+        STATIC_URL='/benchmark-static/',
+        xqueue=None,
+    )
+
+
+def new_problem(xml, capa_system):
+    """Construct a `LoncapaProblem` the way the benchmarks do"""
+    return LoncapaProblem(xml, id=PROBLEM_ID, seed=SEED, capa_system=capa_system)
+
+
+def get_benchmarks(capa_system):
+    """
+    Return a list of (name, function) pairs, one for each benchmark.
+
+    The problems are constructed once here, so that the rendering and grading
+    benchmarks don't include construction time.
+    """
+    benchmarks = []
+
+    for problem in PROBLEMS:
+        instance = new_problem(problem.xml, capa_system)
+        benchmarks.extend([
+            ('capa.construct.' + problem.name, lambda xml=problem.xml: new_problem(xml, capa_system)),
+            ('capa.render.' + problem.name, instance.get_html),
+            ('capa.grade.' + problem.name, lambda instance=instance, answers=problem.answers: (
+                instance.grade_answers(answers))),
+        ])
+
+    def evaluate_uncached(variables, expression):
+        """Evaluate `expression` as if it had never been seen"""
+        calc.PARSE_CACHE.clear()
+        return calc.evaluator(variables, {}, expression)
+
+    for name, variables, expression in CALC_EXPRESSIONS:
+        points = [
+            dict((variable, value * (1 + index / float(VECTORIZED_POINTS))) for variable, value in variables.items())
+            for index in xrange(VECTORIZED_POINTS)
+        ]
+        benchmarks.extend([
+            ('calc.evaluator.' + name, lambda variables=variables, expression=expression: (
+                calc.evaluator(variables, {}, expression))),
+            ('calc.evaluator_uncached.' + name, lambda variables=variables, expression=expression: (
+                evaluate_uncached(variables, expression))),
+            ('calc.evaluator_vectorized.' + name, lambda points=points, expression=expression: (
+                calc.evaluator_vectorized(points, {}, expression))),
+        ])
+
+    return benchmarks
+
+
+def run_benchmark(name, function, number, repeat):
+    """
+    Time `function`, and return a dict describing the results.
+
+    Times are in seconds per call.
+    """
+    # One untimed call, so that lazy imports and template lookups aren't counted.
+    function()
+    timings = timeit.repeat(function, number=number, repeat=repeat)
+    per_call = sorted(timing / number for timing in timings)
+    best = per_call[0]
+    return {
+        'name': name,
+        'number': number,
+        'repeat': repeat,
+        'best': best,
+        'median': per_call[len(per_call) // 2],
+        'worst': per_call[-1],
+        'calls_per_second': 1 / best if best else None,
+    }
+
+
+def run_benchmarks(number=100, repeat=5, name_filter=None):
+    """
+    Run the benchmarks whose names match the regular expression `name_filter`
+    (or all of them), and return the results as a JSON-serializable dict.
+    """
+    # Out-of-domain values are expected in the calc benchmarks.
+    numpy.seterr(all='ignore')
+
+    results = []
+    for name, function in get_benchmarks(benchmark_capa_system()):
+        if name_filter and not re.search(name_filter, name):
+            continue
+        log.info("Running %s", name)
+        results.append(run_benchmark(name, function, number, repeat))
+
+    return {
+        'timestamp': datetime.datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark capa problems and calc')
+    parser.add_argument("--number", type=int, default=100,
+                        help="how many times to call each benchmark per timing")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="how many timings to take of each benchmark")
+    parser.add_argument("--filter", dest="name_filter",
+                        help="only run benchmarks whose names match this regular expression")
+    parser.add_argument("--output", type=argparse.FileType('w'), default=sys.stdout,
+                        help="file to write the JSON results to (default: stdout)")
+    parser.add_argument("--log-level", required=False, default="WARN",
+                        choices=['info', 'debug', 'warn', 'error',
+                                 'INFO', 'DEBUG', 'WARN', 'ERROR'])
+
+    args = parser.parse_args()
+    logging.basicConfig(format="%(levelname)s %(message)s")
+    log.setLevel(args.log_level.upper())
+
+    results = run_benchmarks(args.number, args.repeat, args.name_filter)
+    json.dump(results, args.output, indent=2, sort_keys=True)
+    args.output.write("\n")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -17,6 +17,7 @@ from datetime import datetime
 import logging
 import os.path
 import re
+import sys
 
 from lxml import etree
 from xml.sax.saxutils import unescape
@@ -74,6 +75,9 @@ class LoncapaSystem(object):
     Attributes:
         i18n: an object implementing the `gettext.Translations` interface so
             that we can use `.ugettext` to localize strings.
+        render_template: a function rendering a template name with a context
+            dict.  It can have a `compile_template` attribute, see
+            :meth:`InputTypeBase.get_compiled_template`.
 
     See :class:`ModuleSystem` for documentation of other attributes.
 
@@ -223,6 +227,26 @@ class LoncapaProblem(object):
                 'input_state': self.input_state,
                 'done': self.done}
 
+    def load_state(self, state):
+        """
+        Replace the per-user session data with `state`, as returned by `get_state`.
+
+        The problem itself is not rebuilt, so `state` must be for the same seed
+        as this problem.  This lets one parsed problem grade the stored answers
+        of every student that shares its seed.
+        """
+        if state.get('seed', self.seed) != self.seed:
+            raise responsetypes.LoncapaProblemError(
+                "Cannot load state for seed {0} into a problem with seed {1}".format(state['seed'], self.seed)
+            )
+
+        self.do_reset()
+        self.student_answers = state.get('student_answers', {})
+        if 'correct_map' in state:
+            self.correct_map.set_dict(state['correct_map'])
+        self.done = state.get('done', False)
+        self.input_state = state.get('input_state', {})
+
     def get_max_score(self):
         """
         Return the maximum score for this problem.
@@ -352,6 +376,44 @@ class LoncapaProblem(object):
         """
         return self._grade_answers(None)
 
+    def rescore_states(self, states):
+        """
+        Rescore the student responses stored in several `states`, as returned by
+        `get_state` for this problem's seed.
+
+        Each Response scores the answers of all the states at once, so that
+        responses like customresponse can share work between them.
+
+        Returns a list with, for each state, either the new CorrectMap or the
+        exc_info of the exception raised while grading it.  The problem is left
+        loaded with the last of the `states`.
+        """
+        responders = self.responders.values()
+        for responder in responders:
+            # See _grade_answers: file submissions can't be rescored.
+            if 'filesubmission' in responder.allowed_inputfields:
+                _ = self.capa_system.i18n.ugettext
+                raise Exception(_(u"Cannot rescore problems with possible file submissions"))
+
+        student_answers_list = [state.get('student_answers', {}) for state in states]
+        scores = [responder.get_scores(student_answers_list) for responder in responders]
+
+        results = []
+        for index, state in enumerate(states):
+            self.load_state(state)
+            newcmap = CorrectMap()
+            try:
+                for responder, responder_scores in zip(responders, scores):
+                    score = responder_scores[index]
+                    if isinstance(score, tuple):
+                        raise score[0], score[1], score[2]
+                    responder.get_hints(convert_files_to_filenames(self.student_answers), score, self.correct_map)
+                    newcmap.update(score)
+            except Exception:  # pylint: disable=broad-except
+                newcmap = sys.exc_info()
+            results.append(newcmap)
+        return results
+
     def _grade_answers(self, student_answers):
         """
         Internal grading call used for checking new 'student_answers' and also
@@ -319,6 +319,27 @@ class InputTypeBase(object):
         """
         return {}
 
+    @classmethod
+    def get_compiled_template(cls, render_template):
+        """
+        Return the template of this input type compiled by `render_template`, or None
+        if it can't compile templates.
+
+        A `render_template` function that can compile templates has a `compile_template`
+        attribute, taking a template name and returning a function that renders that
+        template with a context dict.  The compiled template is kept by the input type
+        class, so that it's only looked up once per process.
+        """
+        compile_template = getattr(render_template, 'compile_template', None)
+        if compile_template is None:
+            return None
+
+        compiled = cls.__dict__.get('_compiled_template')
+        if compiled is None or compiled[0] is not compile_template:
+            compiled = (compile_template, compile_template(cls.template))
+            cls._compiled_template = compiled
+        return compiled[1]
+
     def get_html(self):
         """
         Return the html for this input, as an etree element.
@@ -329,7 +350,11 @@ class InputTypeBase(object):
 
         context = self._get_render_context()
 
-        html = self.capa_system.render_template(self.template, context)
+        compiled_template = self.get_compiled_template(self.capa_system.render_template)
+        if compiled_template is not None:
+            html = compiled_template(context)
+        else:
+            html = self.capa_system.render_template(self.template, context)
 
         try:
             output = etree.XML(html)
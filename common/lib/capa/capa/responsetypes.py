@@ -36,7 +36,7 @@ from shapely.geometry import Point, MultiPoint
 from dogapi import dog_stats_api
 
 # specific library imports
-from calc import evaluator, UndefinedVariable
+from calc import evaluator, evaluator_vectorized, UndefinedVariable
 from . import correctmap
 from .registry import TagRegistry
 from datetime import datetime
@@ -250,6 +250,23 @@ class LoncapaResponse(object):
         # log.debug('new_cmap = %s' % new_cmap)
         return new_cmap
 
+    def get_scores(self, student_answers_list):
+        """
+        Score the answers of several students, as `get_score` does for one.
+
+        Returns a list with, for each dict in `student_answers_list`, either its
+        CorrectMap or the exc_info of the exception raised while scoring it, so
+        that one failing submission doesn't affect the others.  Subclasses can
+        override this to share work between the submissions.
+        """
+        scores = []
+        for student_answers in student_answers_list:
+            try:
+                scores.append(self.get_score(student_answers))
+            except Exception:  # pylint: disable=broad-except
+                scores.append(sys.exc_info())
+        return scores
+
     def get_hints(self, student_answers, new_cmap, old_cmap):
         """
         Generate adaptive hints for this problem based on student answers, the old CorrectMap,
@@ -1415,6 +1432,38 @@ class StringResponse(LoncapaResponse):
 #-----------------------------------------------------------------------------
 
 
+# Runs a problem's script and its check function against a list of answers in
+# one sandboxed execution.  For each answer, the script is run again from the
+# same globals and random state, in a namespace of its own, as in an execution
+# of its own: nothing the script or the check function builds or changes is
+# seen by the next answer.  An answer whose check raises, or returns a result
+# that can't leave the sandbox, is only marked as failed here: it is checked
+# again on its own, so that it gets the same error as when it isn't batched.
+CUSTOMRESPONSE_BATCH_CHECK_CODE = """
+import json as cfn_json
+import sys as cfn_sys
+cfn_random_state = cfn_sys.modules['random'].getstate()
+cfn_globals = dict(
+    (name, value) for name, value in globals().items() if not name.startswith('cfn_')
+)
+cfn_script = compile({script!r} + '\\ncfn_return = {cfn}(expect, ans)\\n', '<script>', 'exec')
+cfn_results = []
+for cfn_answer in cfn_answers:
+    cfn_sys.modules['random'].setstate(cfn_random_state)
+    cfn_namespace = dict(cfn_globals, ans=cfn_answer)
+    try:
+        exec cfn_script in cfn_namespace
+        cfn_json.dumps(cfn_namespace['cfn_return'])
+        cfn_results.append({{'ok': True, 'return': cfn_namespace['cfn_return']}})
+    except Exception:
+        cfn_results.append({{'ok': False}})
+"""
+
+# The most answers checked in one sandboxed execution, which has to fit in the
+# sandbox's CPU and memory limits.
+CUSTOMRESPONSE_BATCH_SIZE = 20
+
+
 @registry.register
 class CustomResponse(LoncapaResponse):
     """
@@ -1430,6 +1479,7 @@ class CustomResponse(LoncapaResponse):
                            'designprotein2dinput', 'editageneinput',
                            'annotationinput', 'jsinput', 'formulaequationinput']
     code = None
+    batch_code = None
     expect = None
 
     def setup_response(self):
@@ -1444,6 +1494,7 @@ class CustomResponse(LoncapaResponse):
         # the <answer>...</answer> stanza should be local to the current <customresponse>.
         # So try looking there first.
         self.code = None
+        self.batch_code = None
         answer = None
         try:
             answer = xml.xpath('//*[@id=$id]//answer', id=xml.get('id'))[0]
@@ -1487,6 +1538,29 @@ class CustomResponse(LoncapaResponse):
 
                 self.code = make_check_function(self.context['script_code'], cfn)
 
+                # Check functions that take extra arguments from the context
+                # may depend on the submission, so they are only run one by one.
+                def make_batch_check_function(script_code, cfn):
+                    def batch_check_function(expect, answers):
+                        code = CUSTOMRESPONSE_BATCH_CHECK_CODE.format(script=script_code, cfn=cfn)
+                        globals_dict = {
+                            'expect': expect,
+                            'cfn_answers': answers,
+                        }
+                        safe_exec.safe_exec(
+                            code,
+                            globals_dict,
+                            python_path=self.context['python_path'],
+                            slug=self.id,
+                            random_seed=self.context['seed'],
+                            unsafely=self.capa_system.can_execute_unsafe_code(),
+                        )
+                        return globals_dict['cfn_results']
+                    return batch_check_function
+
+                if not xml.get("cfn_extra_args"):
+                    self.batch_code = make_batch_check_function(self.context['script_code'], cfn)
+
         if not self.code:
             if answer is None:
                 log.error("[courseware.capa.responsetypes.customresponse] missing"
@@ -1581,6 +1655,13 @@ class CustomResponse(LoncapaResponse):
         # Run the check function
         self.execute_check_function(idset, submission)
 
+        return self.get_correct_map_from_context(idset)
+
+    def get_correct_map_from_context(self, idset):
+        """
+        Build the CorrectMap for the inputs `idset` from the results of the
+        check function stored in the context.
+        """
         # build map giving "correct"ness of the answer(s)
         correct = self.context['correct']
         messages = self.context['messages']
@@ -1594,6 +1675,56 @@ class CustomResponse(LoncapaResponse):
                             npoints=npoints)
         return correct_map
 
+    def get_scores(self, student_answers_list):
+        """
+        Score the answers of several students, checking them in sandboxed
+        executions of the `cfn` check function of up to CUSTOMRESPONSE_BATCH_SIZE
+        answers each when there is one.
+        """
+        if self.batch_code is None:
+            return super(CustomResponse, self).get_scores(student_answers_list)
+
+        idset = sorted(self.answer_ids)
+        scores = [None] * len(student_answers_list)
+        to_check = []
+        for index, student_answers in enumerate(student_answers_list):
+            submission = [student_answers.get(k) for k in idset]
+            if None in submission or (len(idset) == 1 and not submission[0]):
+                # get_score reports missing answers, and doesn't check empty ones
+                scores[index] = super(CustomResponse, self).get_scores([student_answers])[0]
+            else:
+                to_check.append((index, submission))
+
+        if not to_check:
+            return scores
+
+        for start in range(0, len(to_check), CUSTOMRESPONSE_BATCH_SIZE):
+            chunk = to_check[start:start + CUSTOMRESPONSE_BATCH_SIZE]
+            answers_given = [submission[0] if (len(idset) == 1) else submission for _, submission in chunk]
+            try:
+                results = self.batch_code(self.expect, answers_given)
+            except Exception:  # pylint: disable=broad-except
+                log.warning('Error occurred while evaluating CustomResponse batch, checking one by one', exc_info=True)
+                results = [{'ok': False}] * len(chunk)
+
+            for (index, submission), result in zip(chunk, results):
+                if not result['ok']:
+                    # Check it again on its own, to report the error as get_score does
+                    scores[index] = super(CustomResponse, self).get_scores([student_answers_list[index]])[0]
+                    continue
+
+                self.context.update({
+                    'correct': ['unknown'] * len(idset),
+                    'messages': [''] * len(idset),
+                    'overall_message': '',
+                })
+                try:
+                    self.handle_check_function_result(idset, result['return'])
+                    scores[index] = self.get_correct_map_from_context(idset)
+                except Exception:  # pylint: disable=broad-except
+                    scores[index] = sys.exc_info()
+        return scores
+
     def execute_check_function(self, idset, submission):
         # exec the check function
         if isinstance(self.code, basestring):
@@ -1626,59 +1757,66 @@ class CustomResponse(LoncapaResponse):
                 "[courseware.capa.responsetypes.customresponse.get_score] ret = %s",
                 ret
             )
-            if isinstance(ret, dict):
-                # One kind of dictionary the check function can return has the
-                # form {'ok': BOOLEAN, 'msg': STRING}
-                # If there are multiple inputs, they all get marked
-                # to the same correct/incorrect value
-                if 'ok' in ret:
-                    correct = ['correct' if ret['ok'] else 'incorrect'] * len(idset)
-                    msg = ret.get('msg', None)
-                    msg = self.clean_message_html(msg)
-
-                    # If there is only one input, apply the message to that input
-                    # Otherwise, apply the message to the whole problem
-                    if len(idset) > 1:
-                        self.context['overall_message'] = msg
-                    else:
-                        self.context['messages'][0] = msg
-
-                # Another kind of dictionary the check function can return has
-                # the form:
-                # {'overall_message': STRING,
-                #  'input_list': [{ 'ok': BOOLEAN, 'msg': STRING }, ...] }
-                #
-                # This allows the function to return an 'overall message'
-                # that applies to the entire problem, as well as correct/incorrect
-                # status and messages for individual inputs
-                elif 'input_list' in ret:
-                    overall_message = ret.get('overall_message', '')
-                    input_list = ret['input_list']
-
-                    correct = []
-                    messages = []
-                    for input_dict in input_list:
-                        correct.append('correct'
-                                       if input_dict['ok'] else 'incorrect')
-                        msg = (self.clean_message_html(input_dict['msg'])
-                               if 'msg' in input_dict else None)
-                        messages.append(msg)
-                    self.context['messages'] = messages
-                    self.context['overall_message'] = overall_message
-
-                # Otherwise, we do not recognize the dictionary
-                # Raise an exception
+            self.handle_check_function_result(idset, ret)
+
+    def handle_check_function_result(self, idset, ret):
+        """
+        Store the correctness and messages for the inputs `idset`, given the
+        value `ret` returned by a check function, in the context.
+        """
+        if isinstance(ret, dict):
+            # One kind of dictionary the check function can return has the
+            # form {'ok': BOOLEAN, 'msg': STRING}
+            # If there are multiple inputs, they all get marked
+            # to the same correct/incorrect value
+            if 'ok' in ret:
+                correct = ['correct' if ret['ok'] else 'incorrect'] * len(idset)
+                msg = ret.get('msg', None)
+                msg = self.clean_message_html(msg)
+
+                # If there is only one input, apply the message to that input
+                # Otherwise, apply the message to the whole problem
+                if len(idset) > 1:
+                    self.context['overall_message'] = msg
                 else:
-                    log.error(traceback.format_exc())
-                    _ = self.capa_system.i18n.ugettext
-                    raise ResponseError(
-                        _("CustomResponse: check function returned an invalid dictionary!")
-                    )
-
+                    self.context['messages'][0] = msg
+
+            # Another kind of dictionary the check function can return has
+            # the form:
+            # {'overall_message': STRING,
+            #  'input_list': [{ 'ok': BOOLEAN, 'msg': STRING }, ...] }
+            #
+            # This allows the function to return an 'overall message'
+            # that applies to the entire problem, as well as correct/incorrect
+            # status and messages for individual inputs
+            elif 'input_list' in ret:
+                overall_message = ret.get('overall_message', '')
+                input_list = ret['input_list']
+
+                correct = []
+                messages = []
+                for input_dict in input_list:
+                    correct.append('correct'
+                                   if input_dict['ok'] else 'incorrect')
+                    msg = (self.clean_message_html(input_dict['msg'])
+                           if 'msg' in input_dict else None)
+                    messages.append(msg)
+                self.context['messages'] = messages
+                self.context['overall_message'] = overall_message
+
+            # Otherwise, we do not recognize the dictionary
+            # Raise an exception
             else:
-                correct = ['correct' if ret else 'incorrect'] * len(idset)
+                log.error(traceback.format_exc())
+                _ = self.capa_system.i18n.ugettext
+                raise ResponseError(
+                    _("CustomResponse: check function returned an invalid dictionary!")
+                )
+
+        else:
+            correct = ['correct' if ret else 'incorrect'] * len(idset)
 
-            self.context['correct'] = correct
+        self.context['correct'] = correct
 
     def clean_message_html(self, msg):
 
@@ -1764,6 +1902,9 @@ class SymbolicResponse(CustomResponse):
         # Let CustomResponse do its setup
         super(SymbolicResponse, self).setup_response()
 
+        # symmath_check runs in process, so there's nothing to batch
+        self.batch_code = None
+
     def execute_check_function(self, idset, submission):
         from symmath import symmath_check
         try:
@@ -2290,55 +2431,54 @@ class FormulaResponse(LoncapaResponse):
         """
         _ = self.capa_system.i18n.ugettext
 
-        out = []
-        for var_dict in var_dict_list:
-            try:
-                out.append(evaluator(
-                    var_dict,
-                    dict(),
-                    answer,
-                    case_sensitive=self.case_sensitive,
-                ))
-            except UndefinedVariable as err:
+        # All the test cases are evaluated at once, over arrays of values.
+        try:
+            out = evaluator_vectorized(
+                var_dict_list,
+                dict(),
+                answer,
+                case_sensitive=self.case_sensitive,
+            )
+        except UndefinedVariable as err:
+            log.debug(
+                'formularesponse: undefined variable in formula=%s',
+                cgi.escape(answer)
+            )
+            raise StudentInputError(
+                _("Invalid input: {bad_input} not permitted in answer.").format(bad_input=err.message)
+            )
+        except ValueError as err:
+            if 'factorial' in err.message:
+                # This is thrown when fact() or factorial() is used in a formularesponse answer
+                #   that tests on negative and/or non-integer inputs
+                # err.message will be: `factorial() only accepts integral values` or
+                # `factorial() not defined for negative values`
                 log.debug(
-                    'formularesponse: undefined variable in formula=%s',
+                    ('formularesponse: factorial function used in response '
+                     'that tests negative and/or non-integer inputs. '
+                     'Provided answer was: %s'),
                     cgi.escape(answer)
                 )
                 raise StudentInputError(
-                    _("Invalid input: {bad_input} not permitted in answer.").format(bad_input=err.message)
+                    _("factorial function not permitted in answer "
+                      "for this problem. Provided answer was: "
+                      "{bad_input}").format(bad_input=cgi.escape(answer))
                 )
-            except ValueError as err:
-                if 'factorial' in err.message:
-                    # This is thrown when fact() or factorial() is used in a formularesponse answer
-                    #   that tests on negative and/or non-integer inputs
-                    # err.message will be: `factorial() only accepts integral values` or
-                    # `factorial() not defined for negative values`
-                    log.debug(
-                        ('formularesponse: factorial function used in response '
-                         'that tests negative and/or non-integer inputs. '
-                         'Provided answer was: %s'),
-                        cgi.escape(answer)
-                    )
-                    raise StudentInputError(
-                        _("factorial function not permitted in answer "
-                          "for this problem. Provided answer was: "
-                          "{bad_input}").format(bad_input=cgi.escape(answer))
-                    )
-                # If non-factorial related ValueError thrown, handle it the same as any other Exception
-                log.debug('formularesponse: error %s in formula', err)
-                raise StudentInputError(
-                    _("Invalid input: Could not parse '{bad_input}' as a formula.").format(
-                        bad_input=cgi.escape(answer)
-                    )
+            # If non-factorial related ValueError thrown, handle it the same as any other Exception
+            log.debug('formularesponse: error %s in formula', err)
+            raise StudentInputError(
+                _("Invalid input: Could not parse '{bad_input}' as a formula.").format(
+                    bad_input=cgi.escape(answer)
                 )
-            except Exception as err:
-                # traceback.print_exc()
-                log.debug('formularesponse: error %s in formula', err)
-                raise StudentInputError(
-                    _("Invalid input: Could not parse '{bad_input}' as a formula").format(
-                        bad_input=cgi.escape(answer)
-                    )
+            )
+        except Exception as err:
+            # traceback.print_exc()
+            log.debug('formularesponse: error %s in formula', err)
+            raise StudentInputError(
+                _("Invalid input: Could not parse '{bad_input}' as a formula").format(
+                    bad_input=cgi.escape(answer)
                 )
+            )
         return out
 
     def randomize_variables(self, samples):
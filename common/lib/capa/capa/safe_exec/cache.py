@@ -0,0 +1,96 @@
+"""Caching layers for safe_exec results.
+
+safe_exec results are cached at two levels: a bounded in-process LRU (a
+calc.lru.LRUCache) that answers repeated executions without any network
+traffic, and the shared Django cache passed in by the caller.  Results that are too big for a single
+shared cache entry are compressed, and split into chunks if compression isn't
+enough.
+
+"""
+
+import hashlib
+import json
+import zlib
+
+
+# Results whose serialized form is smaller than this are stored as-is.
+COMPRESS_THRESHOLD = 10 * 1024
+
+# Memcached refuses values larger than 1Mb, leave some room for the pickling
+# overhead added by the Django cache backend.
+MAX_CHUNK_SIZE = 1000 * 1000
+
+
+def result_size(value):
+    """The size of the safe_exec result pair `value`, serialized."""
+    return len(json.dumps(value))
+
+
+def set_shared(cache, key, value):
+    """
+    Store the safe_exec result pair `value` in the shared `cache` under `key`.
+
+    Small values are stored unchanged.  Larger ones are stored as a zlib
+    compressed dict, and if that is still too big for one cache entry, the
+    compressed data is spread over several chunk keys, with a header under
+    `key` listing how many chunks to read back.
+
+    Returns the size of `value` serialized, as `result_size` would.
+
+    """
+    serialized = json.dumps(value)
+    if len(serialized) < COMPRESS_THRESHOLD:
+        cache.set(key, value)
+        return len(serialized)
+
+    compressed = zlib.compress(serialized)
+    if len(compressed) <= MAX_CHUNK_SIZE:
+        cache.set(key, {'zlib': compressed})
+        return len(serialized)
+
+    chunks = [
+        compressed[i:i + MAX_CHUNK_SIZE]
+        for i in xrange(0, len(compressed), MAX_CHUNK_SIZE)
+    ]
+    for num, chunk in enumerate(chunks):
+        cache.set(_chunk_key(key, num), chunk)
+    # Write the header last, so readers never see a header without its chunks.
+    cache.set(key, {
+        'zlib_chunks': len(chunks),
+        'md5': hashlib.md5(compressed).hexdigest(),
+    })
+    return len(serialized)
+
+
+def get_shared(cache, key):
+    """
+    Read a value stored with `set_shared` from the shared `cache`.
+
+    Returns None if the value, or any of its chunks, is missing or corrupted.
+
+    """
+    value = cache.get(key)
+    if not isinstance(value, dict):
+        return value
+
+    if 'zlib' in value:
+        compressed = value['zlib']
+    elif 'zlib_chunks' in value:
+        chunks = []
+        for num in xrange(value['zlib_chunks']):
+            chunk = cache.get(_chunk_key(key, num))
+            if chunk is None:
+                return None
+            chunks.append(chunk)
+        compressed = "".join(chunks)
+        if hashlib.md5(compressed).hexdigest() != value['md5']:
+            return None
+    else:
+        return None
+
+    return json.loads(zlib.decompress(compressed))
+
+
+def _chunk_key(key, num):
+    """The shared cache key for chunk `num` of the value stored under `key`."""
+    return "%s.%d" % (key, num)
@@ -3,9 +3,12 @@
 from codejail.safe_exec import safe_exec as codejail_safe_exec
 from codejail.safe_exec import not_safe_exec as codejail_not_safe_exec
 from codejail.safe_exec import json_safe, SafeExecException
+from calc.lru import LRUCache
 from . import lazymod
+from .cache import get_shared, set_shared, result_size
 from dogapi import dog_stats_api
 
+import copy
 import hashlib
 
 # Establish the Python environment for Capa.
@@ -46,6 +49,31 @@ for name, modname in ASSUMED_IMPORTS:
 
 LAZY_IMPORTS = "".join(LAZY_IMPORTS)
 
+# The in-process cache consulted before the shared cache.  Problems with a
+# small seed space execute the same code with the same globals for many
+# students, so even a modest number of entries gets a high hit rate.  The
+# results are kept uncompressed, so their total serialized size is bounded too.
+LOCAL_CACHE_SIZE = 1000
+LOCAL_CACHE_MAX_SIZE = 20 * 1024 * 1024
+local_cache = LRUCache(LOCAL_CACHE_SIZE, LOCAL_CACHE_MAX_SIZE)
+
+# Lookups in the caller-provided shared cache, counted after a local miss.
+SHARED_CACHE_STATS = {'hits': 0, 'misses': 0}
+
+
+def cache_stats():
+    """
+    Return hit and miss statistics for the safe_exec caches.
+
+    The result is a dict with a "local" entry describing the in-process LRU
+    cache, and a "shared" entry counting lookups in the caller's cache.
+
+    """
+    return {
+        'local': local_cache.stats(),
+        'shared': dict(SHARED_CACHE_STATS),
+    }
+
 
 def update_hash(hasher, obj):
     """
@@ -85,7 +113,8 @@ def safe_exec(code, globals_dict, random_seed=None, python_path=None, cache=None
 
     `cache` is an object with .get(key) and .set(key, value) methods.  It will be used
     to cache the execution, taking into account the code, the values of the globals,
-    and the random seed.
+    and the random seed.  When a `cache` is provided, results are also kept in an
+    in-process LRU cache that is consulted first.
 
     `slug` is an arbitrary string, a description that's meaningful to the
     caller, that will be used in log messages.
@@ -100,12 +129,24 @@ def safe_exec(code, globals_dict, random_seed=None, python_path=None, cache=None
         md5er.update(repr(code))
         update_hash(md5er, safe_globals)
         key = "safe_exec.%r.%s" % (random_seed, md5er.hexdigest())
-        cached = cache.get(key)
+        cached = local_cache.get(key)
+        if cached is None:
+            cached = get_shared(cache, key)
+            if cached is not None:
+                SHARED_CACHE_STATS['hits'] += 1
+                dog_stats_api.increment('capa.safe_exec.cache', tags=['result:shared_hit'])
+                local_cache.set(key, cached, result_size(cached))
+            else:
+                SHARED_CACHE_STATS['misses'] += 1
+                dog_stats_api.increment('capa.safe_exec.cache', tags=['result:miss'])
+        else:
+            dog_stats_api.increment('capa.safe_exec.cache', tags=['result:local_hit'])
         if cached is not None:
             # We have a cached result.  The result is a pair: the exception
             # message, if any, else None; and the resulting globals dictionary.
+            # The cached globals are shared with other callers, so copy them.
             emsg, cleaned_results = cached
-            globals_dict.update(cleaned_results)
+            globals_dict.update(copy.deepcopy(cleaned_results))
             if emsg:
                 raise SafeExecException(emsg)
             return
@@ -134,7 +175,8 @@ def safe_exec(code, globals_dict, random_seed=None, python_path=None, cache=None
     # the globals dict might not be entirely serializable.
     if cache:
         cleaned_results = json_safe(globals_dict)
-        cache.set(key, (emsg, cleaned_results))
+        size = set_shared(cache, key, (emsg, cleaned_results))
+        local_cache.set(key, (emsg, copy.deepcopy(cleaned_results)), size)
 
     # If an exception happened, raise it now.
     if emsg:
@@ -9,7 +9,9 @@ import unittest
 
 from nose.plugins.skip import SkipTest
 
-from capa.safe_exec import safe_exec, update_hash
+from capa.safe_exec import safe_exec, update_hash, cache_stats
+from capa.safe_exec import cache as safe_exec_cache
+from capa.safe_exec.safe_exec import local_cache
 from codejail.safe_exec import SafeExecException
 from codejail.jail_code import is_configured
 
@@ -110,6 +112,12 @@ class DictCache(object):
 class TestSafeExecCaching(unittest.TestCase):
     """Test that caching works on safe_exec."""
 
+    def setUp(self):
+        super(TestSafeExecCaching, self).setUp()
+        # The in-process cache would hide the fiddling done to the shared
+        # cache by these tests, so start each one with it empty.
+        local_cache.clear()
+
     def test_cache_miss_then_hit(self):
         g = {}
         cache = {}
@@ -122,6 +130,7 @@ class TestSafeExecCaching(unittest.TestCase):
 
         # Fiddle with the cache, then try it again.
         cache[cache.keys()[0]] = (None, {'a': 17})
+        local_cache.clear()
 
         g = {}
         safe_exec("a = int(math.pi)", g, cache=DictCache(cache))
@@ -153,6 +162,7 @@ class TestSafeExecCaching(unittest.TestCase):
 
         # Change the value stored in the cache, the result should change.
         cache[cache.keys()[0]] = ("Hey there!", {})
+        local_cache.clear()
 
         with self.assertRaises(SafeExecException):
             safe_exec(code, g, cache=DictCache(cache))
@@ -163,6 +173,7 @@ class TestSafeExecCaching(unittest.TestCase):
 
         # Change it again, now no exception!
         cache[cache.keys()[0]] = (None, {'a': 17})
+        local_cache.clear()
         safe_exec(code, g, cache=DictCache(cache))
         self.assertEqual(g['a'], 17)
 
@@ -177,6 +188,102 @@ class TestSafeExecCaching(unittest.TestCase):
                 self.fail("Tried executing code with non-ASCII unicode: {0}".format(code))
 
 
+    def test_local_cache_answers_before_shared_cache(self):
+        cache = {}
+        safe_exec("a = int(math.pi)", {}, cache=DictCache(cache))
+
+        # Even with the shared cache changed, the local cache answers.
+        cache[cache.keys()[0]] = (None, {'a': 17})
+        g = {}
+        safe_exec("a = int(math.pi)", g, cache=DictCache(cache))
+        self.assertEqual(g['a'], 3)
+
+        # Nothing is needed from the shared cache at all.
+        g = {}
+        safe_exec("a = int(math.pi)", g, cache=DictCache({}))
+        self.assertEqual(g['a'], 3)
+
+    def test_cached_results_are_not_shared(self):
+        cache = {}
+        g = {}
+        safe_exec("a = [1, 2, 3]", g, cache=DictCache(cache))
+        g['a'].append(4)
+
+        g = {}
+        safe_exec("a = [1, 2, 3]", g, cache=DictCache(cache))
+        self.assertEqual(g['a'], [1, 2, 3])
+
+    def test_cache_stats(self):
+        before = cache_stats()
+        cache = {}
+        safe_exec("a = 1", {}, cache=DictCache(cache))
+        safe_exec("a = 1", {}, cache=DictCache(cache))
+        local_cache.clear()
+        safe_exec("a = 1", {}, cache=DictCache(cache))
+        after = cache_stats()
+
+        self.assertEqual(after['shared']['misses'] - before['shared']['misses'], 1)
+        self.assertEqual(after['shared']['hits'] - before['shared']['hits'], 1)
+        self.assertEqual(after['local']['entries'], 1)
+        self.assertEqual(after['local']['misses'] - before['local']['misses'], 2)
+        self.assertEqual(after['local']['hits'] - before['local']['hits'], 1)
+
+    def test_large_results_are_compressed(self):
+        code = "a = 'x' * 100000"
+        cache = {}
+        safe_exec(code, {}, cache=DictCache(cache))
+        self.assertIn('zlib', cache.values()[0])
+
+        local_cache.clear()
+        g = {}
+        safe_exec(code, g, cache=DictCache(cache))
+        self.assertEqual(g['a'], 'x' * 100000)
+
+
+class TestSharedCacheStorage(unittest.TestCase):
+    """Test how safe_exec results are stored in the shared cache."""
+
+    def setUp(self):
+        super(TestSharedCacheStorage, self).setUp()
+        self.old_chunk_size = safe_exec_cache.MAX_CHUNK_SIZE
+        safe_exec_cache.MAX_CHUNK_SIZE = 100
+
+    def tearDown(self):
+        safe_exec_cache.MAX_CHUNK_SIZE = self.old_chunk_size
+        super(TestSharedCacheStorage, self).tearDown()
+
+    def big_result(self):
+        """A result that won't compress into a single 100-byte chunk."""
+        r = random.Random(42)
+        return [None, {'a': [r.random() for _ in xrange(2000)]}]
+
+    def test_small_values_are_stored_unchanged(self):
+        cache = {}
+        safe_exec_cache.set_shared(DictCache(cache), "key", (None, {'a': 1}))
+        self.assertEqual(cache, {"key": (None, {'a': 1})})
+        self.assertEqual(safe_exec_cache.get_shared(DictCache(cache), "key"), (None, {'a': 1}))
+
+    def test_chunked_round_trip(self):
+        cache = {}
+        result = self.big_result()
+        safe_exec_cache.set_shared(DictCache(cache), "key", result)
+        self.assertGreater(cache["key"]['zlib_chunks'], 1)
+        self.assertEqual(len(cache), cache["key"]['zlib_chunks'] + 1)
+        self.assertEqual(safe_exec_cache.get_shared(DictCache(cache), "key"), result)
+
+    def test_missing_chunk_is_a_miss(self):
+        cache = {}
+        safe_exec_cache.set_shared(DictCache(cache), "key", self.big_result())
+        del cache["key.1"]
+        self.assertIsNone(safe_exec_cache.get_shared(DictCache(cache), "key"))
+
+    def test_corrupted_chunk_is_a_miss(self):
+        cache = {}
+        safe_exec_cache.set_shared(DictCache(cache), "key", self.big_result())
+        cache["key.0"] = "x" * len(cache["key.0"])
+        self.assertIsNone(safe_exec_cache.get_shared(DictCache(cache), "key"))
+
+
 class TestUpdateHash(unittest.TestCase):
     """Test the safe_exec.update_hash function to be sure it canonicalizes properly."""
 
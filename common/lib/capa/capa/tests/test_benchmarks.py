@@ -0,0 +1,35 @@
+"""
+Make sure the benchmark problems keep working, so that the benchmarks measure
+what they claim to.
+"""
+
+import json
+import unittest
+
+from capa.benchmarks.problems import PROBLEMS
+from capa.benchmarks.run import benchmark_capa_system, new_problem, run_benchmarks
+
+
+class BenchmarkProblemsTest(unittest.TestCase):
+
+    def test_problems_render_and_grade(self):
+        capa_system = benchmark_capa_system()
+        for problem in PROBLEMS:
+            instance = new_problem(problem.xml, capa_system)
+            self.assertTrue(instance.get_html())
+            self.assertEqual(set(problem.answers), set(instance.inputs), problem.name)
+            correct_map = instance.grade_answers(problem.answers)
+            for answer_id in problem.answers:
+                self.assertIn(correct_map.get_correctness(answer_id), ('correct', 'incorrect'), problem.name)
+
+    def test_run_benchmarks(self):
+        results = run_benchmarks(number=1, repeat=1, name_filter=r'^capa\.render\.choice$|^calc\.')
+        names = [result['name'] for result in results['results']]
+        self.assertIn('capa.render.choice', names)
+        self.assertIn('calc.evaluator_vectorized.polynomial', names)
+        self.assertNotIn('capa.grade.choice', names)
+        for result in results['results']:
+            self.assertGreater(result['best'], 0)
+            self.assertLessEqual(result['best'], result['median'])
+        # The results are written as JSON.
+        json.dumps(results)
@@ -293,6 +293,41 @@ class TextLineTest(unittest.TestCase):
             self.assertEqual(context, expected)
 
 
+class CompiledTemplateTest(unittest.TestCase):
+    '''
+    Check that input types render with compiled templates when they can.
+    '''
+
+    def test_compiled_once(self):
+        compiled = []
+
+        def compile_template(template):
+            """Compile a template rendering the input id."""
+            compiled.append(template)
+            return lambda context: '<div>{0}</div>'.format(context['id'])
+
+        def render_template(template, context):
+            """Fail: the compiled template should be used."""
+            raise AssertionError("render_template called for {0}".format(template))
+
+        render_template.compile_template = compile_template
+        capa_system = test_capa_system()
+        capa_system.render_template = render_template
+
+        for input_id in ['prob_1_2', 'prob_1_3']:
+            element = etree.fromstring('<textline id="{0}"/>'.format(input_id))
+            the_input = lookup_tag('textline')(capa_system, element, {})
+            self.assertEqual(the_input.get_html().text, input_id)
+
+        self.assertEqual(compiled, ['textline.html'])
+
+    def test_render_template_fallback(self):
+        element = etree.fromstring('<textline id="prob_1_2"/>')
+        the_input = lookup_tag('textline')(test_capa_system(), element, {})
+        self.assertIsNone(the_input.get_compiled_template(the_input.capa_system.render_template))
+        self.assertEqual(the_input.get_html().tag, 'div')
+
+
 class FileSubmissionTest(unittest.TestCase):
     '''
     Check that file submission inputs work
@@ -15,9 +15,10 @@ import mock
 
 from . import new_loncapa_problem, test_capa_system
 import calc
+import capa.safe_exec
 
 from capa.responsetypes import LoncapaProblemError, \
-    StudentInputError, ResponseError
+    StudentInputError, ResponseError, CUSTOMRESPONSE_BATCH_SIZE
 from capa.correctmap import CorrectMap
 from capa.util import convert_files_to_filenames
 from capa.xqueue_interface import dateformat
@@ -355,6 +356,40 @@ class OptionResponseTest(ResponseTest):
         self.assert_grade(problem, "hasn\'t", "correct")
         self.assert_grade(problem, "has'nt", "incorrect")
 
+    def test_rescore_loaded_state(self):
+        # One problem can rescore the stored answers of several students
+        problem = self.build_problem(options=["first", "second"],
+                                     correct_option="second")
+
+        for answer, expected_correctness in [("first", "incorrect"), ("second", "correct")]:
+            problem.load_state({
+                'seed': problem.seed,
+                'student_answers': {'1_2_1': answer},
+                'done': True,
+            })
+            correct_map = problem.rescore_existing_answers()
+            self.assertEquals(correct_map.get_correctness('1_2_1'), expected_correctness)
+            self.assertEquals(problem.get_state()['student_answers'], {'1_2_1': answer})
+
+    def test_rescore_states(self):
+        problem = self.build_problem(options=["first", "second"],
+                                     correct_option="second")
+        states = [
+            {'seed': problem.seed, 'student_answers': {'1_2_1': answer}, 'done': True}
+            for answer in ["first", "second"]
+        ]
+        correct_maps = problem.rescore_states(states)
+        self.assertEquals(
+            [correct_map.get_correctness('1_2_1') for correct_map in correct_maps],
+            ["incorrect", "correct"]
+        )
+
+    def test_load_state_for_other_seed(self):
+        problem = self.build_problem(options=["first", "second"],
+                                     correct_option="second")
+        with self.assertRaises(LoncapaProblemError):
+            problem.load_state({'seed': problem.seed + 1})
+
 
 class FormulaResponseTest(ResponseTest):
     """
@@ -1427,6 +1462,123 @@ class CustomResponseTest(ResponseTest):
         self.assertEqual(correctness, 'incorrect')
         self.assertEqual(msg, "Message text")
 
+    def test_function_code_batch(self):
+        # Submissions can be checked together, in a single sandboxed execution,
+        # and the ones whose check fails are checked again on their own
+        script = textwrap.dedent("""
+            def check_func(expect, answer_given):
+                if answer_given == 'oops':
+                    raise ValueError('bad answer')
+                return {'ok': answer_given == expect, 'msg': 'Message text'}
+        """)
+
+        problem = self.build_problem(script=script, cfn="check_func", expect="42")
+        responder = problem.responders.values()[0]
+
+        with mock.patch('capa.responsetypes.safe_exec.safe_exec', wraps=capa.safe_exec.safe_exec) as mock_safe_exec:
+            scores = responder.get_scores([
+                {'1_2_1': '42'},
+                {'1_2_1': 'oops'},
+                {'1_2_1': '0'},
+                {'1_2_1': ''},
+            ])
+        self.assertEqual(mock_safe_exec.call_count, 2)
+
+        self.assertEqual(scores[0].get_correctness('1_2_1'), 'correct')
+        self.assertEqual(scores[0].get_msg('1_2_1'), 'Message text')
+
+        # An error only fails the submission that caused it
+        self.assertIsInstance(scores[1][1], ResponseError)
+        with self.assertRaises(ResponseError) as context:
+            problem.grade_answers({'1_2_1': 'oops'})
+        self.assertEqual(scores[1][1].message, context.exception.message)
+
+        self.assertEqual(scores[2].get_correctness('1_2_1'), 'incorrect')
+
+        # Empty answers aren't checked
+        self.assertEqual(scores[3].get_correctness('1_2_1'), 'incorrect')
+        self.assertEqual(scores[3].get_msg('1_2_1'), '')
+
+    def test_function_code_batch_randomization(self):
+        # Each submission of a batch sees the same random numbers as when
+        # it is checked on its own
+        script = textwrap.dedent("""
+            def check_func(expect, answer_given):
+                return {'ok': True, 'msg': str(random.randint(0, 1e9))}
+        """)
+        problem = self.build_problem(script=script, cfn="check_func", expect="42")
+        responder = problem.responders.values()[0]
+
+        msg = problem.grade_answers({'1_2_1': '42'}).get_msg('1_2_1')
+        scores = responder.get_scores([{'1_2_1': '1'}, {'1_2_1': '2'}])
+        self.assertEqual([score.get_msg('1_2_1') for score in scores], [msg, msg])
+
+    def test_function_code_batch_globals(self):
+        # Globals set while checking one submission of a batch are gone when
+        # checking the next one
+        script = textwrap.dedent("""
+            def check_func(expect, answer_given):
+                global checked
+                ok = 'checked' not in globals()
+                checked = True
+                return {'ok': ok}
+        """)
+        problem = self.build_problem(script=script, cfn="check_func", expect="42")
+        responder = problem.responders.values()[0]
+
+        scores = responder.get_scores([{'1_2_1': '1'}, {'1_2_1': '2'}])
+        self.assertEqual([score.get_correctness('1_2_1') for score in scores], ['correct', 'correct'])
+
+    def test_function_code_batch_shared_objects(self):
+        # Objects changed in place while checking one submission of a batch
+        # aren't seen when checking the next one, so batched and single
+        # checks give the same results
+        script = textwrap.dedent("""
+            seen = []
+            def check_func(expect, answer_given):
+                seen.append(answer_given)
+                return {'ok': len(seen) == 1, 'msg': ','.join(seen)}
+        """)
+        problem = self.build_problem(script=script, cfn="check_func", expect="42")
+        responder = problem.responders.values()[0]
+
+        student_answers_list = [{'1_2_1': '1'}, {'1_2_1': '2'}]
+        single = [problem.grade_answers(student_answers) for student_answers in student_answers_list]
+        scores = responder.get_scores(student_answers_list)
+        self.assertEqual(
+            [(score.get_correctness('1_2_1'), score.get_msg('1_2_1')) for score in scores],
+            [(score.get_correctness('1_2_1'), score.get_msg('1_2_1')) for score in single]
+        )
+        self.assertEqual([score.get_msg('1_2_1') for score in scores], ['1', '2'])
+
+    def test_function_code_batch_chunks(self):
+        # Large batches are split into several sandboxed executions, and a
+        # failing execution only makes its own submissions be checked one by one
+        script = textwrap.dedent("""
+            def check_func(expect, answer_given):
+                return {'ok': answer_given == expect}
+        """)
+        problem = self.build_problem(script=script, cfn="check_func", expect="42")
+        responder = problem.responders.values()[0]
+        batch_code = responder.batch_code
+        calls = []
+
+        def failing_first_batch(expect, answers):
+            calls.append(answers)
+            if len(calls) == 1:
+                raise Exception('sandbox failure')
+            return batch_code(expect, answers)
+
+        student_answers_list = [{'1_2_1': '42'}] * (CUSTOMRESPONSE_BATCH_SIZE + 1)
+        with mock.patch.object(responder, 'batch_code', side_effect=failing_first_batch):
+            scores = responder.get_scores(student_answers_list)
+
+        self.assertEqual([len(answers) for answers in calls], [CUSTOMRESPONSE_BATCH_SIZE, 1])
+        self.assertEqual(
+            [score.get_correctness('1_2_1') for score in scores],
+            ['correct'] * (CUSTOMRESPONSE_BATCH_SIZE + 1)
+        )
+
     def test_function_code_multiple_input_no_msg(self):
 
         # Check functions also have the option of returning
@@ -1,12 +1,18 @@
 from __future__ import division
 from fractions import Fraction
+import functools
 
+from calc.lru import LRUCache
 from pyparsing import (Literal, StringEnd, OneOrMore, ParseException)
-import nltk
-from nltk.tree import Tree
+
+# nltk is slow to import, so it is only imported when the first expression is
+# parsed; see _get_parser.
 
 ARROWS = ('<->', '->')
 
+# How many parsed expressions to remember.
+PARSE_CACHE_SIZE = 1000
+
 ## Defines a simple pyparsing tokenizer for chemical equations
 elements = ['Ac', 'Ag', 'Al', 'Am', 'Ar', 'As', 'At', 'Au', 'B', 'Ba', 'Be',
             'Bh', 'Bi', 'Bk', 'Br', 'C', 'Ca', 'Cd', 'Ce', 'Cf', 'Cl', 'Cm',
@@ -22,8 +28,6 @@ elements = ['Ac', 'Ag', 'Al', 'Am', 'Ar', 'As', 'At', 'Au', 'B', 'Ba', 'Be',
 digits = map(str, range(10))
 symbols = list("[](){}^+-/")
 phases = ["(s)", "(l)", "(g)", "(aq)"]
-tokens = reduce(lambda a, b: a ^ b, map(Literal, elements + digits + symbols + phases))
-tokenizer = OneOrMore(tokens) + StringEnd()
 
 
 def _orjoin(l):
@@ -51,7 +55,27 @@ grammar = """
 
   suffixed -> unsuffixed | unsuffixed suffix
 """
-parser = nltk.ChartParser(nltk.parse_cfg(grammar))
+
+_tokenizer = None
+_parser = None
+
+
+def _get_tokenizer():
+    ''' Return the pyparsing tokenizer, building it on first use '''
+    global _tokenizer
+    if _tokenizer is None:
+        tokens = reduce(lambda a, b: a ^ b, map(Literal, elements + digits + symbols + phases))
+        _tokenizer = OneOrMore(tokens) + StringEnd()
+    return _tokenizer
+
+
+def _get_parser():
+    ''' Return the NLTK chart parser, building it on first use '''
+    global _parser
+    if _parser is None:
+        import nltk
+        _parser = nltk.ChartParser(nltk.parse_cfg(grammar))
+    return _parser
 
 
 def _clean_parse_tree(tree):
@@ -59,6 +83,8 @@ def _clean_parse_tree(tree):
     nodes. E.g. paren_groups have groups as children, etc. This will
     clean up the tree.
     '''
+    import nltk
+
     def unparse_number(n):
         ''' Go from a number parse tree to a number '''
         if len(n) == 1:
@@ -119,6 +145,8 @@ def _merge_children(tree, tags):
     (group 1 (group 2 (group 3 (group 4))))
     We do the cleanup of converting from the latter to the former.
     '''
+    import nltk
+
     if tree is None:
         # There was a problem--shouldn't have empty trees (NOTE: see this with input e.g. 'H2O(', or 'Xe+').
         # Haven't grokked the code to tell if this is indeed the right thing to do.
@@ -235,14 +263,44 @@ def render_to_html(eq):
     return spanify(render_expression(left) + render_arrow(arrow) + render_expression(right))
 
 
+def _cache_parse(func):
+    '''
+    Keep the results of `func(s)` in a least-recently-used cache.
+
+    A ParseException raised by `func` is remembered too, and raised again
+    without parsing when the same string comes back, and so is a None result,
+    for strings which tokenize but don't parse.
+    '''
+    cache = LRUCache(PARSE_CACHE_SIZE)
+    missing = object()
+
+    @functools.wraps(func)
+    def cached_func(s):
+        result = cache.get(s, missing)
+        if result is missing:
+            try:
+                result = func(s)
+            except ParseException as error:
+                result = error
+            cache.set(s, result)
+        if isinstance(result, ParseException):
+            raise result
+        return result
+
+    cached_func.cache = cache
+    return cached_func
+
+
+@_cache_parse
 def _get_final_tree(s):
     '''
     Return final tree after merge and clean.
 
-    Raises pyparsing.ParseException if s is invalid.
+    Raises pyparsing.ParseException if s is invalid.  Trees are cached and
+    shared between callers, so they must not be modified.
     '''
-    tokenized = tokenizer.parseString(s)
-    parsed = parser.parse(tokenized)
+    tokenized = _get_tokenizer().parseString(s)
+    parsed = _get_parser().parse(tokenized)
     merged = _merge_children(parsed, {'S', 'group'})
     final = _clean_parse_tree(merged)
     return final
@@ -293,6 +351,8 @@ def divide_chemical_expression(s1, s2, ignore_state=False):
 
     '''
 
+    from nltk.tree import Tree
+
     # parsed final trees
     treedic = {}
     treedic['1'] = _get_final_tree(s1)
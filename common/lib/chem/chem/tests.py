@@ -2,6 +2,10 @@ import codecs
 from fractions import Fraction
 import unittest
 
+from mock import patch
+from pyparsing import ParseException
+
+from . import chemcalc
 from .chemcalc import (compare_chemical_expression, divide_chemical_expression,
                       render_to_html, chemical_equations_equal)
 
@@ -318,6 +322,50 @@ class Test_Render_Equations(unittest.TestCase):
         self.assertEqual(out, correct)
 
 
+class Test_Parse_Cache(unittest.TestCase):
+    ''' Tests for the cache of parsed expressions. '''
+
+    def setUp(self):
+        chemcalc._get_final_tree.cache.clear()
+
+    def test_tree_is_reused(self):
+        tree = chemcalc._get_final_tree('2H2O(l)')
+        self.assertIs(tree, chemcalc._get_final_tree('2H2O(l)'))
+        self.assertEqual(len(chemcalc._get_final_tree.cache), 1)
+
+    def test_results_unchanged_by_cache(self):
+        for _ in range(2):
+            self.assertEqual(divide_chemical_expression('2H2O(s) + 2CO2', 'H2O(s)+CO2'), 2)
+            self.assertTrue(chemical_equations_equal('H2 + O2 -> H2O2', '2O2 + 2H2 -> 2H2O2'))
+            self.assertEqual(render_to_html('H2O'), '<span class="math">H<sub>2</sub>O</span>')
+
+    def test_parse_errors_are_cached(self):
+        for _ in range(2):
+            with self.assertRaises(ParseException):
+                chemcalc._get_final_tree('H2O(')
+        self.assertEqual(len(chemcalc._get_final_tree.cache), 1)
+
+    def test_unparsed_results_are_cached(self):
+        with patch.object(chemcalc, '_clean_parse_tree', return_value=None) as clean_parse_tree:
+            for _ in range(2):
+                self.assertIsNone(chemcalc._get_final_tree('H2O'))
+        self.assertEqual(clean_parse_tree.call_count, 1)
+
+    def test_cache_is_bounded(self):
+        cache = chemcalc._get_final_tree.cache
+        old_size = cache.max_size
+        cache.max_size = 2
+        try:
+            for formula in ('H2O', 'CO2', 'O2', 'H2'):
+                chemcalc._get_final_tree(formula)
+            self.assertEqual(len(cache), 2)
+            self.assertIsNone(cache.get('CO2'))
+            self.assertIsNotNone(cache.get('O2'))
+            self.assertIsNotNone(cache.get('H2'))
+        finally:
+            cache.max_size = old_size
+
+
 class Test_Crystallography_Miller(unittest.TestCase):
     ''' Tests  for crystallography grade function.'''
 
@@ -459,6 +507,7 @@ def suite():
     testcases = [Test_Compare_Expressions,
                  Test_Divide_Expressions,
                  Test_Render_Equations,
+                 Test_Parse_Cache,
                  Test_Crystallography_Miller]
     suites = []
     for testcase in testcases:
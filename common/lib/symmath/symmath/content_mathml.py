@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+"""
+Convert presentation MathML to content MathML, in process.
+
+Only the subset of presentation MathML produced by ASCIIMathML for the
+formulas that `formula.make_sympy` can interpret is handled: numbers,
+identifiers, + - * / and implicit products, fractions, powers, roots, the
+functions known to `make_sympy`, parentheses, and bracketed lists and
+matrices.  Anything else raises `UnsupportedMathML`, so that the caller can
+fall back to another converter (the remote snuggletex service).
+"""
+
+import re
+from lxml import etree
+
+MATHML_NAMESPACE = 'http://www.w3.org/1998/Math/MathML'
+
+# Function names, as they appear in <mi> elements, that make_sympy applies.
+FUNCTIONS = set([
+    'sin', 'cos', 'tan', 'cot', 'sinh', 'cosh', 'coth', 'tanh',
+    'asin', 'acos', 'atan', 'acot', 'asinh', 'acosh', 'atanh', 'acoth',
+    'exp', 'log', 'ln',
+])
+
+# ASCIIMathML turns f and g into functions: "f(x)" is a function application,
+# not a product, and isn't something make_sympy supports.
+FUNCTION_LIKE_IDENTIFIERS = ('f', 'g')
+
+TIMES_OPERATORS = (u'*', u'⋅', u'·', u'×')
+PLUS_MINUS_OPERATORS = (u'+', u'-', u'−')
+
+
+class UnsupportedMathML(Exception):
+    """
+    Raised for presentation MathML this converter can't handle.
+    """
+    pass
+
+
+def gettag(xml):
+    """
+    Return the tag of an element, without its namespace.
+    """
+    return re.sub('{http://[^}]+}', '', xml.tag)
+
+
+def pmathml_to_cmathml(pmathml):
+    """
+    Convert a presentation MathML string (or element) to a content MathML string.
+
+    Raises UnsupportedMathML if the input uses constructs outside the
+    supported subset.
+    """
+    if isinstance(pmathml, basestring):
+        try:
+            pmathml = etree.fromstring(pmathml)
+        except etree.XMLSyntaxError as err:
+            raise UnsupportedMathML('invalid xml: %s' % err)
+
+    if gettag(pmathml) != 'math':
+        raise UnsupportedMathML('expected a <math> element, got <%s>' % gettag(pmathml))
+
+    content = _convert_row(list(pmathml))
+    math = etree.Element('math', nsmap={None: MATHML_NAMESPACE})
+    math.append(content)
+    return etree.tostring(math, encoding=unicode)
+
+
+def _element(tag, text=None, children=()):
+    """
+    Build a content MathML element.
+    """
+    elt = etree.Element(tag)
+    elt.text = text
+    for child in children:
+        elt.append(child)
+    return elt
+
+
+def _apply(operator, *args):
+    """
+    Build <apply><operator/>args...</apply>.
+    """
+    return _element('apply', children=[_element(operator)] + list(args))
+
+
+def _text(xml):
+    """
+    The stripped text of an element, which must not have children.
+    """
+    if len(xml):
+        raise UnsupportedMathML('unexpected children in <%s>' % gettag(xml))
+    return (xml.text or u'').strip()
+
+
+def _is_bracketed(xml, opening, closing):
+    """
+    Whether `xml` is an mrow wrapped in the given bracket operators.
+    """
+    return (
+        gettag(xml) == 'mrow' and len(xml) >= 2 and
+        gettag(xml[0]) == 'mo' and _text(xml[0]) == opening and
+        gettag(xml[-1]) == 'mo' and _text(xml[-1]) == closing
+    )
+
+
+def _convert_symbol_part(xml):
+    """
+    Check a part of a subscripted identifier, and return a copy of it.
+
+    make_sympy reads these back with its parsePresentationMathMLSymbol.
+    """
+    tag = gettag(xml)
+    if tag in ('mi', 'mn'):
+        return _element(tag, _text(xml))
+    if tag in ('msub', 'msup'):
+        return _element(tag, children=[_convert_symbol_part(child) for child in xml])
+    raise UnsupportedMathML('unsupported <%s> in a subscript' % tag)
+
+
+def _convert_node(xml):
+    """
+    Convert one presentation element that stands for a value.
+    """
+    tag = gettag(xml)
+
+    if tag == 'mn':
+        return _element('cn', _text(xml))
+
+    if tag == 'mi':
+        name = _text(xml)
+        if not name or name in FUNCTIONS:
+            raise UnsupportedMathML('misplaced identifier %r' % name)
+        return _element('ci', name)
+
+    if tag == 'msub':
+        if len(xml) != 2:
+            raise UnsupportedMathML('<msub> needs two children')
+        return _element('ci', children=[_convert_symbol_part(xml)])
+
+    if tag == 'msup':
+        if len(xml) != 2:
+            raise UnsupportedMathML('<msup> needs two children')
+        return _apply('power', _convert_node(xml[0]), _convert_node(xml[1]))
+
+    if tag == 'mfrac':
+        if len(xml) != 2:
+            raise UnsupportedMathML('<mfrac> needs two children')
+        return _apply('divide', _convert_node(xml[0]), _convert_node(xml[1]))
+
+    if tag == 'msqrt':
+        return _apply('root', _convert_row(list(xml)))
+
+    if tag == 'mroot':
+        if len(xml) != 2:
+            raise UnsupportedMathML('<mroot> needs two children')
+        index = _apply('divide', _element('cn', '1'), _convert_node(xml[1]))
+        return _apply('power', _convert_node(xml[0]), index)
+
+    if tag == 'mstyle':
+        return _convert_row(list(xml))
+
+    if tag == 'mrow':
+        if _is_bracketed(xml, u'(', u')'):
+            return _convert_row(list(xml)[1:-1])
+        if _is_bracketed(xml, u'[', u']'):
+            return _convert_brackets(list(xml)[1:-1])
+        return _convert_row(list(xml))
+
+    raise UnsupportedMathML('unsupported element <%s>' % tag)
+
+
+def _convert_brackets(children):
+    """
+    Convert the inside of square brackets: a matrix, or a list of values.
+    """
+    if len(children) == 1 and gettag(children[0]) == 'mtable':
+        rows = []
+        for mtr in children[0]:
+            if gettag(mtr) != 'mtr':
+                raise UnsupportedMathML('unsupported <%s> in a table' % gettag(mtr))
+            cells = []
+            for mtd in mtr:
+                if gettag(mtd) != 'mtd':
+                    raise UnsupportedMathML('unsupported <%s> in a table row' % gettag(mtd))
+                cells.append(_convert_row(list(mtd)))
+            rows.append(_element('vector', children=cells))
+        return _element('matrix', children=rows)
+
+    items = [[]]
+    for child in children:
+        if gettag(child) == 'mo' and _text(child) == u',':
+            items.append([])
+        else:
+            items[-1].append(child)
+    return _element('list', children=[_convert_row(item) for item in items])
+
+
+def _convert_row(children):
+    """
+    Convert a sequence of presentation elements forming one expression.
+    """
+    return _RowParser(children).parse()
+
+
+class _RowParser(object):
+    """
+    Recursive descent parser over the children of a presentation row.
+
+        expression := ['+'|'-'] term (('+'|'-') term)*
+        term       := factor (('*'|'/'|<nothing>) factor)*
+        factor     := '-' factor | function factor | value
+    """
+    def __init__(self, children):
+        self.children = [child for child in children if not isinstance(child, etree._Comment)]
+        self.pos = 0
+
+    def parse(self):
+        """
+        Return the content MathML element for the whole row.
+        """
+        if not self.children:
+            raise UnsupportedMathML('empty expression')
+        result = self.expression()
+        if self.pos != len(self.children):
+            raise UnsupportedMathML('unexpected %s' % etree.tostring(self.children[self.pos]))
+        return result
+
+    def peek(self):
+        """
+        Return the next child, or None at the end of the row.
+        """
+        if self.pos < len(self.children):
+            return self.children[self.pos]
+        return None
+
+    def peek_operator(self):
+        """
+        Return the text of the next child if it's an operator, else None.
+        """
+        child = self.peek()
+        if child is not None and gettag(child) == 'mo':
+            return _text(child)
+        return None
+
+    def expression(self):
+        """
+        Parse a sum or difference of terms.
+        """
+        sign = self.peek_operator()
+        if sign in PLUS_MINUS_OPERATORS:
+            self.pos += 1
+        result = self.term()
+        if sign in (u'-', u'−'):
+            result = _apply('minus', result)
+
+        while self.peek_operator() in PLUS_MINUS_OPERATORS:
+            operator = self.peek_operator()
+            self.pos += 1
+            operand = self.term()
+            if operator == u'+':
+                if gettag(result) == 'apply' and gettag(result[0]) == 'plus':
+                    result.append(operand)
+                else:
+                    result = _apply('plus', result, operand)
+            else:
+                result = _apply('minus', result, operand)
+        return result
+
+    def term(self):
+        """
+        Parse a product or quotient of factors.
+        """
+        result = self.factor()
+        while True:
+            operator = self.peek_operator()
+            if operator in TIMES_OPERATORS or operator == u'/':
+                self.pos += 1
+            elif self.peek() is None or operator is not None:
+                return result
+            else:
+                # Implicit multiplication, like "2x".
+                previous = self.children[self.pos - 1]
+                if (gettag(previous) == 'mi' and _text(previous) in FUNCTION_LIKE_IDENTIFIERS and
+                        _is_bracketed(self.peek(), u'(', u')')):
+                    raise UnsupportedMathML('function application of %s' % _text(previous))
+
+            operand = self.factor()
+            if operator == u'/':
+                result = _apply('divide', result, operand)
+            elif gettag(result) == 'apply' and gettag(result[0]) == 'times':
+                result.append(operand)
+            else:
+                result = _apply('times', result, operand)
+
+    def factor(self):
+        """
+        Parse a negated factor, a function application or a single value.
+        """
+        child = self.peek()
+        if child is None:
+            raise UnsupportedMathML('missing operand')
+        self.pos += 1
+
+        tag = gettag(child)
+        if tag == 'mo':
+            if _text(child) in (u'-', u'−'):
+                return _apply('minus', self.factor())
+            raise UnsupportedMathML('unexpected operator %r' % _text(child))
+        if tag == 'mi' and _text(child) in FUNCTIONS:
+            return _apply(_text(child), self.factor())
+        return _convert_node(child)
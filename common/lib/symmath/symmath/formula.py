@@ -30,12 +30,27 @@ from lxml import etree
 #import subprocess
 from copy import deepcopy
 
+from calc.lru import LRUCache
+
+from .content_mathml import pmathml_to_cmathml, UnsupportedMathML
+
 log = logging.getLogger(__name__)
 
 log.warning("Dark code. Needs review before enabling in prod.")
 
 os.environ['PYTHONIOENCODING'] = 'utf-8'
 
+# Presentation MathML the local converter can't handle is sent to this
+# snuggletex server instead.  Set to None to never leave the process.
+SNUGGLETEX_URL = 'https://math-xserver.mitx.mit.edu/snuggletex-webapp-1.2.2/ASCIIMathMLUpConversionDemo'
+
+# Content MathML conversions, keyed by presentation MathML.
+CMATHML_CACHE_SIZE = 1000
+_cmathml_cache = LRUCache(CMATHML_CACHE_SIZE)
+
+# make_sympy recognizes this in the content MathML to report bad input.
+CONVERSION_FAILED = 'conversion from Presentation MathML to Content MathML was not successful'
+
 #-----------------------------------------------------------------------------
 
 
@@ -453,7 +468,7 @@ class formula(object):
                     cmml = self.cmathml
                     xml = etree.fromstring(str(cmml))
                 except Exception, err:
-                    if 'conversion from Presentation MathML to Content MathML was not successful' in cmml:
+                    if CONVERSION_FAILED in cmml:
                         msg = "Illegal math expression"
                     else:
                         msg = 'Err %s while converting cmathml to xml; cmml=%s' % (err, cmml)
@@ -598,12 +613,37 @@ class formula(object):
     sympy = property(make_sympy, None, None, 'sympy representation')
 
     def GetContentMathML(self, asciimath, mathml):
+        """
+        Convert the presentation MathML `mathml` to content MathML.
+
+        The conversion is done in process when possible, and falls back to
+        the snuggletex server at SNUGGLETEX_URL otherwise.  The local conversions
+        are cached by `mathml`; the server's answers aren't, as they may come
+        from a transient error.
+        """
+        cmathml = _cmathml_cache.get(mathml)
+        if cmathml is not None:
+            return cmathml
+
+        try:
+            cmathml = pmathml_to_cmathml(mathml)
+        except UnsupportedMathML as err:
+            log.debug('Cannot convert pmathml locally (%s); mathml=%s', err, mathml)
+            if SNUGGLETEX_URL is None:
+                # Not valid xml, so make_sympy reports an illegal expression.
+                return 'Error: %s' % CONVERSION_FAILED
+            return self.GetSnuggleTexContentMathML(asciimath, mathml)
+
+        _cmathml_cache.set(mathml, cmathml)
+        return cmathml
+
+    def GetSnuggleTexContentMathML(self, asciimath, mathml):
         """
         Handle requests to snuggletex API to convert the Ascii math to MathML
         """
         # url = 'http://192.168.1.2:8080/snuggletex-webapp-1.2.2/ASCIIMathMLUpConversionDemo'
         # url = 'http://127.0.0.1:8080/snuggletex-webapp-1.2.2/ASCIIMathMLUpConversionDemo'
-        url = 'https://math-xserver.mitx.mit.edu/snuggletex-webapp-1.2.2/ASCIIMathMLUpConversionDemo'
+        url = SNUGGLETEX_URL
 
         if 1:
             payload = {
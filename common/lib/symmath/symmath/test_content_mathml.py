@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the in-process presentation to content MathML conversion
+"""
+
+import sys
+import unittest
+from mock import patch
+
+from .content_mathml import pmathml_to_cmathml, UnsupportedMathML
+from .formula import formula
+
+# The package re-exports the formula class under the module's name.
+formula_module = sys.modules[formula.__module__]
+
+
+def pmathml(body):
+    """Wrap `body` the way ASCIIMathML does"""
+    return (
+        '<math xmlns="http://www.w3.org/1998/Math/MathML">'
+        '<mstyle displaystyle="true">%s</mstyle></math>' % body
+    )
+
+
+def cmathml(body):
+    """Wrap `body` the way pmathml_to_cmathml does"""
+    return '<math xmlns="http://www.w3.org/1998/Math/MathML">%s</math>' % body
+
+
+class ContentMathMLTest(unittest.TestCase):
+
+    def test_sum_and_difference(self):
+        self.assertEqual(
+            pmathml_to_cmathml(pmathml('<mi>x</mi><mo>+</mo><mn>2</mn><mo>-</mo><mi>y</mi>')),
+            cmathml('<apply><minus/><apply><plus/><ci>x</ci><cn>2</cn></apply><ci>y</ci></apply>')
+        )
+
+    def test_products(self):
+        self.assertEqual(
+            pmathml_to_cmathml(pmathml('<mn>2</mn><mi>x</mi><mo>*</mo><mi>y</mi><mo>/</mo><mn>3</mn>')),
+            cmathml(
+                '<apply><divide/><apply><times/><cn>2</cn><ci>x</ci><ci>y</ci></apply><cn>3</cn></apply>'
+            )
+        )
+
+    def test_unary_minus(self):
+        self.assertEqual(
+            pmathml_to_cmathml(pmathml('<mo>-</mo><mi>x</mi><mo>*</mo><mo>-</mo><mn>2</mn>')),
+            cmathml('<apply><minus/><apply><times/><ci>x</ci><apply><minus/><cn>2</cn></apply></apply></apply>')
+        )
+
+    def test_functions_and_parentheses(self):
+        self.assertEqual(
+            pmathml_to_cmathml(pmathml(
+                '<mrow><mi>sin</mi><mrow><mo>(</mo><mi>x</mi><mo>+</mo><mn>1</mn><mo>)</mo></mrow></mrow>'
+            )),
+            cmathml('<apply><sin/><apply><plus/><ci>x</ci><cn>1</cn></apply></apply>')
+        )
+
+    def test_fractions_powers_and_roots(self):
+        self.assertEqual(
+            pmathml_to_cmathml(pmathml(
+                '<mfrac><msup><mi>x</mi><mn>2</mn></msup><msqrt><mi>y</mi></msqrt></mfrac>'
+            )),
+            cmathml(
+                '<apply><divide/><apply><power/><ci>x</ci><cn>2</cn></apply>'
+                '<apply><root/><ci>y</ci></apply></apply>'
+            )
+        )
+
+    def test_subscripts(self):
+        self.assertEqual(
+            pmathml_to_cmathml(pmathml('<msub><mi>a</mi><mn>1</mn></msub>')),
+            cmathml('<ci><msub><mi>a</mi><mn>1</mn></msub></ci>')
+        )
+
+    def test_matrix(self):
+        self.assertEqual(
+            pmathml_to_cmathml(pmathml(
+                '<mrow><mo>[</mo><mtable>'
+                '<mtr><mtd><mn>1</mn></mtd><mtd><mn>0</mn></mtd></mtr>'
+                '<mtr><mtd><mn>0</mn></mtd><mtd><mn>1</mn></mtd></mtr>'
+                '</mtable><mo>]</mo></mrow>'
+            )),
+            cmathml(
+                '<matrix><vector><cn>1</cn><cn>0</cn></vector>'
+                '<vector><cn>0</cn><cn>1</cn></vector></matrix>'
+            )
+        )
+
+    def test_unsupported(self):
+        for body in [
+                '<mi>f</mi><mrow><mo>(</mo><mi>x</mi><mo>)</mo></mrow>',
+                '<mi>x</mi><mo>=</mo><mn>1</mn>',
+                '<mi>x</mi><mo>+</mo>',
+                '<munderover><mo>&#x2211;</mo><mi>i</mi><mi>n</mi></munderover>',
+                '',
+        ]:
+            with self.assertRaises(UnsupportedMathML):
+                pmathml_to_cmathml(pmathml(body))
+
+
+class FormulaConversionTest(unittest.TestCase):
+
+    def setUp(self):
+        formula_module._cmathml_cache.clear()
+
+    @patch.object(formula_module.requests, 'post')
+    def test_no_remote_call(self, mock_post):
+        expr = formula(pmathml(u'<mn>1</mn><mo>+</mo><mfrac><mn>2</mn><mi>α</mi></mfrac>'))
+        self.assertEqual(str(expr.sympy), '1 + 2/alpha')
+        self.assertFalse(mock_post.called)
+
+    @patch.object(formula_module.requests, 'post')
+    def test_conversions_are_cached(self, mock_post):
+        expr = pmathml('<mi>x</mi><mo>+</mo><mn>1</mn>')
+        formula(expr).make_sympy()
+        with patch.object(formula_module, 'pmathml_to_cmathml') as mock_convert:
+            self.assertEqual(str(formula(expr).make_sympy()), 'x + 1')
+            self.assertFalse(mock_convert.called)
+
+    @patch.object(formula_module.requests, 'post')
+    def test_fallback_conversions_are_not_cached(self, mock_post):
+        mock_post.return_value.text = u'<h1>502 Bad Gateway</h1>'
+        expr = pmathml('<mi>x</mi><mo>=</mo><mn>1</mn>')
+        for _ in range(2):
+            formula(expr).GetContentMathML('x=1', expr)
+        self.assertEqual(mock_post.call_count, 2)
+
+    @patch.object(formula_module, 'SNUGGLETEX_URL', None)
+    @patch.object(formula_module.requests, 'post')
+    def test_unsupported_without_fallback(self, mock_post):
+        expr = formula(pmathml('<mi>x</mi><mo>=</mo><mn>1</mn>'))
+        with self.assertRaisesRegexp(Exception, 'Illegal math expression'):
+            expr.make_sympy()
+        self.assertFalse(mock_post.called)
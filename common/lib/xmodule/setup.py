@@ -51,6 +51,7 @@ setup(
     install_requires=[
         'distribute',
         'docopt',
+        'calc',
         'capa',
         'path.py',
         'webob',
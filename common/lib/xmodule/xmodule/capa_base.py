@@ -38,6 +38,11 @@ NUM_RANDOMIZATION_BINS = 20
 # Never produce more than this many different seeds, no matter what.
 MAX_RANDOMIZATION_BINS = 1000
 
+# How long rendered problem html is kept in the runtime's problem_html_cache.
+# Keys change with the student's state, so old entries are never read again
+# and only need to expire.
+PROBLEM_HTML_CACHE_TIMEOUT = 24 * 60 * 60
+
 
 def randomization_bin(seed, problem_id):
     """
@@ -569,7 +574,18 @@ class CapaMixin(CapaFields):
         Return html for the problem.
 
         Adds check, reset, save buttons as necessary based on the problem config and state.
+
+        If the runtime has a `problem_html_cache`, the html is kept there, under a key
+        computed from everything it depends on (see `problem_html_cache_key`), so that
+        it's only rendered again once something has changed.
         """
+        context = self.get_problem_html_context()
+        html_cache = getattr(self.runtime, 'problem_html_cache', None)
+        if html_cache is not None:
+            cache_key = self.problem_html_cache_key(context, encapsulate)
+            html = html_cache.get(cache_key)
+            if html is not None:
+                return html
 
         try:
             html = self.lcp.get_html()
@@ -578,7 +594,39 @@ class CapaMixin(CapaFields):
         # then generate an error message instead.
         except Exception as err:  # pylint: disable=broad-except
             html = self.handle_problem_html_error(err)
+            # Don't keep the error message: the problem has been replaced,
+            # which may change the rest of the context too.
+            html_cache = None
+            context = self.get_problem_html_context()
+
+        context['problem']['html'] = html
+
+        html = self.runtime.render_template('problem.html', context)
+
+        if encapsulate:
+            html = u'<div id="problem_{id}" class="problem" data-url="{ajax_url}">'.format(
+                id=self.location.html_id(), ajax_url=self.runtime.ajax_url
+            ) + html + "</div>"
+
+        # Now do all the substitutions which the LMS module_render normally does, but
+        # we need to do here explicitly since we can get called for our HTML via AJAX
+        html = self.runtime.replace_urls(html)
+        if self.runtime.replace_course_urls:
+            html = self.runtime.replace_course_urls(html)
+
+        if self.runtime.replace_jump_to_id_urls:
+            html = self.runtime.replace_jump_to_id_urls(html)
+
+        if html_cache is not None:
+            html_cache.set(cache_key, html, PROBLEM_HTML_CACHE_TIMEOUT)
 
+        return html
+
+    def get_problem_html_context(self):
+        """
+        Return the context for the problem.html template, except for the html
+        of the problem itself.
+        """
         # The convention is to pass the name of the check button if we want
         # to show a check button, and False otherwise This works because
         # non-empty strings evaluate to True.  We use the same convention
@@ -592,11 +640,10 @@ class CapaMixin(CapaFields):
 
         content = {
             'name': self.display_name_with_default,
-            'html': html,
             'weight': self.weight,
         }
 
-        context = {
+        return {
             'problem': content,
             'id': self.id,
             'check_button': check_button,
@@ -608,23 +655,37 @@ class CapaMixin(CapaFields):
             'attempts_allowed': self.max_attempts,
         }
 
-        html = self.runtime.render_template('problem.html', context)
-
-        if encapsulate:
-            html = u'<div id="problem_{id}" class="problem" data-url="{ajax_url}">'.format(
-                id=self.location.html_id(), ajax_url=self.runtime.ajax_url
-            ) + html + "</div>"
-
-        # Now do all the substitutions which the LMS module_render normally does, but
-        # we need to do here explicitly since we can get called for our HTML via AJAX
-        html = self.runtime.replace_urls(html)
-        if self.runtime.replace_course_urls:
-            html = self.runtime.replace_course_urls(html)
-
-        if self.runtime.replace_jump_to_id_urls:
-            html = self.runtime.replace_jump_to_id_urls(html)
-
-        return html
+    def problem_html_cache_key(self, context, encapsulate):
+        """
+        Return the key for the rendered problem html in the `problem_html_cache`.
+
+        The key is a hash of the problem definition and seed, the state of the
+        student, their identity and language, and the template `context` holding
+        everything else shown with the problem, so any change gives a new key.
+        It also includes the runtime's `problem_html_cache_version`, if any, so
+        that html rendered by other releases of the code and templates isn't used,
+        and the STATIC_URL and `problem_html_static_urls` of the runtime, which the
+        static urls in the html are rewritten with.
+        """
+        i18n = self.runtime.service(self, "i18n")
+        language = i18n.get_language() if hasattr(i18n, 'get_language') else None
+        key_data = json.dumps(
+            [
+                self.location.url(),
+                self.data,
+                self.lcp.get_state(),
+                context,
+                encapsulate,
+                self.runtime.anonymous_student_id,
+                self.runtime.ajax_url,
+                language,
+                getattr(self.runtime, 'problem_html_cache_version', None),
+                self.runtime.STATIC_URL,
+                getattr(self.runtime, 'problem_html_static_urls', None),
+            ],
+            sort_keys=True,
+        )
+        return "capa.problem_html.{0}".format(hashlib.md5(key_data).hexdigest())
 
     def is_past_due(self):
         """
@@ -1235,33 +1296,67 @@ class CapaMixin(CapaFields):
 
         # get old score, for comparison:
         orig_score = self.lcp.get_score()
-        event_info['orig_score'] = orig_score['score']
-        event_info['orig_total'] = orig_score['total']
 
         try:
-            correct_map = self.lcp.rescore_existing_answers()
+            result = self.lcp.rescore_existing_answers()
+        except Exception:  # pylint: disable=broad-except
+            result = sys.exc_info()
 
-        except (StudentInputError, ResponseError, LoncapaProblemError) as inst:
-            log.warning("Input error in capa_module:problem_rescore", exc_info=True)
-            event_info['failure'] = 'input_error'
-            self.track_function_unmask('problem_rescore_fail', event_info)
-            return {'success': u"Error: {0}".format(inst.message)}
+        response, events = self.apply_rescore_result(event_info, orig_score, result)
+        rescored = not isinstance(result, tuple)
+        if rescored:
+            # rescoring should have no effect on attempts, so don't
+            # need to increment here, or mark done.  Just save.
+            self.set_state_from_lcp()
+
+            self.publish_grade()
+
+        for event_type, event in events:
+            self.track_function_unmask(event_type, event)
+        if response is None:
+            raise result[0], result[1], result[2]
+
+        # psychometrics should be called on rescoring requests in the same way as check-problem
+        if rescored and hasattr(self.runtime, 'psychometrics_handler'):
+            # update PsychometricsData using callback
+            self.runtime.psychometrics_handler(self.get_state_for_lcp())
+
+        return response
+
+    def apply_rescore_result(self, event_info, orig_score, result, attempts=None):
+        """
+        Apply the result of rescoring the existing answers of the problem to its
+        LoncapaProblem, for rescore_problem, or for rescoring many students'
+        answers with a single problem.
+
+        `event_info` is the tracking information about the rescoring so far, which
+        this completes.  `orig_score` is the score before rescoring, `result` the new
+        CorrectMap or the exc_info of the exception raised while grading, and `attempts`
+        the student's attempts, if not the problem's.
+
+        Returns a tuple of the dict rescore_problem returns, or None if the exception
+        should be re-raised, and the list of (event_type, event_info) tracking events
+        to emit once the new state is saved.
+        """
+        event_info['orig_score'] = orig_score['score']
+        event_info['orig_total'] = orig_score['total']
+
+        if isinstance(result, tuple):
+            err = result[1]
+            if isinstance(err, (StudentInputError, ResponseError, LoncapaProblemError)):
+                log.warning("Input error in capa_module:problem_rescore", exc_info=result)
+                event_info['failure'] = 'input_error'
+                return {'success': u"Error: {0}".format(err.message)}, [('problem_rescore_fail', event_info)]
 
-        except Exception as err:
             event_info['failure'] = 'unexpected'
-            self.track_function_unmask('problem_rescore_fail', event_info)
+            events = [('problem_rescore_fail', event_info)]
             if self.runtime.DEBUG:
                 msg = u"Error checking problem: {0}".format(err.message)
-                msg += u'\nTraceback:\n' + traceback.format_exc()
-                return {'success': msg}
-            raise
-
-        # rescoring should have no effect on attempts, so don't
-        # need to increment here, or mark done.  Just save.
-        self.set_state_from_lcp()
-
-        self.publish_grade()
+                msg += u'\nTraceback:\n' + ''.join(traceback.format_exception(*result))
+                return {'success': msg}, events
+            return None, events
 
+        correct_map = self.lcp.correct_map = result
         new_score = self.lcp.get_score()
         event_info['new_score'] = new_score['score']
         event_info['new_total'] = new_score['total']
@@ -1276,14 +1371,8 @@ class CapaMixin(CapaFields):
         #       'success' will always be incorrect
         event_info['correct_map'] = correct_map.get_dict()
         event_info['success'] = success
-        event_info['attempts'] = self.attempts
-        self.track_function_unmask('problem_rescore', event_info)
-
-        # psychometrics should be called on rescoring requests in the same way as check-problem
-        if hasattr(self.runtime, 'psychometrics_handler'):  # update PsychometricsData using callback
-            self.runtime.psychometrics_handler(self.get_state_for_lcp())
-
-        return {'success': success}
+        event_info['attempts'] = self.attempts if attempts is None else attempts
+        return {'success': success}, [('problem_rescore', event_info)]
 
     def save_problem(self, data):
         """
@@ -25,6 +25,9 @@ def contentstore(name='default'):
         if 'ADDITIONAL_OPTIONS' in settings.CONTENTSTORE:
             if name in settings.CONTENTSTORE['ADDITIONAL_OPTIONS']:
                 options.update(settings.CONTENTSTORE['ADDITIONAL_OPTIONS'][name])
+        read_preference = getattr(settings, 'DOC_STORE_READ_PREFERENCE', None)
+        if read_preference is not None:
+            options.setdefault('read_preference', read_preference)
         _CONTENTSTORE[name] = class_(**options)
 
     return _CONTENTSTORE[name]
@@ -1,4 +1,3 @@
-import pymongo
 import gridfs
 from gridfs.errors import NoFile
 
@@ -10,6 +9,7 @@ import logging
 
 from .content import StaticContent, ContentStore, StaticContentStream
 from xmodule.exceptions import NotFoundError
+from xmodule.mongo_utils import connect_to_mongodb
 from fs.osfs import OSFS
 import os
 import json
@@ -24,17 +24,9 @@ class MongoContentStore(ContentStore):
         :param collection: ignores but provided for consistency w/ other doc_store_config patterns
         """
         logging.debug('Using MongoDB for static content serving at host={0} db={1}'.format(host, db))
-        _db = pymongo.database.Database(
-            pymongo.MongoClient(
-                host=host,
-                port=port,
-                **kwargs
-            ),
-            db
-        )
-
-        if user is not None and password is not None:
-            _db.authenticate(user, password)
+        # dates have always been read back naive here
+        kwargs.setdefault('tz_aware', False)
+        _db = connect_to_mongodb(db, host, port=port, user=user, password=password, **kwargs)
 
         self.fs = gridfs.GridFS(_db, bucket)
 
@@ -43,6 +43,14 @@ INVALID_HTML_CHARS = re.compile(r"[^\w-]", re.UNICODE)
 
 _LocationBase = namedtuple('LocationBase', 'tag org course category name revision')
 
+# How many Locations to keep in LOCATION_CACHE
+LOCATION_CACHE_SIZE = 20000
+
+# Locations already constructed, keyed by what they were constructed from: a url,
+# or a tuple of their 6 components for the other forms.  Like the re module's
+# cache, it's emptied when full, which keeps lookups as cheap as a dict's.
+LOCATION_CACHE = {}
+
 
 def _check_location_part(val, regexp):
     """
@@ -59,6 +67,36 @@ def _check_location_part(val, regexp):
         raise InvalidLocationError("Invalid characters in {!r}.".format(val))
 
 
+def _location_cache_key(location):
+    """
+    Return the key in LOCATION_CACHE of the Location constructed from location,
+    or None if it can't be cached.
+    """
+    if isinstance(location, basestring):
+        return location
+    if isinstance(location, dict):
+        if len(location) == 6 if 'revision' in location else len(location) == 5:
+            try:
+                return (
+                    location['tag'], location['org'], location['course'],
+                    location['category'], location['name'], location.get('revision'),
+                )
+            except KeyError:
+                pass
+        return None
+    if isinstance(location, tuple) and not isinstance(location, _LocationBase):
+        if len(location) == 6:
+            return location
+        if len(location) == 5:
+            return location + (None,)
+    elif isinstance(location, list):
+        if len(location) == 6:
+            return tuple(location)
+        if len(location) == 5:
+            return tuple(location) + (None,)
+    return None
+
+
 class Location(_LocationBase):
     '''
     Encodes a location.
@@ -172,6 +210,36 @@ class Location(_LocationBase):
         if location is None:
             return _LocationBase.__new__(_cls, *([None] * 6))
 
+        if isinstance(location, Location):
+            return location
+
+        # Locations are immutable, so the one constructed the last time from the
+        # same value can be returned: that skips validating it again, and lets
+        # comparisons and dict lookups short-circuit on identity.
+        if _cls is Location:
+            cache_key = _location_cache_key(location)
+            if cache_key is not None:
+                try:
+                    return LOCATION_CACHE[cache_key]
+                except KeyError:
+                    pass
+                except TypeError:
+                    # unhashable components, which _parse rejects
+                    return _cls._parse(location)
+                result = _cls._parse(location)
+                if len(LOCATION_CACHE) >= LOCATION_CACHE_SIZE:
+                    LOCATION_CACHE.clear()
+                LOCATION_CACHE[cache_key] = result
+                return result
+        return _cls._parse(location)
+
+    @classmethod
+    def _parse(cls, location):
+        """
+        Validate location, given as a url, list, tuple or dict as accepted by the
+        constructor, and return the Location it represents.
+        """
+
         def check_dict(dict_):
             # Order matters, so flatten out into a list
             keys = ['tag', 'org', 'course', 'category', 'name', 'revision']
@@ -185,16 +253,14 @@ class Location(_LocationBase):
             # names allow colons
             _check_location_part(list_[4], INVALID_CHARS_NAME)
 
-        if isinstance(location, Location):
-            return location
-        elif isinstance(location, basestring):
+        if isinstance(location, basestring):
             match = URL_RE.match(location)
             if match is None:
                 log.debug(u"location %r doesn't match URL", location)
                 raise InvalidLocationError(location)
             groups = match.groupdict()
             check_dict(groups)
-            return _LocationBase.__new__(_cls, **groups)
+            return _LocationBase.__new__(cls, **groups)
         elif isinstance(location, (list, tuple)):
             if len(location) not in (5, 6):
                 log.debug(u'location has wrong length')
@@ -206,13 +272,13 @@ class Location(_LocationBase):
                 args = tuple(location)
 
             check_list(args)
-            return _LocationBase.__new__(_cls, *args)
+            return _LocationBase.__new__(cls, *args)
         elif isinstance(location, dict):
             kwargs = dict(location)
             kwargs.setdefault('revision', None)
 
             check_dict(kwargs)
-            return _LocationBase.__new__(_cls, **kwargs)
+            return _LocationBase.__new__(cls, **kwargs)
         else:
             raise InvalidLocationError(location)
 
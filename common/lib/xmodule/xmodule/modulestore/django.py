@@ -43,6 +43,9 @@ def load_function(path):
 def create_modulestore_instance(engine, doc_store_config, options, i18n_service=None):
     """
     This will return a new instance of a modulestore given an engine and options
+
+    settings.DOC_STORE_READ_PREFERENCE, if set, is the read preference of doc_store_config
+    when that doesn't give one.
     """
     class_ = load_function(engine)
 
@@ -58,6 +61,10 @@ def create_modulestore_instance(engine, doc_store_config, options, i18n_service=
     else:
         request_cache = None
 
+    read_preference = getattr(settings, 'DOC_STORE_READ_PREFERENCE', None)
+    if doc_store_config and read_preference is not None and 'read_preference' not in doc_store_config:
+        doc_store_config = dict(doc_store_config, read_preference=read_preference)
+
     try:
         metadata_inheritance_cache = get_cache('mongo_metadata_inheritance')
     except InvalidCacheBackendError:
@@ -9,6 +9,7 @@ import bson.son
 from xmodule.modulestore.exceptions import InvalidLocationError, ItemNotFoundError
 from xmodule.modulestore.locator import BlockUsageLocator, CourseLocator
 from xmodule.modulestore import Location
+from xmodule.mongo_utils import connect_to_mongodb
 import urllib
 
 
@@ -34,17 +35,7 @@ class LocMapperStore(object):
         '''
         Constructor
         '''
-        self.db = pymongo.database.Database(
-            pymongo.MongoClient(
-                host=host,
-                port=port,
-                tz_aware=True,
-                **kwargs
-            ),
-            db
-        )
-        if user is not None and password is not None:
-            self.db.authenticate(user, password)
+        self.db = connect_to_mongodb(db, host, port=port, user=user, password=password, **kwargs)
 
         self.location_map = self.db[collection + '.location_map']
         self.location_map.write_concern = {'w': 1}
@@ -12,23 +12,34 @@ structure:
 }
 """
 
+import cPickle
 import pymongo
+import random
 import sys
 import logging
 import copy
+import threading
+import time
+import zlib
 
 from bson.son import SON
+from pymongo.read_preferences import ReadPreference
+from collections import OrderedDict
+from contextlib import contextmanager
 from fs.osfs import OSFS
 from itertools import repeat
 from path import path
+from uuid import uuid4
 
 from importlib import import_module
 from xmodule.errortracker import null_error_tracker, exc_info_to_str
 from xmodule.mako_module import MakoDescriptorSystem
+from xmodule.mongo_utils import connect_to_mongodb
 from xmodule.error_module import ErrorDescriptor
 from xblock.runtime import KvsFieldData
 from xblock.exceptions import InvalidScopeError
 from xblock.fields import Scope, ScopeIds
+from calc.lru import LRUCache
 
 from xmodule.modulestore import ModuleStoreWriteBase, Location, MONGO_MODULESTORE_TYPE
 from xmodule.modulestore.exceptions import ItemNotFoundError
@@ -244,6 +255,136 @@ def metadata_cache_key(location):
     return u"{0.org}/{0.course}".format(location)
 
 
+def course_version_cache_key(location):
+    """The cache key of the version of a `Location`'s course."""
+    return u"{0.org}/{0.course}/version".format(location)
+
+
+def parent_index_cache_key(location):
+    """The cache key of the parent index of a `Location`'s course."""
+    return u"{0.org}/{0.course}/parents".format(location)
+
+
+def parent_index_shard_cache_keys(location):
+    """The cache keys of the parts of the parent index of a `Location`'s course."""
+    return [u"{0.org}/{0.course}/parents/{1}".format(location, shard) for shard in xrange(PARENT_INDEX_SHARDS)]
+
+
+def parent_index_shard(url):
+    """The part of a parent index where the parents of the location `url` are."""
+    if isinstance(url, unicode):
+        url = url.encode('utf-8')
+    return zlib.crc32(url) % PARENT_INDEX_SHARDS
+
+
+def inheritance_version_cache_key(location):
+    """The cache key of the version of the containers of a `Location`'s course."""
+    return u"{0.org}/{0.course}/inheritance_version".format(location)
+
+
+# How long, in seconds, a metadata inheritance tree can be patched after writes
+# before it's computed from scratch again.
+PATCHED_CACHE_TIMEOUT = 60 * 60
+
+# The parent index of a course is cached in this many parts, as memcached limits
+# the size of its values.  An index with a part larger than PARENT_INDEX_MAX_SHARD_SIZE
+# bytes once pickled isn't cached: parents are queried instead.
+PARENT_INDEX_SHARDS = 16
+PARENT_INDEX_MAX_SHARD_SIZE = 900 * 1024
+
+# Marks a parent index too large to be cached, in the caches.
+PARENT_INDEX_TOO_LARGE = 'too large'
+
+
+# Marks the locations known not to be in the collection, in the item cache.
+ITEM_NOT_FOUND = 'not found'
+
+# How many buffered writes are sent to Mongo at once when leaving bulk write mode.
+BULK_WRITE_BATCH_SIZE = 500
+
+
+def apply_update(document, update):
+    """
+    Apply the `$set` `update` to `document`, as Mongo would, and return it.
+    """
+    for key, value in update.iteritems():
+        fields = key.split('.')
+        target = document
+        for field in fields[:-1]:
+            target = target.setdefault(field, {})
+        target[fields[-1]] = value
+    return document
+
+
+def update_to_document(location, update):
+    """
+    Return the document that upserting the `$set` `update` creates at location,
+    when there's nothing there yet.
+    """
+    return apply_update({'_id': namedtuple_to_son(location)}, update)
+
+
+def location_matches(location, pattern, any_revision=False):
+    """
+    Whether `location` is one of those location_to_query(`pattern`) queries for:
+    fields which are None in `pattern` match anything, except the revision, unless
+    `any_revision`.
+    """
+    for field, value in zip(pattern._fields, pattern):
+        if field == 'revision' and any_revision:
+            continue
+        if value is None and field != 'revision':
+            continue
+        if getattr(location, field) != value:
+            return False
+    return True
+
+
+def get_block_types_with_children():
+    """
+    Return the set of the block types that can have children.
+    """
+    return set(name for name, class_ in XBlock.load_classes() if getattr(class_, 'has_children', False))
+
+
+def collate_inheritance_records(records):
+    """
+    Return a dict mapping the url, without revision, of each of the inheritance
+    `records` to the record to compute metadata inheritance from: the draft one if
+    the item has both a draft and a published record, with the children of both.
+    """
+    collated = {}
+    for record in records:
+        location = Location(record['_id'])
+        url = location.replace(revision=None).url()
+        existing = collated.get(url)
+        if existing is not None:
+            if location.revision is None:
+                record, existing = existing, record
+            # draft verticals have draft children, but their parents are published
+            children = record.get('definition', {}).get('children', [])
+            children = children + [
+                child for child in existing.get('definition', {}).get('children', []) if child not in children
+            ]
+            record.setdefault('definition', {})['children'] = children
+        collated[url] = record
+    return collated
+
+
+def inheritance_record_filter():
+    """
+    Return the fields of a record needed to compute metadata inheritance: its
+    Location, children, and inheritable metadata.
+    """
+    record_filter = {'_id': 1, 'definition.children': 1}
+
+    # just get the inheritable metadata since that is all we need for the computation
+    # this minimizes both data pushed over the wire
+    for field_name in InheritanceMixin.fields:
+        record_filter['metadata.{0}'.format(field_name)] = 1
+    return record_filter
+
+
 class MongoModuleStore(ModuleStoreWriteBase):
     """
     A Mongodb backed ModuleStore
@@ -257,33 +398,28 @@ class MongoModuleStore(ModuleStoreWriteBase):
                  default_class=None,
                  error_tracker=null_error_tracker,
                  i18n_service=None,
+                 item_cache_size=0,
                  **kwargs):
         """
         :param doc_store_config: must have a host, db, and collection entries. Other common entries: port, tz_aware.
+        :param item_cache_size: how many records to keep in an in-process cache, so that they
+            aren't read from Mongo for every request.  The cache is only used when there's a
+            metadata_inheritance_cache_subsystem shared with the processes writing to the
+            store, which is used to tell when cached records are out of date.
+
+        The connection options of doc_store_config, like read_preference, are those of
+        xmodule.mongo_utils.connect_to_mongodb.
         """
 
         super(MongoModuleStore, self).__init__(**kwargs)
 
-        def do_connection(
-            db, collection, host, port=27017, tz_aware=True, user=None, password=None, **kwargs
-        ):
+        def do_connection(db, collection, **kwargs):
             """
             Create & open the connection, authenticate, and provide pointers to the collection
             """
-            self.database = pymongo.database.Database(
-                pymongo.MongoClient(
-                    host=host,
-                    port=port,
-                    tz_aware=tz_aware,
-                    **kwargs
-                ),
-                db
-            )
+            self.database = connect_to_mongodb(db, **kwargs)
             self.collection = self.database[collection]
 
-            if user is not None and password is not None:
-                self.database.authenticate(user, password)
-
         do_connection(**doc_store_config)
 
         # Force mongo to report errors, at the expense of performance
@@ -295,6 +431,8 @@ class MongoModuleStore(ModuleStoreWriteBase):
         self.collection.ensure_index(
             zip(('_id.' + field for field in Location._fields), repeat(1)),
         )
+        # and over the children, for finding parents when there's no cached parent index
+        self.collection.ensure_index('definition.children', background=True)
         # pylint: enable=no-member, protected_access
 
         if default_class is not None:
@@ -309,6 +447,12 @@ class MongoModuleStore(ModuleStoreWriteBase):
         self.i18n_service = i18n_service
 
         self.ignore_write_events_on_courses = []
+        # per thread state, like the writes buffered in bulk write mode
+        self.thread_cache = threading.local()
+
+        self.item_cache = LRUCache(item_cache_size) if item_cache_size else None
+        # OSFS instances for the data directories, by path
+        self.resource_fs_by_root = {}
 
     def compute_metadata_inheritance_tree(self, location):
         '''
@@ -317,40 +461,31 @@ class MongoModuleStore(ModuleStoreWriteBase):
         # get all collections in the course, this query should not return any leaf nodes
         # note this is a bit ugly as when we add new categories of containers, we have to add it here
 
-        block_types_with_children = set(name for name, class_ in XBlock.load_classes() if getattr(class_, 'has_children', False))
+        block_types_with_children = get_block_types_with_children()
         query = {'_id.org': location.org,
                  '_id.course': location.course,
                  '_id.category': {'$in': list(block_types_with_children)}
                  }
         # we just want the Location, children, and inheritable metadata
-        record_filter = {'_id': 1, 'definition.children': 1}
-
-        # just get the inheritable metadata since that is all we need for the computation
-        # this minimizes both data pushed over the wire
-        for field_name in InheritanceMixin.fields:
-            record_filter['metadata.{0}'.format(field_name)] = 1
-
-        # call out to the DB
-        resultset = self.collection.find(query, record_filter)
-
-        results_by_url = {}
-        root = None
+        record_filter = inheritance_record_filter()
+
+        # call out to the DB.  The tree is cached for all the processes, so read from
+        # the primary: a lagging secondary could have it cached as up to date.
+        resultset = self.collection.find(query, record_filter, read_preference=ReadPreference.PRIMARY)
+        resultset = [
+            record
+            for record in self._with_pending_writes(
+                list(resultset), Location('i4x', location.org, location.course, None, None), any_revision=True
+            )
+            if record['_id']['category'] in block_types_with_children
+        ]
 
         # now go through the results and order them by the location url
-        for result in resultset:
-            location = Location(result['_id'])
-            # We need to collate between draft and non-draft
-            # i.e. draft verticals will have draft children but will have non-draft parents currently
-            location = location.replace(revision=None)
-            location_url = location.url()
-            if location_url in results_by_url:
-                existing_children = results_by_url[location_url].get('definition', {}).get('children', [])
-                additional_children = result.get('definition', {}).get('children', [])
-                total_children = existing_children + additional_children
-                results_by_url[location_url].setdefault('definition', {})['children'] = total_children
-            results_by_url[location.url()] = result
-            if location.category == 'course':
-                root = location.url()
+        results_by_url = collate_inheritance_records(resultset)
+        root = None
+        for url in results_by_url:
+            if Location(url).category == 'course':
+                root = url
 
         # now traverse the tree and compute down the inherited metadata
         metadata_to_inherit = {}
@@ -365,7 +500,8 @@ class MongoModuleStore(ModuleStoreWriteBase):
             # in the result set. Remember results will not contain leaf nodes
             for child in results_by_url[url].get('definition', {}).get('children', []):
                 if child in results_by_url:
-                    new_child_metadata = copy.deepcopy(my_metadata)
+                    # The values are never modified, so they can be shared
+                    new_child_metadata = dict(my_metadata)
                     new_child_metadata.update(results_by_url[child].get('metadata', {}))
                     results_by_url[child]['metadata'] = new_child_metadata
                     metadata_to_inherit[child] = new_child_metadata
@@ -384,30 +520,47 @@ class MongoModuleStore(ModuleStoreWriteBase):
         TODO (cdodge) This method can be deleted when the 'split module store' work has been completed
         '''
         key = metadata_cache_key(location)
-        tree = {}
+        tree = None
 
         if not force_refresh:
             # see if we are first in the request cache (if present)
             if self.request_cache is not None and key in self.request_cache.data.get('metadata_inheritance', {}):
                 return self.request_cache.data['metadata_inheritance'][key]
 
-            # then look in any caching subsystem (e.g. memcached)
-            if self.metadata_inheritance_cache_subsystem is not None:
-                tree = self.metadata_inheritance_cache_subsystem.get(key, {})
-            else:
-                logging.warning('Running MongoModuleStore without a metadata_inheritance_cache_subsystem. This is OK in localdev and testing environment. Not OK in production.')
-
-        if not tree:
+        if self.metadata_inheritance_cache_subsystem is None:
+            logging.warning('Running MongoModuleStore without a metadata_inheritance_cache_subsystem. This is OK in localdev and testing environment. Not OK in production.')
+            version = None
+        else:
+            # read before computing the tree, so that a write made meanwhile makes it out of date
+            version = self._get_inheritance_version(location)
+            if not force_refresh:
+                # then look in the caching subsystem (e.g. memcached)
+                entry = self.metadata_inheritance_cache_subsystem.get(key)
+                if entry is not None and entry.get('version') == version:
+                    tree = entry['tree']
+
+        if tree is None:
             # if not in subsystem, or we are on force refresh, then we have to compute
             tree = self.compute_metadata_inheritance_tree(location)
 
-            # now write out computed tree to caching subsystem (e.g. memcached), if available
-            if self.metadata_inheritance_cache_subsystem is not None:
-                self.metadata_inheritance_cache_subsystem.set(key, tree)
+            # now write out computed tree to caching subsystem (e.g. memcached), if available,
+            # unless it has writes this thread hasn't sent to Mongo yet
+            if version is not None and not self._thread_bulk_writes().get(key):
+                self.metadata_inheritance_cache_subsystem.set(
+                    key, {'version': version, 'tree': tree, 'computed_on': time.time()}
+                )
 
         # now populate a request_cache, if available. NOTE, we are outside of the
         # scope of the above if: statement so that after a memcache hit, it'll get
         # put into the request_cache
+        self._request_cache_metadata_inheritance_tree(key, tree)
+
+        return tree
+
+    def _request_cache_metadata_inheritance_tree(self, key, tree):
+        """
+        Put the metadata inheritance tree in the request cache, if there is one
+        """
         if self.request_cache is not None:
             # we can't assume the 'metadatat_inheritance' part of the request cache dict has been
             # defined
@@ -415,16 +568,435 @@ class MongoModuleStore(ModuleStoreWriteBase):
                 self.request_cache.data['metadata_inheritance'] = {}
             self.request_cache.data['metadata_inheritance'][key] = tree
 
-        return tree
-
     def refresh_cached_metadata_inheritance_tree(self, location):
         """
-        Refresh the cached metadata inheritance tree for the org/course combination
-        for location
+        Refresh the cached metadata inheritance tree, and the cached parent index,
+        for the org/course combination for location
         """
         pseudo_course_id = '/'.join([location.org, location.course])
         if pseudo_course_id not in self.ignore_write_events_on_courses:
             self.get_cached_metadata_inheritance_tree(location, force_refresh=True)
+            self.get_cached_parent_index(location, force_refresh=True)
+
+    def update_cached_metadata_inheritance_tree(self, location, version=None):
+        """
+        Update the cached metadata inheritance tree for the org/course combination
+        for location, after location has been written to or deleted.  `version`
+        is the version _set_inheritance_version gave the course for that write.
+
+        Only the entries for location and the containers below it whose inherited
+        metadata changed are recomputed, if the cached tree is the one of the
+        version just before: other processes may be writing to the course too.
+        The whole tree is recomputed otherwise, if it was last computed from
+        scratch more than PATCHED_CACHE_TIMEOUT ago, or if the metadata location
+        inherits can't be worked out from the cached tree.
+        """
+        location = Location(location)
+        if get_course_id_no_run(location) in self.ignore_write_events_on_courses:
+            return
+
+        block_types_with_children = get_block_types_with_children()
+        if location.category not in block_types_with_children:
+            # What a leaf inherits only depends on its parent's entry, and its
+            # own entry only changes when the parent's children do.
+            return
+
+        key = metadata_cache_key(location)
+        entry = None
+        if self.metadata_inheritance_cache_subsystem is not None and version is not None:
+            entry = self.metadata_inheritance_cache_subsystem.get(key)
+        if entry is not None and entry.get('version') == version - 1:
+            timeout = int(entry['computed_on'] + PATCHED_CACHE_TIMEOUT - time.time())
+            tree = dict(entry['tree'])
+            if timeout > 0 and self._update_metadata_inheritance_subtree(tree, location, block_types_with_children):
+                # expires with the tree it was patched from
+                self.metadata_inheritance_cache_subsystem.set(
+                    key, {'version': version, 'tree': tree, 'computed_on': entry['computed_on']}, timeout
+                )
+                self._request_cache_metadata_inheritance_tree(key, tree)
+                return
+
+        self.refresh_cached_metadata_inheritance_tree(location)
+
+    def _update_metadata_inheritance_subtree(self, tree, location, block_types_with_children):
+        """
+        Recompute, in place, the entries of the metadata inheritance `tree` for the
+        container at `location` and its descendants.
+
+        Returns False if that isn't possible because the metadata inherited by
+        `location` isn't in `tree`.
+        """
+        url = location.replace(revision=None).url()
+        if location.category == 'course':
+            inherited = {}
+        else:
+            # read from the primary, as for compute_metadata_inheritance_tree
+            parents = self._find_parent_locations(location.replace(revision=None), ReadPreference.PRIMARY)
+            if not parents:
+                # An orphan isn't part of the tree.  Its descendants' entries are
+                # left alone: they're unreachable, so they won't be looked up.
+                tree.pop(url, None)
+                return True
+            parent = Location(parents[0]).replace(revision=None)
+            if parent.category == 'course':
+                # The course itself has no entry.
+                records = self._find_inheritance_records(parent.org, parent.course, [parent.url()])
+                if parent.url() not in records:
+                    return False
+                inherited = records[parent.url()].get('metadata', {})
+            elif parent.url() in tree:
+                inherited = tree[parent.url()]
+            else:
+                return False
+
+        records = self._find_inheritance_records(location.org, location.course, [url])
+        if url not in records:
+            # Deleted, but still a child of its parent.
+            tree[url] = inherited
+            return True
+
+        # Walk down the course one level at a time.  The children of location
+        # itself are always updated, since they may be what changed.  Below that,
+        # a container whose entry didn't change has an up to date subtree.
+        to_process = [(records[url], inherited)]
+        while to_process:
+            containers = {}
+            for record, inherited in to_process:
+                record_location = Location(record['_id']).replace(revision=None)
+                metadata = dict(inherited)
+                metadata.update(record.get('metadata', {}))
+                if record_location.category != 'course':
+                    tree[record_location.url()] = metadata
+                for child in record.get('definition', {}).get('children', []):
+                    if Location(child).category in block_types_with_children:
+                        containers[child] = metadata
+                    else:
+                        tree[child] = metadata
+
+            to_process = []
+            if containers:
+                records = self._find_inheritance_records(location.org, location.course, containers.keys())
+                for child, inherited in containers.iteritems():
+                    if child not in records:
+                        tree[child] = inherited
+                        continue
+                    metadata = dict(inherited)
+                    metadata.update(records[child].get('metadata', {}))
+                    if tree.get(child) != metadata:
+                        to_process.append((records[child], inherited))
+
+        return True
+
+    def _find_inheritance_records(self, org, course, urls):
+        """
+        Return a dict mapping each of the location `urls` found in the collection
+        to its record, with only the fields needed to compute metadata inheritance.
+
+        Draft and published records are collated as compute_metadata_inheritance_tree
+        does.
+        """
+        locations = [Location(url) for url in urls]
+        query = {
+            '_id.org': org,
+            '_id.course': course,
+            '_id.category': {'$in': list(set(location.category for location in locations))},
+            '_id.name': {'$in': list(set(location.name for location in locations))},
+        }
+        wanted = set(location.url() for location in locations)
+
+        self._flush_bulk_writes('/'.join([org, course]))
+        # read from the primary, as for compute_metadata_inheritance_tree
+        records = collate_inheritance_records(
+            self.collection.find(query, inheritance_record_filter(), read_preference=ReadPreference.PRIMARY)
+        )
+        return dict((url, record) for url, record in records.iteritems() if url in wanted)
+
+    def compute_parent_index(self, location):
+        """
+        Return the parent index of the org/course combination for location: a dict
+        mapping the url of every child in the course to the urls of its parents.
+
+        The parents are found the way a {'definition.children': url} query would
+        find them, draft and published versions included.
+        """
+        query = {
+            '_id.org': location.org,
+            '_id.course': location.course,
+            '_id.category': {'$in': list(get_block_types_with_children())},
+        }
+        parent_index = {}
+        self._flush_course_bulk_writes(location)
+        # read from the primary, as for compute_metadata_inheritance_tree
+        for result in self.collection.find(
+                query, {'_id': 1, 'definition.children': 1}, read_preference=ReadPreference.PRIMARY
+        ):
+            parent_url = Location(result['_id']).url()
+            for child in result.get('definition', {}).get('children', []):
+                parent_index.setdefault(child, []).append(parent_url)
+        return parent_index
+
+    def get_cached_parent_index(self, location, force_refresh=False):
+        """
+        Return the parent index of the org/course combination for location, from
+        the request cache or the metadata_inheritance_cache_subsystem if possible,
+        computing and caching it otherwise.
+
+        Returns None if there's neither a request cache nor a cache subsystem to
+        keep the index in: computing it for every lookup would cost more than
+        the lookups.  Also returns None if the index is too large to cache.
+        """
+        if self.request_cache is None and self.metadata_inheritance_cache_subsystem is None:
+            return None
+
+        key = parent_index_cache_key(location)
+        parent_index = None
+        if not force_refresh and self.request_cache is not None:
+            parent_index = self.request_cache.data.get('parent_index', {}).get(key)
+
+        if parent_index is None:
+            version = None
+            if self.metadata_inheritance_cache_subsystem is not None:
+                # read before computing the index, so that a write made meanwhile makes it out of date
+                version = self._get_inheritance_version(location)
+                if not force_refresh:
+                    parent_index = self._get_cached_parent_index_shards(location, version)
+            if parent_index is None:
+                parent_index = self.compute_parent_index(location)
+                if version is not None:
+                    parent_index = self._set_cached_parent_index_shards(location, version, parent_index)
+            if self.request_cache is not None:
+                self.request_cache.data.setdefault('parent_index', {})[key] = parent_index
+
+        if parent_index is PARENT_INDEX_TOO_LARGE:
+            return None
+        return parent_index
+
+    def update_cached_parent_index(self, location, children, version=None):
+        """
+        Update the cached parent index of the org/course combination for location,
+        after writing the children of location.  `children` is the new list of
+        children urls, or None if location was deleted.  `version` is the version
+        _set_inheritance_version gave the course for that write.
+
+        Like the metadata inheritance tree, the index in the metadata_inheritance_cache_subsystem
+        is only updated if it's the one of the version just before.  Otherwise,
+        and if it isn't cached, nothing is done: it'll be computed when needed.
+        """
+        location = Location(location)
+        if get_course_id_no_run(location) in self.ignore_write_events_on_courses:
+            # Updated by refresh_cached_metadata_inheritance_tree when done.
+            return
+
+        key = parent_index_cache_key(location)
+        parent_index = None
+        if self.metadata_inheritance_cache_subsystem is None:
+            if self.request_cache is not None:
+                parent_index = self.request_cache.data.get('parent_index', {}).get(key)
+        elif version is None:
+            # not a container, so not in the index
+            return
+        else:
+            parent_index = self._get_cached_parent_index_shards(location, version - 1)
+            if parent_index is None and self.request_cache is not None:
+                self.request_cache.data.get('parent_index', {}).pop(key, None)
+        if parent_index is None:
+            return
+
+        updated = parent_index
+        if parent_index is not PARENT_INDEX_TOO_LARGE:
+            url = location.url()
+            updated = {}
+            for child, parents in parent_index.iteritems():
+                if url in parents:
+                    parents = [parent for parent in parents if parent != url]
+                if parents:
+                    updated[child] = parents
+            for child in children or []:
+                updated.setdefault(child, []).append(url)
+
+        if self.metadata_inheritance_cache_subsystem is not None:
+            updated = self._set_cached_parent_index_shards(location, version, updated)
+        if self.request_cache is not None:
+            self.request_cache.data.setdefault('parent_index', {})[key] = updated
+
+    def _get_cached_parent_index_shards(self, location, version):
+        """
+        Return the parent index of location's course from the parts of it in the
+        metadata_inheritance_cache_subsystem, or PARENT_INDEX_TOO_LARGE.  Returns
+        None if they aren't all cached for the inheritance version `version`.
+        """
+        keys = parent_index_shard_cache_keys(location)
+        shards = self.metadata_inheritance_cache_subsystem.get_many(keys)
+        if len(shards) != len(keys) or any(shard.get('version') != version for shard in shards.itervalues()):
+            return None
+        if any(shard['parents'] is None for shard in shards.itervalues()):
+            return PARENT_INDEX_TOO_LARGE
+
+        parent_index = {}
+        for shard in shards.itervalues():
+            parent_index.update(shard['parents'])
+        return parent_index
+
+    def _set_cached_parent_index_shards(self, location, version, parent_index):
+        """
+        Cache parent_index, the parent index of location's course at the inheritance
+        version `version`, in parts in the metadata_inheritance_cache_subsystem.
+
+        Returns parent_index, or PARENT_INDEX_TOO_LARGE if it's too large to cache.
+        Then that's what's cached, so that lookups query parents rather than computing
+        the index again.
+        """
+        shards = None
+        if parent_index is not PARENT_INDEX_TOO_LARGE:
+            shards = [{} for _ in xrange(PARENT_INDEX_SHARDS)]
+            for child, parents in parent_index.iteritems():
+                shards[parent_index_shard(child)][child] = parents
+            if any(len(cPickle.dumps(shard)) > PARENT_INDEX_MAX_SHARD_SIZE for shard in shards):
+                log.warning(
+                    "The parent index of %s is too large to cache, its parents will be queried",
+                    get_course_id_no_run(location)
+                )
+                shards = None
+
+        self.metadata_inheritance_cache_subsystem.set_many(dict(
+            (key, {'version': version, 'parents': shards[index] if shards is not None else None})
+            for index, key in enumerate(parent_index_shard_cache_keys(location))
+        ))
+        return parent_index if shards is not None else PARENT_INDEX_TOO_LARGE
+
+    @contextmanager
+    def bulk_write_operations(self, location):
+        """
+        A context manager buffering the writes update_item makes in the calling thread
+        to the org/course combination for location, for imports and clones which write
+        every item of a course.
+
+        The buffered writes are sent to Mongo in batches when leaving the context, and
+        before the thread runs a query on the course which can't see them otherwise.
+        Reads of items by location, get_items and parent lookups apply the buffered writes
+        to what they read instead, so they don't end the batches.  Like for the courses in
+        ignore_write_events_on_courses, the cached metadata inheritance tree and parent
+        index aren't updated item by item: they're refreshed once when leaving the
+        context, unless the caller had already added the course to
+        ignore_write_events_on_courses, in which case refreshing them is left to it.
+        """
+        bulk_writes = self._thread_bulk_writes()
+        course_key = get_course_id_no_run(location)
+        if course_key in bulk_writes:
+            # already buffering writes to this course
+            yield
+            return
+
+        ignoring_write_events = course_key in self.ignore_write_events_on_courses
+        if not ignoring_write_events:
+            self.ignore_write_events_on_courses.append(course_key)
+        bulk_writes[course_key] = OrderedDict()
+        try:
+            yield
+        finally:
+            try:
+                self._flush_bulk_writes(course_key)
+            finally:
+                del bulk_writes[course_key]
+                if not ignoring_write_events:
+                    self.ignore_write_events_on_courses.remove(course_key)
+                    self.refresh_cached_metadata_inheritance_tree(Location(location))
+
+    def _thread_bulk_writes(self):
+        """
+        Return the writes this thread buffered in bulk write mode: for each org/course,
+        an ordered dict mapping Location -> the fields to $set on it
+        """
+        if not hasattr(self.thread_cache, 'bulk_writes'):
+            self.thread_cache.bulk_writes = {}
+        return self.thread_cache.bulk_writes
+
+    def _flush_course_bulk_writes(self, location):
+        """
+        Send the writes this thread buffered in bulk write mode to location's course to
+        Mongo, before querying it, or to every course if location's org or course is None.
+        """
+        if location.org is None or location.course is None:
+            self._flush_bulk_writes()
+        else:
+            self._flush_bulk_writes(get_course_id_no_run(location))
+
+    def _pending_update(self, location):
+        """
+        Return the fields this thread buffered in bulk write mode to $set on location, if any.
+        """
+        course_writes = self._thread_bulk_writes().get(get_course_id_no_run(location))
+        return course_writes.get(location) if course_writes else None
+
+    def _with_pending_writes(self, records, pattern, any_revision=False):
+        """
+        Return `records`, the records read from Mongo of the items location_matches
+        `pattern`, as the writes this thread buffered in bulk write mode will make them,
+        followed by the records of the buffered new items matching `pattern`.
+        """
+        pending = {}
+        for course_writes in self._thread_bulk_writes().itervalues():
+            for location, update in course_writes.iteritems():
+                if location_matches(location, pattern, any_revision):
+                    pending[location] = update
+        if not pending:
+            return records
+
+        result = []
+        for record in records:
+            update = pending.pop(Location(record['_id']), None)
+            if update is not None:
+                record = apply_update(record, copy.deepcopy(update))
+            result.append(record)
+        for location, update in pending.iteritems():
+            result.append(update_to_document(location, copy.deepcopy(update)))
+        return result
+
+    def _flush_bulk_writes(self, course_key=None):
+        """
+        Send the writes this thread buffered in bulk write mode for course_key (an
+        org/course string), or for all courses, to Mongo.  Other threads' buffered
+        writes are left to them.
+
+        The items not in the collection yet are inserted in batches.  The others
+        are updated one by one, as pymongo can't batch updates.
+        """
+        bulk_writes = self._thread_bulk_writes()
+        course_keys = [course_key] if course_key is not None else bulk_writes.keys()
+        for key in course_keys:
+            pending = bulk_writes.get(key)
+            if not pending:
+                continue
+            bulk_writes[key] = OrderedDict()
+
+            locations = pending.keys()
+            for start in xrange(0, len(locations), BULK_WRITE_BATCH_SIZE):
+                batch = locations[start:start + BULK_WRITE_BATCH_SIZE]
+                query = {'_id': {'$in': [namedtuple_to_son(location) for location in batch]}}
+                existing = set(Location(item['_id']) for item in self.collection.find(query, {'_id': True}))
+                to_update = [location for location in batch if location in existing]
+                to_insert = [location for location in batch if location not in existing]
+                if to_insert:
+                    try:
+                        self.collection.insert(
+                            [update_to_document(location, pending[location]) for location in to_insert],
+                            safe=self.collection.safe
+                        )
+                    except pymongo.errors.DuplicateKeyError:
+                        # Some were inserted by someone else meanwhile: upsert them all,
+                        # which also covers those inserted before the error.
+                        to_update.extend(to_insert)
+                for location in to_update:
+                    self.collection.update(
+                        {'_id': namedtuple_to_son(location)},
+                        {'$set': pending[location]},
+                        multi=False,
+                        upsert=True,
+                        safe=self.collection.safe
+                    )
+            self._set_course_version(locations[0])
+            if self.metadata_inheritance_cache_subsystem is not None:
+                self._increment_cache_version(inheritance_version_cache_key(locations[0]))
 
     def _clean_item_data(self, item):
         """
@@ -433,15 +1005,175 @@ class MongoModuleStore(ModuleStoreWriteBase):
         item['location'] = item['_id']
         del item['_id']
 
-    def _query_children_for_cache_children(self, items):
+    def _query_children_for_cache_children(self, items, course_records=None):
         """
         Generate a pymongo in query for finding the items and return the payloads
+
+        `course_records`, if given, are the records of whole courses as returned by
+        _query_courses_for_cache_children, where the items of those courses are looked up
         """
         # first get non-draft in a round-trip
-        query = {
-            '_id': {'$in': [namedtuple_to_son(Location(item)) for item in items]}
-        }
-        return list(self.collection.find(query))
+        return self._find_items([Location(item) for item in items], course_records).values()
+
+    def _query_courses_for_cache_children(self, items):
+        """
+        If all the items are courses, return a dict mapping Location -> record for
+        everything in those courses, read in a single query.  Otherwise return None.
+
+        This lets _cache_children load whole courses without a query per level of
+        the course.
+        """
+        if not items or any(item['_id']['category'] != 'course' for item in items):
+            return None
+
+        course_queries = [
+            {'_id.tag': item['_id']['tag'], '_id.org': item['_id']['org'], '_id.course': item['_id']['course']}
+            for item in items
+        ]
+        query = course_queries[0] if len(course_queries) == 1 else {'$or': course_queries}
+        # _find_items applies the writes buffered in bulk write mode to these records
+        return dict((Location(record['_id']), record) for record in self.collection.find(query))
+
+    def _get_course_version(self, location):
+        """
+        Return the version of location's course, or None if the items of the course
+        can't be cached.
+
+        The version is kept in the metadata_inheritance_cache_subsystem, which is
+        shared by all the processes using the store, and is changed after every
+        write to the course: the items cached before that are then out of date.
+        The version is only read once per request.
+        """
+        if self.item_cache is None or self.metadata_inheritance_cache_subsystem is None:
+            return None
+
+        key = course_version_cache_key(location)
+        if self.request_cache is not None and key in self.request_cache.data.get('course_versions', {}):
+            return self.request_cache.data['course_versions'][key]
+
+        version = self.metadata_inheritance_cache_subsystem.get(key)
+        if version is None:
+            return self._set_course_version(location)
+        if self.request_cache is not None:
+            self.request_cache.data.setdefault('course_versions', {})[key] = version
+        return version
+
+    def _set_course_version(self, location):
+        """
+        Give location's course a new version, so that no process uses the items of
+        the course it has cached anymore.  Must be called after writing to the course,
+        whether or not this store caches items itself.
+        """
+        if self.metadata_inheritance_cache_subsystem is None:
+            return None
+
+        key = course_version_cache_key(location)
+        version = uuid4().hex
+        self.metadata_inheritance_cache_subsystem.set(key, version)
+        if self.request_cache is not None:
+            self.request_cache.data.setdefault('course_versions', {})[key] = version
+        return version
+
+    def _get_inheritance_version(self, location):
+        """
+        Return the version of the containers of location's course, which the cached
+        metadata inheritance tree is computed from.
+        """
+        key = inheritance_version_cache_key(location)
+        version = self.metadata_inheritance_cache_subsystem.get(key)
+        if version is None:
+            return self._increment_cache_version(key)
+        return version
+
+    def _set_inheritance_version(self, location):
+        """
+        Give location's course a new inheritance version, and return it, if location
+        is a container.  Must be called after writing location.
+        """
+        if self.metadata_inheritance_cache_subsystem is None:
+            return None
+        if location.category not in get_block_types_with_children():
+            return None
+        return self._increment_cache_version(inheritance_version_cache_key(location))
+
+    def _increment_cache_version(self, key):
+        """
+        Increment the version kept under key in the metadata_inheritance_cache_subsystem,
+        and return it.
+
+        Versions are incremented atomically, so that a process can tell whether what
+        it cached is the one from just before its own write.  When there's no version
+        in the metadata_inheritance_cache_subsystem, a random one is used, rather than
+        one things may have been cached under before.
+        """
+        try:
+            return self.metadata_inheritance_cache_subsystem.incr(key)
+        except ValueError:
+            version = random.getrandbits(62)
+            if self.metadata_inheritance_cache_subsystem.add(key, version):
+                return version
+            return self.metadata_inheritance_cache_subsystem.incr(key)
+
+    def _find_items(self, locations, course_records=None):
+        """
+        Return a dict mapping those of `locations` which are in the collection to
+        their records.  The records can be modified by the caller.
+
+        Records are taken from `course_records` if that has the records of the
+        location's course (see _query_courses_for_cache_children), else read from
+        the item cache if possible.  The others are read from Mongo in a single query.
+        The writes this thread buffered in bulk write mode are applied to the records.
+        """
+        wanted = locations
+        found = {}
+        versions = {}
+        to_query = []
+        if course_records:
+            courses = set((location.org, location.course) for location in course_records)
+            remaining = []
+            for location in locations:
+                if location in course_records:
+                    # _cache_children renames fields of the records it's given
+                    found[location] = dict(course_records[location])
+                elif (location.org, location.course) not in courses:
+                    remaining.append(location)
+            locations = remaining
+
+        for location in locations:
+            course_key = metadata_cache_key(location)
+            if course_key not in versions:
+                versions[course_key] = self._get_course_version(location)
+            version = versions[course_key]
+            cached = None
+            if version is not None:
+                cached = self.item_cache.get((version, location))
+            if cached is None:
+                to_query.append(location)
+            elif cached is not ITEM_NOT_FOUND:
+                found[location] = copy.deepcopy(cached)
+
+        if to_query:
+            query = {
+                '_id': {'$in': [namedtuple_to_son(location) for location in to_query]}
+            }
+            # Records to be cached are read from the primary: a lagging secondary
+            # could otherwise have them cached under the course's new version.
+            read_preference = ReadPreference.PRIMARY if self.item_cache is not None else self.collection.read_preference
+            for item in self.collection.find(query, read_preference=read_preference):
+                found[Location(item['_id'])] = item
+            for location in to_query:
+                version = versions[metadata_cache_key(location)]
+                if version is not None:
+                    # The records found are modified by the callers, so cache copies
+                    item = copy.deepcopy(found[location]) if location in found else ITEM_NOT_FOUND
+                    self.item_cache.set((version, location), item)
+
+        for location in wanted:
+            update = self._pending_update(location)
+            if update is not None:
+                record = found.get(location) or {'_id': namedtuple_to_son(location)}
+                found[location] = apply_update(record, copy.deepcopy(update))
+        return found
 
     def _cache_children(self, items, depth=0):
         """
@@ -449,11 +1181,15 @@ class MongoModuleStore(ModuleStoreWriteBase):
         for all descendents of items up to the specified depth.
         (0 = no descendents, 1 = children, 2 = grandchildren, etc)
         If depth is None, will load all the children.
-        This will make a number of queries that is linear in the depth.
+        This will make a number of queries that is linear in the depth, except
+        when loading all of a course, which takes a single query.
         """
 
         data = {}
         to_process = list(items)
+        course_records = None
+        if depth is None:
+            course_records = self._query_courses_for_cache_children(to_process)
         while to_process and depth is None or depth >= 0:
             children = []
             for item in to_process:
@@ -469,7 +1205,7 @@ class MongoModuleStore(ModuleStoreWriteBase):
             # for or-query syntax
             to_process = []
             if children:
-                to_process = self._query_children_for_cache_children(children)
+                to_process = self._query_children_for_cache_children(children, course_records)
 
             # If depth is None, then we just recurse until we hit all the descendents
             if depth is not None:
@@ -485,9 +1221,10 @@ class MongoModuleStore(ModuleStoreWriteBase):
         data_dir = getattr(item, 'data_dir', location.course)
         root = self.fs_root / data_dir
 
-        root.makedirs_p()  # create directory if it doesn't exist
-
-        resource_fs = OSFS(root)
+        resource_fs = self.resource_fs_by_root.get(root)
+        if resource_fs is None:
+            root.makedirs_p()  # create directory if it doesn't exist
+            resource_fs = self.resource_fs_by_root[root] = OSFS(root)
 
         cached_metadata = {}
         if apply_cached_metadata:
@@ -545,10 +1282,8 @@ class MongoModuleStore(ModuleStoreWriteBase):
         specified, returns the latest.  If the item is not present, raise
         ItemNotFoundError.
         '''
-        item = self.collection.find_one(
-            location_to_query(location, wildcard=False),
-            sort=[('revision', pymongo.ASCENDING)],
-        )
+        location = Location(location)
+        item = self._find_items([location]).get(location)
         if item is None:
             raise ItemNotFoundError(location)
         return item
@@ -609,12 +1344,14 @@ class MongoModuleStore(ModuleStoreWriteBase):
         return self.get_item(location, depth=depth)
 
     def get_items(self, location, course_id=None, depth=0, qualifiers=None):
+        location = Location(location)
         items = self.collection.find(
             location_to_query(location),
             sort=[('revision', pymongo.ASCENDING)],
         )
+        items = self._with_pending_writes(list(items), location)
 
-        modules = self._load_items(list(items), depth)
+        modules = self._load_items(items, depth)
         return modules
 
     def create_course(self, course_id, definition_data=None, metadata=None, runtime=None):
@@ -758,7 +1495,15 @@ class MongoModuleStore(ModuleStoreWriteBase):
         """
         Set update on the specified item, and raises ItemNotFoundError
         if the location doesn't exist
+
+        Returns the inheritance version the write gave the course, if any
         """
+        location = Location(location)
+        pending = self._thread_bulk_writes().get(get_course_id_no_run(location))
+        if pending is not None:
+            # Copied, as the caller may change the xblock's values before they're sent
+            pending.setdefault(location, {}).update(copy.deepcopy(update))
+            return None
 
         # See http://www.mongodb.org/display/DOCS/Updating for
         # atomic update syntax
@@ -771,8 +1516,11 @@ class MongoModuleStore(ModuleStoreWriteBase):
             # from overriding our default value set in the init method.
             safe=self.collection.safe
         )
+        self._set_course_version(Location(location))
+        version = self._set_inheritance_version(Location(location))
         if result['n'] == 0:
             raise ItemNotFoundError(location)
+        return version
 
     def update_item(self, xblock, user=None, allow_not_found=False):
         """
@@ -792,7 +1540,9 @@ class MongoModuleStore(ModuleStoreWriteBase):
                 xblock.children = [child.url() if isinstance(child, Location) else child
                                    for child in xblock.children]
                 payload.update({'definition.children': xblock.children})
-            self._update_single_item(xblock.location, payload)
+            version = self._update_single_item(xblock.location, payload)
+            if xblock.has_children:
+                self.update_cached_parent_index(xblock.location, xblock.children, version)
             # for static tabs, their containing course also records their display name
             if xblock.category == 'static_tab':
                 course = self._get_course_for_item(xblock.location)
@@ -803,9 +1553,9 @@ class MongoModuleStore(ModuleStoreWriteBase):
                     static_tab['name'] = xblock.display_name
                     self.update_item(course, user)
 
-            # recompute (and update) the metadata inheritance tree which is cached
+            # update the metadata inheritance tree which is cached
             # was conditional on children or metadata having changed before dhm made one update to rule them all
-            self.refresh_cached_metadata_inheritance_tree(xblock.location)
+            self.update_cached_metadata_inheritance_tree(xblock.location, version)
             # fire signal that we've written to DB
             self.fire_updated_modulestore_signal(get_course_id_no_run(xblock.location), xblock.location)
         except ItemNotFoundError:
@@ -830,21 +1580,50 @@ class MongoModuleStore(ModuleStoreWriteBase):
             course.tabs = [tab for tab in existing_tabs if tab.get('url_slug') != location.name]
             self.update_item(course, '**replace_user**')
 
+        # buffered writes to it would bring it back
+        self._flush_course_bulk_writes(Location(location))
         # Must include this to avoid the django debug toolbar (which defines the deprecated "safe=False")
         # from overriding our default value set in the init method.
         self.collection.remove({'_id': Location(location).dict()}, safe=self.collection.safe)
-        # recompute (and update) the metadata inheritance tree which is cached
-        self.refresh_cached_metadata_inheritance_tree(Location(location))
+        self._set_course_version(Location(location))
+        version = self._set_inheritance_version(Location(location))
+        self.update_cached_parent_index(location, None, version)
+        # update the metadata inheritance tree which is cached
+        self.update_cached_metadata_inheritance_tree(Location(location), version)
         self.fire_updated_modulestore_signal(get_course_id_no_run(Location(location)), Location(location))
 
     def get_parent_locations(self, location, course_id):
         '''Find all locations that are the parents of this location in this
         course.  Needed for path_to_location().
         '''
-        location = Location.ensure_fully_specified(location)
+        return self._find_parent_locations(Location.ensure_fully_specified(location))
+
+    def _find_parent_locations(self, location, read_preference=None):
+        """
+        Return the locations of the parents of location, from the cached parent index
+        if possible, else from Mongo, read with read_preference if given, with the
+        writes this thread buffered in bulk write mode applied.
+        """
+        course_writes = self._thread_bulk_writes().get(get_course_id_no_run(location))
+        if not course_writes:
+            parent_index = self.get_cached_parent_index(location)
+            if parent_index is not None:
+                return [Location(parent) for parent in parent_index.get(location.url(), [])]
+
         items = self.collection.find({'definition.children': location.url()},
-                                     {'_id': True})
-        return [Location(i['_id']) for i in items]
+                                     {'_id': True},
+                                     read_preference=read_preference or self.collection.read_preference)
+        parents = [Location(i['_id']) for i in items]
+        # as the children this thread buffered in bulk write mode will make them
+        for pending_location, update in (course_writes or {}).iteritems():
+            children = update.get('definition.children')
+            if children is None:
+                continue
+            if location.url() in children and pending_location not in parents:
+                parents.append(pending_location)
+            elif location.url() not in children and pending_location in parents:
+                parents.remove(pending_location)
+        return parents
 
     def get_modulestore_type(self, course_id):
         """
@@ -861,6 +1640,7 @@ class MongoModuleStore(ModuleStoreWriteBase):
         Return an array all of the locations for orphans in the course.
         """
         detached_categories = [name for name, __ in XBlock.load_tagged_classes("detached")]
+        self._flush_course_bulk_writes(course_location)
         all_items = self.collection.find({
             '_id.org': course_location.org,
             '_id.course': course_location.course,
@@ -881,6 +1661,8 @@ class MongoModuleStore(ModuleStoreWriteBase):
         :param wiki_slug: the course wiki root slug
         :return: list of course locations
         """
+        # the query spans all the courses
+        self._flush_bulk_writes()
         courses = self.collection.find({'definition.data.wiki_slug': wiki_slug})
         return [Location(course['_id']) for course in courses]
 
@@ -75,22 +75,33 @@ class DraftModuleStore(MongoModuleStore):
             in the request. The depth is counted in the number of calls to
             get_children() to cache. None indicates to cache all descendents
         """
+        location = Location.ensure_fully_specified(location)
+        item = self._find_one_preferring_draft(location)
+        return wrap_draft(self._load_items([item], depth)[0])
 
-        try:
-            return wrap_draft(super(DraftModuleStore, self).get_item(as_draft(location), depth=depth))
-        except ItemNotFoundError:
-            return wrap_draft(super(DraftModuleStore, self).get_item(location, depth=depth))
+    def _find_one_preferring_draft(self, location):
+        """
+        Return the record of the draft of location if there's one, and the record of
+        location otherwise, reading both in a single query.  Raises ItemNotFoundError
+        if neither exists.
+        """
+        draft_location = as_draft(location)
+        if location == draft_location or location.category in DIRECT_ONLY_CATEGORIES:
+            # there's only one version to look for
+            return self._find_one(location)
+
+        found = self._find_items([draft_location, location])
+        item = found.get(draft_location, found.get(location))
+        if item is None:
+            raise ItemNotFoundError(location)
+        return item
 
     def get_instance(self, course_id, location, depth=0):
         """
         Get an instance of this location, with policy for course_id applied.
         TODO (vshnayder): this may want to live outside the modulestore eventually
         """
-
-        try:
-            return wrap_draft(super(DraftModuleStore, self).get_instance(course_id, as_draft(location), depth=depth))
-        except ItemNotFoundError:
-            return wrap_draft(super(DraftModuleStore, self).get_instance(course_id, location, depth=depth))
+        return self.get_item(location, depth=depth)
 
     def create_xmodule(self, location, definition_data=None, metadata=None, system=None, fields={}):
         """
@@ -119,19 +130,27 @@ class DraftModuleStore(MongoModuleStore):
             in the request. The depth is counted in the number of calls to
             get_children() to cache. None indicates to cache all descendents
         """
-        draft_loc = as_draft(location)
-
-        draft_items = super(DraftModuleStore, self).get_items(draft_loc, course_id=course_id, depth=depth)
-        items = super(DraftModuleStore, self).get_items(location, course_id=course_id, depth=depth)
-
-        draft_locs_found = set(item.location.replace(revision=None) for item in draft_items)
-        non_draft_items = [
-            item
-            for item in items
-            if (item.location.revision != DRAFT
-                and item.location.replace(revision=None) not in draft_locs_found)
+        location = Location(location)
+        query = location_to_query(location)
+        with_drafts = location.revision is None and location.category not in DIRECT_ONLY_CATEGORIES
+        if with_drafts:
+            # read the drafts along with the published items
+            query['_id.revision'] = {'$in': [None, DRAFT]}
+
+        records = list(self.collection.find(query, sort=[('revision', pymongo.ASCENDING)]))
+        records = self._with_pending_writes(records, location, any_revision=with_drafts)
+
+        # the drafts replace their published versions
+        draft_records = [record for record in records if record['_id'].get('revision') == DRAFT]
+        draft_locs_found = set(as_published(record['_id']) for record in draft_records)
+        non_draft_records = [
+            record
+            for record in records
+            if (record['_id'].get('revision') != DRAFT
+                and as_published(record['_id']) not in draft_locs_found)
         ]
-        return [wrap_draft(item) for item in draft_items + non_draft_items]
+        items = self._load_items(draft_records + non_draft_records, depth)
+        return [wrap_draft(item) for item in items]
 
     def convert_to_draft(self, source_location):
         """
@@ -139,6 +158,7 @@ class DraftModuleStore(MongoModuleStore):
 
         :param source: the location of the source (its revision must be None)
         """
+        self._flush_course_bulk_writes(Location(source_location))
         original = self.collection.find_one(location_to_query(source_location))
         draft_location = as_draft(source_location)
         if draft_location.category in DIRECT_ONLY_CATEGORIES:
@@ -150,8 +170,11 @@ class DraftModuleStore(MongoModuleStore):
             self.collection.insert(original)
         except pymongo.errors.DuplicateKeyError:
             raise DuplicateItemError(original['_id'])
+        self._set_course_version(draft_location)
+        version = self._set_inheritance_version(draft_location)
+        self.update_cached_parent_index(draft_location, original.get('definition', {}).get('children'), version)
 
-        self.refresh_cached_metadata_inheritance_tree(draft_location)
+        self.update_cached_metadata_inheritance_tree(draft_location, version)
         self.fire_updated_modulestore_signal(get_course_id_no_run(draft_location), draft_location)
 
         return self._load_items([original])[0]
@@ -229,33 +252,18 @@ class DraftModuleStore(MongoModuleStore):
         self.convert_to_draft(location)
         super(DraftModuleStore, self).delete_item(location)
 
-    def _query_children_for_cache_children(self, items):
-        # first get non-draft in a round-trip
-        to_process_non_drafts = super(DraftModuleStore, self)._query_children_for_cache_children(items)
-
-        to_process_dict = {}
-        for non_draft in to_process_non_drafts:
-            to_process_dict[Location(non_draft["_id"])] = non_draft
-
-        # now query all draft content in another round-trip
-        query = {
-            '_id': {'$in': [namedtuple_to_son(as_draft(Location(item))) for item in items]}
-        }
-        to_process_drafts = list(self.collection.find(query))
-
-        # now we have to go through all drafts and replace the non-draft
-        # with the draft. This is because the semantics of the DraftStore is to
-        # always return the draft - if available
-        for draft in to_process_drafts:
-            draft_loc = Location(draft["_id"])
-            draft_as_non_draft_loc = draft_loc.replace(revision=None)
-
-            # does non-draft exist in the collection
-            # if so, replace it
-            if draft_as_non_draft_loc in to_process_dict:
-                to_process_dict[draft_as_non_draft_loc] = draft
-
-        # convert the dict - which is used for look ups - back into a list
-        queried_children = to_process_dict.values()
-
-        return queried_children
+    def _query_children_for_cache_children(self, items, course_records=None):
+        # get the non-drafts and the drafts in a single round-trip
+        locations = list(set(Location(item) for item in items))
+        draft_locations = [
+            as_draft(location) for location in locations if location.category not in DIRECT_ONLY_CATEGORIES
+        ]
+        found = self._find_items(locations + draft_locations, course_records)
+
+        # the semantics of the DraftStore is to always return the draft - if available -
+        # in place of the non-draft, if that exists in the collection
+        return [
+            found.get(as_draft(location), found[location])
+            for location in locations
+            if location in found
+        ]
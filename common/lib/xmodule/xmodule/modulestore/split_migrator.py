@@ -98,65 +98,65 @@ class SplitMigrator(object):
         """
         update each draft. Create any which don't exist in published and attach to their parents.
         """
-        # each true update below will trigger a new version of the structure. We may want to just have one new version
-        # but that's for a later date.
+        # all of the updates below go into one new version of the structure
         new_draft_course_loc = CourseLocator(package_id=new_package_id, branch='draft')
-        # to prevent race conditions of grandchilden being added before their parents and thus having no parent to
-        # add to
-        awaiting_adoption = {}
-        for module in self.draft_modulestore.get_items(
-            old_course_loc.replace(category=None, name=None, revision=draft.DRAFT),
-            old_course_id
-        ):
-            if getattr(module, 'is_draft', False):
-                new_locator = self.loc_mapper.translate_location(
-                    old_course_id, module.location, False, add_entry_if_missing=True
-                )
-                if self.split_modulestore.has_item(new_package_id, new_locator):
-                    # was in 'direct' so draft is a new version
-                    split_module = self.split_modulestore.get_item(new_locator)
-                    # need to remove any no-longer-explicitly-set values and add/update any now set values.
-                    for name, field in split_module.fields.iteritems():
-                        if field.is_set_on(split_module) and not module.fields[name].is_set_on(module):
-                            field.delete_from(split_module)
-                    for name, field in module.fields.iteritems():
-                        # draft children will insert themselves and the others are here already; so, don't do it 2x
-                        if name != 'children' and field.is_set_on(module):
-                            field.write_to(split_module, field.read_from(module))
-
-                    _new_module = self.split_modulestore.update_item(split_module, user.id)
-                else:
-                    # only a draft version (aka, 'private'). parent needs updated too.
-                    # create a new course version just in case the current head is also the prod head
-                    _new_module = self.split_modulestore.create_item(
-                        new_draft_course_loc, module.category, user.id,
-                        block_id=new_locator.block_id,
-                        fields=self._get_json_fields_translate_children(module, old_course_id, True)
+        with self.split_modulestore.bulk_write_operations(new_draft_course_loc):
+            # to prevent race conditions of grandchilden being added before their parents and thus having no parent to
+            # add to
+            awaiting_adoption = {}
+            for module in self.draft_modulestore.get_items(
+                old_course_loc.replace(category=None, name=None, revision=draft.DRAFT),
+                old_course_id
+            ):
+                if getattr(module, 'is_draft', False):
+                    new_locator = self.loc_mapper.translate_location(
+                        old_course_id, module.location, False, add_entry_if_missing=True
                     )
-                    awaiting_adoption[module.location] = new_locator.block_id
-        for draft_location, new_block_id in awaiting_adoption.iteritems():
-            for parent_loc in self.draft_modulestore.get_parent_locations(draft_location, old_course_id):
-                old_parent = self.draft_modulestore.get_item(parent_loc)
-                new_parent = self.split_modulestore.get_item(
-                    self.loc_mapper.translate_location(old_course_id, old_parent.location, False)
-                )
-                # this only occurs if the parent was also awaiting adoption
-                if new_block_id in new_parent.children:
-                    break
-                # find index for module: new_parent may be missing quite a few of old_parent's children
-                new_parent_cursor = 0
-                draft_location = draft_location.url()  # need as string
-                for old_child_loc in old_parent.children:
-                    if old_child_loc == draft_location:
+                    if self.split_modulestore.has_item(new_package_id, new_locator):
+                        # was in 'direct' so draft is a new version
+                        split_module = self.split_modulestore.get_item(new_locator)
+                        # need to remove any no-longer-explicitly-set values and add/update any now set values.
+                        for name, field in split_module.fields.iteritems():
+                            if field.is_set_on(split_module) and not module.fields[name].is_set_on(module):
+                                field.delete_from(split_module)
+                        for name, field in module.fields.iteritems():
+                            # draft children will insert themselves and the others are here already; so, don't do it 2x
+                            if name != 'children' and field.is_set_on(module):
+                                field.write_to(split_module, field.read_from(module))
+
+                        _new_module = self.split_modulestore.update_item(split_module, user.id)
+                    else:
+                        # only a draft version (aka, 'private'). parent needs updated too.
+                        # create a new course version just in case the current head is also the prod head
+                        _new_module = self.split_modulestore.create_item(
+                            new_draft_course_loc, module.category, user.id,
+                            block_id=new_locator.block_id,
+                            fields=self._get_json_fields_translate_children(module, old_course_id, True)
+                        )
+                        awaiting_adoption[module.location] = new_locator.block_id
+            for draft_location, new_block_id in awaiting_adoption.iteritems():
+                for parent_loc in self.draft_modulestore.get_parent_locations(draft_location, old_course_id):
+                    old_parent = self.draft_modulestore.get_item(parent_loc)
+                    new_parent = self.split_modulestore.get_item(
+                        self.loc_mapper.translate_location(old_course_id, old_parent.location, False)
+                    )
+                    # this only occurs if the parent was also awaiting adoption
+                    if new_block_id in new_parent.children:
                         break
-                    sibling_loc = self.loc_mapper.translate_location(old_course_id, Location(old_child_loc), False)
-                    # sibling may move cursor
-                    for idx in range(new_parent_cursor, len(new_parent.children)):
-                        if new_parent.children[idx] == sibling_loc.block_id:
-                            new_parent_cursor = idx + 1
+                    # find index for module: new_parent may be missing quite a few of old_parent's children
+                    new_parent_cursor = 0
+                    draft_location = draft_location.url()  # need as string
+                    for old_child_loc in old_parent.children:
+                        if old_child_loc == draft_location:
                             break
-                new_parent.children.insert(new_parent_cursor, new_block_id)
-                new_parent = self.split_modulestore.update_item(new_parent, user.id)
+                        sibling_loc = self.loc_mapper.translate_location(old_course_id, Location(old_child_loc), False)
+                        # sibling may move cursor
+                        for idx in range(new_parent_cursor, len(new_parent.children)):
+                            if new_parent.children[idx] == sibling_loc.block_id:
+                                new_parent_cursor = idx + 1
+                                break
+                    new_parent.children.insert(new_parent_cursor, new_block_id)
+                    new_parent = self.split_modulestore.update_item(new_parent, user.id)
 
     def _get_json_fields_translate_children(self, xblock, old_course_id, published):
         """
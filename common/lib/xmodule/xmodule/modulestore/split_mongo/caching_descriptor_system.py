@@ -8,7 +8,6 @@ from xblock.runtime import KvsFieldData, IdReader
 from ..exceptions import ItemNotFoundError
 from .split_mongo_kvs import SplitMongoKVS
 from xblock.fields import ScopeIds
-from xmodule.modulestore.loc_mapper_store import LocMapperStore
 
 log = logging.getLogger(__name__)
 
@@ -62,12 +61,7 @@ class CachingDescriptorSystem(MakoDescriptorSystem):
         self.lazy = lazy
         self.module_data = module_data
         # Compute inheritance
-        modulestore.inherit_settings(
-            course_entry['structure'].get('blocks', {}),
-            course_entry['structure'].get('blocks', {}).get(
-                LocMapperStore.encode_key_for_mongo(course_entry['structure'].get('root'))
-            )
-        )
+        modulestore.set_inherited_settings(course_entry['structure'])
         self.default_class = default_class
         self.local_modules = {}
 
@@ -8,18 +8,25 @@ class DefinitionLazyLoader(object):
     object doesn't force access during init but waits until client wants the
     definition. Only works if the modulestore is a split mongo store.
     """
-    def __init__(self, modulestore, definition_id):
+    def __init__(self, modulestore, definition_id, prefetched=None):
         """
         Simple placeholder for yet-to-be-fetched data
         :param modulestore: the pymongo db connection with the definitions
         :param definition_locator: the id of the record in the above to fetch
+        :param prefetched: an optional definition already fetched in bulk. It's handed to the
+            first fetch and dropped, so that no two callers share (and change) it and so that
+            the loader doesn't keep it alive after.
         """
         self.modulestore = modulestore
         self.definition_locator = DefinitionLocator(definition_id)
+        self.prefetched = prefetched
 
     def fetch(self):
         """
         Fetch the definition. Note, the caller should replace this lazy
         loader pointer with the result so as not to fetch more than once
         """
+        if self.prefetched is not None:
+            definition, self.prefetched = self.prefetched, None
+            return definition
         return self.modulestore.db_connection.get_definition(self.definition_locator.definition_id)
@@ -1,30 +1,19 @@
 """
 Segregation of pymongo functions from the data modeling mechanisms for split modulestore.
 """
-import pymongo
+from xmodule.mongo_utils import connect_to_mongodb
 
 class MongoConnection(object):
     """
     Segregation of pymongo functions from the data modeling mechanisms for split modulestore.
     """
-    def __init__(
-        self, db, collection, host, port=27017, tz_aware=True, user=None, password=None, **kwargs
-    ):
+    def __init__(self, db, collection, host, **kwargs):
         """
         Create & open the connection, authenticate, and provide pointers to the collections
-        """
-        self.database = pymongo.database.Database(
-            pymongo.MongoClient(
-                host=host,
-                port=port,
-                tz_aware=tz_aware,
-                **kwargs
-            ),
-            db
-        )
 
-        if user is not None and password is not None:
-            self.database.authenticate(user, password)
+        The kwargs are the connection options of xmodule.mongo_utils.connect_to_mongodb
+        """
+        self.database = connect_to_mongodb(db, host, **kwargs)
 
         self.course_index = self.database[collection + '.active_versions']
         self.structures = self.database[collection + '.structures']
@@ -44,6 +33,13 @@ class MongoConnection(object):
         """
         return self.structures.find_one({'_id': key})
 
+    def get_structure_delta(self, key):
+        """
+        Get the delta info of the structure whose id is the given key, or None if it's stored in full
+        """
+        structure = self.structures.find_one({'_id': key}, fields=['delta'])
+        return structure.get('delta') if structure is not None else None
+
     def find_matching_structures(self, query):
         """
         Find the structure matching the query. Right now the query must be a legal mongo query
@@ -33,6 +33,11 @@ Representation:
                 ***** 'previous_version': the guid for the structure which previously changed this xblock
                 (will be the previous value of update_version; so, may point to a structure not in this
                 structure's history.)
+    ** 'delta': only in structures stored as a delta against another version (see structure_snapshot_interval),
+    whose 'blocks' then only has the blocks which differ from that version's:
+        *** 'base': the guid of the structure this is a delta against (its previous_version),
+        *** 'deleted': the block_ids of the base's blocks which aren't in this structure,
+        *** 'depth': how many deltas have to be applied to a structure stored in full to get this one.
 * definition: shared content with revision history for xblock content fields
     ** '_id': definition_id (guid),
     ** 'category': xblock type id
@@ -45,12 +50,14 @@ Representation:
         definition. Acts as a pseudo-object identifier.
 """
 import threading
+import random
 import datetime
 import logging
 import re
 from importlib import import_module
 from path import path
 import copy
+from contextlib import contextmanager
 from pytz import UTC
 
 from xmodule.errortracker import null_error_tracker
@@ -70,6 +77,7 @@ from bson.objectid import ObjectId
 from xmodule.modulestore.split_mongo.mongo_connection import MongoConnection
 from xblock.core import XBlock
 from xmodule.modulestore.loc_mapper_store import LocMapperStore
+from calc.lru import LRUCache
 
 log = logging.getLogger(__name__)
 #==============================================================================
@@ -100,15 +108,33 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
     """
 
     SCHEMA_VERSION = 1
+    # the key of the generation of the structures in the metadata_inheritance_cache_subsystem
+    STRUCTURE_GENERATION_CACHE_KEY = u'split_structure.generation'
+    # how many course versions each thread keeps loaded descriptors for
+    THREAD_COURSE_CACHE_SIZE = 20
     reference_type = Locator
     def __init__(self, doc_store_config, fs_root, render_template,
                  default_class=None,
                  error_tracker=null_error_tracker,
                  loc_mapper=None,
                  i18n_service=None,
+                 structure_cache_size=50,
+                 structure_snapshot_interval=0,
                  **kwargs):
         """
         :param doc_store_config: must have a host, db, and collection entries. Other common entries: port, tz_aware.
+        :param structure_cache_size: how many structures to keep in an in-process cache shared by all
+            threads. Structures are versioned rather than changed, so they can be reused across requests;
+            the few which are overwritten in place (by create_item with continue_version and by
+            internal_clean_children) are marked as such and aren't cached from then on. Such a write
+            also moves the cached structures on to a new generation, which makes every process and
+            thread drop what it had cached before (see _sync_structure_generation).
+            If there's a metadata_inheritance_cache_subsystem, it's used as a second, shared tier.
+            The data computed from structures, like inherited settings, is cached for as many versions.
+            0 turns the caches off.
+        :param structure_snapshot_interval: if not 0, new structures are stored as deltas against their
+            previous versions, except every structure_snapshot_interval'th one, which is stored in full
+            so that no structure takes more than that many reads to rebuild.
         """
 
         super(SplitMongoModuleStore, self).__init__(**kwargs)
@@ -117,9 +143,17 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
         self.db_connection = MongoConnection(**doc_store_config)
         self.db = self.db_connection.database
 
-        # Code review question: How should I expire entries?
-        # _add_cache could use a lru mechanism to control the cache size?
+        self.structure_cache_size = structure_cache_size
+        self.structure_cache = LRUCache(structure_cache_size) if structure_cache_size else None
+        # what's computed from each structure version, like the settings its blocks inherit
+        self.derived_data_cache = LRUCache(structure_cache_size) if structure_cache_size else None
+        self.structure_snapshot_interval = structure_snapshot_interval
+        # the descriptor systems of each thread's recently loaded course versions
         self.thread_cache = threading.local()
+        # moved on by the structures written in place by this process
+        self.local_structure_generation = 0
+        # the generation the structure_cache and derived_data_cache were filled in
+        self.structure_generation = None
 
         if default_class is not None:
             module_path, _, class_name = default_class.rpartition('.')
@@ -139,20 +173,43 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
         :param system: a CachingDescriptorSystem
         :param base_block_ids: list of block_ids to fetch
         :param depth: how deep below these to prefetch
-        :param lazy: whether to fetch definitions or use placeholders
+        :param lazy: whether to fetch definitions or use placeholders. When lazy and prefetching
+            descendants (depth is not 0), the placeholders are filled by one query for all the
+            definitions rather than one query each.
         '''
+        structure = system.course_entry['structure']
         new_module_data = {}
         for block_id in base_block_ids:
-            new_module_data = self.descendants(
-                system.course_entry['structure']['blocks'],
-                block_id,
-                depth,
-                new_module_data
-            )
+            if depth is None:
+                for descendant_id in self._get_descendant_ids(structure, block_id):
+                    new_module_data[descendant_id] = structure['blocks'][
+                        LocMapperStore.encode_key_for_mongo(descendant_id)
+                    ]
+            else:
+                new_module_data = self.descendants(structure['blocks'], block_id, depth, new_module_data)
 
         if lazy:
-            for block in new_module_data.itervalues():
-                block['definition'] = DefinitionLazyLoader(self, block['definition'])
+            definition_ids = {}
+            for block_id, block in new_module_data.iteritems():
+                definition_id = block['definition']
+                if isinstance(definition_id, DefinitionLazyLoader):
+                    # cached before
+                    definition_id = definition_id.definition_locator.definition_id
+                definition_ids[block_id] = definition_id
+            prefetched = {}
+            if depth != 0 and len(new_module_data) > 1:
+                prefetched = {
+                    definition['_id']: definition
+                    for definition in self.db_connection.find_matching_definitions({
+                        '_id': {'$in': list(set(definition_ids.itervalues()))}
+                    })
+                }
+            for block_id, block in new_module_data.iteritems():
+                # each loader only holds its own definition, which it drops once fetched; blocks
+                # sharing a definition after the first fetch it themselves
+                block['definition'] = DefinitionLazyLoader(
+                    self, definition_ids[block_id], prefetched.pop(definition_ids[block_id], None)
+                )
         else:
             # Load all descendants by id
             descendent_definitions = self.db_connection.find_matching_definitions({
@@ -196,6 +253,9 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
             )
             self._add_cache(course_entry['structure']['_id'], system)
             self.cache_items(system, block_ids, depth, lazy)
+        elif depth != 0:
+            # prefetch the descendants (and their definitions) for the new descriptors
+            self.cache_items(system, block_ids, depth, lazy)
         return [system.load_item(block_id, course_entry) for block_id in block_ids]
 
     def _get_cache(self, course_version_guid):
@@ -203,10 +263,7 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
         Find the descriptor cache for this course if it exists
         :param course_version_guid:
         """
-        if not hasattr(self.thread_cache, 'course_cache'):
-            self.thread_cache.course_cache = {}
-        system = self.thread_cache.course_cache
-        return system.get(course_version_guid)
+        return self._thread_course_cache().get(course_version_guid)
 
     def _add_cache(self, course_version_guid, system):
         """
@@ -214,20 +271,380 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
         :param course_version_guid:
         :param system:
         """
-        if not hasattr(self.thread_cache, 'course_cache'):
-            self.thread_cache.course_cache = {}
-        self.thread_cache.course_cache[course_version_guid] = system
+        self._thread_course_cache().set(course_version_guid, system)
         return system
 
+    def _thread_course_cache(self):
+        """
+        Return this thread's LRUCache of descriptor systems by course version guid
+        """
+        if not hasattr(self.thread_cache, 'course_cache'):
+            self.thread_cache.course_cache = LRUCache(self.THREAD_COURSE_CACHE_SIZE)
+        return self.thread_cache.course_cache
+
     def _clear_cache(self, course_version_guid=None):
         """
         Should only be used by testing or something which implements transactional boundary semantics.
-        :param course_version_guid: if provided, clear only this entry
+        Also forgets the cached structures, for use after a structure is updated in place.
+        :param course_version_guid: if provided, clear only this entry; otherwise the structures
+            in the metadata_inheritance_cache_subsystem are dropped too, by moving on to a new generation
         """
+        shared_cache = self.metadata_inheritance_cache_subsystem
         if course_version_guid:
-            del self.thread_cache.course_cache[course_version_guid]
+            self._thread_course_cache().delete(course_version_guid)
+            self._forget_derived_data(course_version_guid)
+            if self.structure_cache is not None:
+                self.structure_cache.delete(course_version_guid)
+            if shared_cache is not None:
+                shared_cache.delete(
+                    self._structure_cache_key(self._get_structure_generation(), course_version_guid)
+                )
         else:
-            self.thread_cache.course_cache = {}
+            self.thread_cache.course_cache = LRUCache(self.THREAD_COURSE_CACHE_SIZE)
+            if self.structure_cache is not None:
+                self.structure_cache.clear()
+            if self.derived_data_cache is not None:
+                self.derived_data_cache.clear()
+            if shared_cache is not None:
+                self._increment_structure_generation()
+
+    def _get_derived_data(self, structure):
+        """
+        Return the dict of the data computed from structure, shared by everything using its version.
+        It's empty to begin with, and a new one each time if the caches are off.
+        """
+        if self.derived_data_cache is None or structure.get('_id') is None:
+            return {}
+        derived_data = self.derived_data_cache.get(structure['_id'])
+        if derived_data is None:
+            derived_data = {}
+            self.derived_data_cache.set(structure['_id'], derived_data)
+        return derived_data
+
+    def _forget_derived_data(self, version_guid):
+        """
+        Forget the data computed from the structure version_guid, whose contents changed
+        """
+        if self.derived_data_cache is not None:
+            self.derived_data_cache.delete(version_guid)
+
+    @contextmanager
+    def bulk_write_operations(self, course_locator):
+        """
+        A context manager making the edits to the branch of the course course_locator points to
+        in one new structure version, rather than in a version per edit. The edits change one
+        pending structure, which is persisted along with a single course index update when
+        leaving the context. Nothing but the definitions, which are written as they're created,
+        is persisted if the context is left with an exception.
+
+        Edits made to other versions than the head, with force, aren't batched.
+
+        raises VersionConflictError when leaving the context if the head of the branch moved
+        meanwhile.
+        """
+        bulk_writes = self._thread_bulk_writes()
+        key = (course_locator.package_id, course_locator.branch)
+        if key in bulk_writes:
+            # already batching the edits to this branch
+            yield
+            return
+
+        index_entry = self._get_index_if_valid(course_locator)
+        if index_entry is None:
+            raise InsufficientSpecificationError('Not a course branch: %s' % course_locator)
+        bulk_writes[key] = {
+            'index': index_entry,
+            'original': self._lookup_course(course_locator)['structure'],
+            'version_guid': ObjectId(),
+            # the pending structure, created by the first edit
+            'structure': None,
+            # the copy of the pending (or original) structure to hand out to readers
+            'copy': None,
+        }
+        try:
+            yield
+            self._end_bulk_write(course_locator, bulk_writes[key])
+        finally:
+            bulk_write = bulk_writes.pop(key)
+            self._thread_course_cache().delete(bulk_write['version_guid'])
+            self._forget_derived_data(bulk_write['version_guid'])
+
+    def _thread_bulk_writes(self):
+        """
+        Return this thread's pending bulk_write_operations by package_id and branch
+        """
+        if not hasattr(self.thread_cache, 'bulk_writes'):
+            self.thread_cache.bulk_writes = {}
+        return self.thread_cache.bulk_writes
+
+    def _get_bulk_write(self, locator):
+        """
+        Return the pending bulk_write_operations of the branch locator points to, if any, unless
+        locator points to another version of it than the head or the pending one.
+        """
+        bulk_write = self._thread_bulk_writes().get((locator.package_id, locator.branch))
+        if bulk_write is None:
+            return None
+        if locator.version_guid not in (None, bulk_write['original']['_id'], bulk_write['version_guid']):
+            return None
+        return bulk_write
+
+    def _end_bulk_write(self, course_locator, bulk_write):
+        """
+        Persist the pending structure of bulk_write_operations and point the branch at it.
+        """
+        structure = bulk_write['structure']
+        if structure is None:
+            return
+
+        # the blocks edited more than once would otherwise list the pending structure as their previous
+        # version, rather than the one they were last changed in
+        original_blocks = bulk_write['original']['blocks']
+        for block_id, block in structure['blocks'].iteritems():
+            edit_info = block['edit_info']
+            if edit_info.get('update_version') == structure['_id']:
+                original_block = original_blocks.get(block_id)
+                if original_block is None:
+                    edit_info['previous_version'] = None
+                else:
+                    edit_info['previous_version'] = original_block['edit_info'].get('update_version')
+
+        index_entry = self.db_connection.get_course_index(course_locator.package_id)
+        head = index_entry['versions'].get(course_locator.branch)
+        if head != bulk_write['original']['_id']:
+            raise VersionConflictError(course_locator, head)
+        self._insert_structure(structure)
+        self._update_head(index_entry, course_locator.branch, structure['_id'])
+
+    def _edit_structure(self, locator, structure, user_id):
+        """
+        Return the structure to make an edit to the course locator points to in: a new version of
+        structure or, in bulk_write_operations, the pending structure.
+        """
+        bulk_write = self._get_bulk_write(locator)
+        if bulk_write is None:
+            return self._version_structure(structure, user_id)
+
+        if bulk_write['structure'] is None:
+            bulk_write['structure'] = self._version_structure(bulk_write['original'], user_id)
+            bulk_write['structure']['_id'] = bulk_write['version_guid']
+        else:
+            bulk_write['structure']['edited_by'] = user_id
+            bulk_write['structure']['edited_on'] = datetime.datetime.now(UTC)
+        return bulk_write['structure']
+
+    def _save_structure(self, locator, index_entry, structure):
+        """
+        Persist the structure returned by _edit_structure and, if index_entry is given, point the
+        branch locator points to at it. In bulk_write_operations, that's left for the end.
+        """
+        bulk_write = self._get_bulk_write(locator)
+        if bulk_write is not None:
+            # the copy and the descriptors and data computed from it are out of date
+            bulk_write['copy'] = None
+            self._thread_course_cache().delete(structure['_id'])
+            self._forget_derived_data(structure['_id'])
+            return
+
+        self._insert_structure(structure)
+        if index_entry is not None:
+            self._update_head(index_entry, locator.branch, structure['_id'])
+
+    @staticmethod
+    def _structure_cache_key(generation, version_guid):
+        """
+        The key of the structure with version_guid in the metadata_inheritance_cache_subsystem
+        """
+        return u'split_structure.{}.{}'.format(generation, version_guid)
+
+    def _get_structure_generation(self):
+        """
+        Return the generation the structures in the metadata_inheritance_cache_subsystem are
+        cached under, which _clear_cache moves on from to drop them all.
+        """
+        generation = self.metadata_inheritance_cache_subsystem.get(self.STRUCTURE_GENERATION_CACHE_KEY)
+        if generation is None:
+            return self._increment_structure_generation()
+        return generation
+
+    def _increment_structure_generation(self):
+        """
+        Move the structures in the metadata_inheritance_cache_subsystem on to a new generation,
+        and return it. When there's no generation yet, a random one is used, rather than one
+        structures may have been cached under before.
+        """
+        shared_cache = self.metadata_inheritance_cache_subsystem
+        try:
+            return shared_cache.incr(self.STRUCTURE_GENERATION_CACHE_KEY)
+        except ValueError:
+            generation = random.getrandbits(62)
+            if shared_cache.add(self.STRUCTURE_GENERATION_CACHE_KEY, generation):
+                return generation
+            return shared_cache.incr(self.STRUCTURE_GENERATION_CACHE_KEY)
+
+    def _sync_structure_generation(self):
+        """
+        Return the current generation of the cached structures, after dropping what this process and
+        thread cached in earlier ones: the structures, their derived data and the descriptor systems.
+
+        The generation is a pair of the shared one kept in the metadata_inheritance_cache_subsystem,
+        if any, and this process's local_structure_generation, which both move on when a structure
+        is written in place, so that no process or thread keeps serving the copy it read before.
+        """
+        shared_generation = None
+        if self.metadata_inheritance_cache_subsystem is not None:
+            shared_generation = self._get_structure_generation()
+        generation = (shared_generation, self.local_structure_generation)
+        if generation != self.structure_generation:
+            if self.structure_cache is not None:
+                self.structure_cache.clear()
+            if self.derived_data_cache is not None:
+                self.derived_data_cache.clear()
+            self.structure_generation = generation
+        if getattr(self.thread_cache, 'structure_generation', None) != generation:
+            self.thread_cache.course_cache = LRUCache(self.THREAD_COURSE_CACHE_SIZE)
+            self.thread_cache.structure_generation = generation
+        return generation
+
+    def _update_structure_in_place(self, structure):
+        """
+        Overwrite the stored structure rather than making a new version of it. The structure is
+        marked as written in place, so that it's not cached again, and the cached structures move
+        on to a new generation, so that the copies other processes and threads cached are dropped.
+        """
+        structure['written_in_place'] = True
+        self.db_connection.update_structure(structure)
+        # clear cache so things get refetched and inheritance recomputed
+        self._clear_cache(structure['_id'])
+        self.local_structure_generation += 1
+        if self.metadata_inheritance_cache_subsystem is not None:
+            self._increment_structure_generation()
+
+    def _get_structures(self, version_guids):
+        """
+        Return the structures with the given version guids, in no particular order, from the
+        caches where possible and otherwise from the db. Missing structures are left out.
+
+        Callers get their own copies, as descriptors and edits change structures in place.
+        Structures which have been written in place aren't cached, as they may change again.
+        """
+        shared_generation, _ = self._sync_structure_generation()
+        if self.structure_cache is None:
+            return [
+                self._expand_structure(structure)
+                for structure in self.db_connection.find_matching_structures({'_id': {'$in': version_guids}})
+            ]
+
+        shared_cache = self.metadata_inheritance_cache_subsystem
+        structures = []
+        missing = []
+        for version_guid in version_guids:
+            structure = self.structure_cache.get(version_guid)
+            if structure is None and shared_cache is not None:
+                structure = shared_cache.get(self._structure_cache_key(shared_generation, version_guid))
+                if structure is not None:
+                    self.structure_cache.set(version_guid, structure)
+            if structure is None:
+                missing.append(version_guid)
+            else:
+                structures.append(copy.deepcopy(structure))
+
+        if missing:
+            for structure in self.db_connection.find_matching_structures({'_id': {'$in': missing}}):
+                structure = self._expand_structure(structure)
+                if structure.get('written_in_place'):
+                    structures.append(structure)
+                    continue
+                self.structure_cache.set(structure['_id'], structure)
+                if shared_cache is not None:
+                    shared_cache.set(self._structure_cache_key(shared_generation, structure['_id']), structure)
+                structures.append(copy.deepcopy(structure))
+        return structures
+
+    def _expand_structure(self, structure):
+        """
+        Return the whole structure stored as structure, which, if it's a delta, means applying it
+        to the structure it's a delta against.
+        """
+        delta = structure.pop('delta', None)
+        if delta is None:
+            return structure
+
+        bases = self._get_structures([delta['base']])
+        if not bases:
+            raise ItemNotFoundError(delta['base'])
+        blocks = bases[0]['blocks']
+        for block_id in delta['deleted']:
+            blocks.pop(block_id, None)
+        blocks.update(structure['blocks'])
+        structure['blocks'] = blocks
+        return structure
+
+    def _insert_structure(self, structure):
+        """
+        Store the new structure, as a delta against its previous version if structure_snapshot_interval
+        says so and if that's much smaller.
+        """
+        base_guid = structure.get('previous_version')
+        if not self.structure_snapshot_interval or base_guid is None:
+            self.db_connection.insert_structure(structure)
+            return
+
+        base_delta = self.db_connection.get_structure_delta(base_guid)
+        depth = base_delta['depth'] + 1 if base_delta is not None else 1
+        bases = self._get_structures([base_guid]) if depth < self.structure_snapshot_interval else None
+        # no deltas against structures which may still change in place
+        if not bases or bases[0].get('written_in_place'):
+            self.db_connection.insert_structure(structure)
+            return
+
+        base_blocks = bases[0]['blocks']
+        blocks = {
+            block_id: block
+            for block_id, block in structure['blocks'].iteritems()
+            if base_blocks.get(block_id) != block
+        }
+        if len(blocks) * 2 > len(structure['blocks']):
+            # not worth a delta
+            self.db_connection.insert_structure(structure)
+            return
+
+        document = dict(structure)
+        document['blocks'] = blocks
+        document['delta'] = {
+            'base': base_guid,
+            'deleted': [block_id for block_id in base_blocks if block_id not in structure['blocks']],
+            'depth': depth,
+        }
+        self.db_connection.insert_structure(document)
+
+    def compact_structures(self, course_locator):
+        """
+        Store in full the head structure of each branch of the course and any structure in its history
+        which takes structure_snapshot_interval or more deltas to rebuild.
+
+        Returns the number of structures rewritten.
+        """
+        index = self.db_connection.get_course_index(course_locator.package_id)
+        if index is None:
+            raise ItemNotFoundError(course_locator)
+        heads = list(set(index['versions'].itervalues()))
+
+        query = {'_id': {'$in': heads}}
+        if self.structure_snapshot_interval:
+            original_versions = [
+                structure['original_version']
+                for structure in self.db_connection.find_matching_structures({'_id': {'$in': heads}})
+            ]
+            query = {'$or': [query, {
+                'original_version': {'$in': original_versions},
+                'delta.depth': {'$gte': self.structure_snapshot_interval},
+            }]}
+        query['delta'] = {'$exists': True}
+        version_guids = [structure['_id'] for structure in self.db_connection.find_matching_structures(query)]
+        for structure in self._get_structures(version_guids):
+            self.db_connection.update_structure(structure)
+        return len(version_guids)
 
     def _lookup_course(self, course_locator):
         '''
@@ -242,11 +659,20 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
 
         :param course_locator: any subclass of CourseLocator
         '''
-        # NOTE: if and when this uses cache, the update if changed logic will break if the cache
-        # holds the same objects as the descriptors!
         if not course_locator.is_fully_specified():
             raise InsufficientSpecificationError('Not fully specified: %s' % course_locator)
 
+        bulk_write = self._get_bulk_write(course_locator)
+        if bulk_write is not None:
+            # the readers share a copy, as descriptors change the structure they're loaded from
+            if bulk_write['copy'] is None:
+                bulk_write['copy'] = copy.deepcopy(bulk_write['structure'] or bulk_write['original'])
+            return {
+                'package_id': course_locator.package_id,
+                'branch': course_locator.branch,
+                'structure': bulk_write['copy'],
+            }
+
         if course_locator.package_id is not None and course_locator.branch is not None:
             # use the package_id
             index = self.db_connection.get_course_index(course_locator.package_id)
@@ -264,7 +690,10 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
 
         # cast string to ObjectId if necessary
         version_guid = course_locator.as_object_id(version_guid)
-        entry = self.db_connection.get_structure(version_guid)
+        # any cached structure comes back as a copy, so the update if changed logic still compares
+        # the descriptors to what's stored
+        structures = self._get_structures([version_guid])
+        entry = structures[0] if structures else None
 
         # b/c more than one course can use same structure, the 'package_id' and 'branch' are not intrinsic to structure
         # and the one assoc'd w/ it by another fetch may not be the one relevant to this fetch; so,
@@ -302,7 +731,7 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
             version_guids.append(version_guid)
             id_version_map[version_guid] = structure['_id']
 
-        course_entries = self.db_connection.find_matching_structures({'_id': {'$in': version_guids}})
+        course_entries = self._get_structures(version_guids)
 
         # get the block for the course element (s/b the root)
         result = []
@@ -392,7 +821,8 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
 
         Although these
         look like mongo queries, it is all done in memory; so, you cannot
-        try arbitrary queries.
+        try arbitrary queries. Qualifying the category or a field by a plain value
+        uses indexes built once per structure version rather than testing each block.
 
         :param locator: CourseLocator or BlockUsageLocator restricting search scope
         :param course_id: ignored. Only included for API compatibility.
@@ -404,10 +834,11 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
         if qualifiers is None:
             qualifiers = {}
         course = self._lookup_course(locator)
-        items = []
-        for block_id, value in course['structure']['blocks'].iteritems():
-            if self._block_matches(value, qualifiers):
-                items.append(block_id)
+        blocks = course['structure']['blocks']
+        block_ids = self._find_candidate_blocks(course['structure'], qualifiers)
+        if block_ids is None:
+            block_ids = blocks.iterkeys()
+        items = [block_id for block_id in block_ids if self._block_matches(blocks[block_id], qualifiers)]
 
         if len(items) > 0:
             return self._load_items(course, items, 0, lazy=True)
@@ -745,10 +1176,11 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
             definition_locator, _ = self.update_definition_from_data(definition_locator, new_def_data, user_id)
 
         # copy the structure and modify the new one
-        if continue_version:
+        bulk_write = self._get_bulk_write(course_or_parent_locator)
+        if continue_version and bulk_write is None:
             new_structure = structure
         else:
-            new_structure = self._version_structure(structure, user_id)
+            new_structure = self._edit_structure(course_or_parent_locator, structure, user_id)
 
         new_id = new_structure['_id']
 
@@ -787,18 +1219,13 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
                 parent['edit_info']['edited_by'] = user_id
                 parent['edit_info']['previous_version'] = parent['edit_info']['update_version']
                 parent['edit_info']['update_version'] = new_id
-        if continue_version:
-            # db update
-            self.db_connection.update_structure(new_structure)
-            # clear cache so things get refetched and inheritance recomputed
-            self._clear_cache(new_id)
+        if continue_version and bulk_write is None:
+            self._update_structure_in_place(new_structure)
         else:
-            self.db_connection.insert_structure(new_structure)
+            # and update the index entry if appropriate
+            self._save_structure(course_or_parent_locator, index_entry, new_structure)
 
-        # update the index entry if appropriate
         if index_entry is not None:
-            if not continue_version:
-                self._update_head(index_entry, course_or_parent_locator.branch, new_id)
             item_loc = BlockUsageLocator(
                 package_id=course_or_parent_locator.package_id,
                 branch=course_or_parent_locator.branch,
@@ -883,7 +1310,7 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
             )
             new_id = draft_structure['_id']
 
-            self.db_connection.insert_structure(draft_structure)
+            self._insert_structure(draft_structure)
 
             if versions_dict is None:
                 versions_dict = {master_branch: new_id}
@@ -916,7 +1343,7 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
                     root_block['edit_info']['previous_version'] = root_block['edit_info'].get('update_version')
                     root_block['edit_info']['update_version'] = new_id
 
-                self.db_connection.insert_structure(draft_structure)
+                self._insert_structure(draft_structure)
                 versions_dict[master_branch] = new_id
 
         index_entry = {
@@ -964,7 +1391,7 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
 
         # if updated, rev the structure
         if is_updated:
-            new_structure = self._version_structure(original_structure, user_id)
+            new_structure = self._edit_structure(descriptor.location, original_structure, user_id)
             block_data = self._get_block_from_structure(new_structure, descriptor.location.block_id)
 
             block_data["definition"] = descriptor.definition_locator.definition_id
@@ -979,10 +1406,8 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
                 'previous_version': block_data['edit_info']['update_version'],
                 'update_version': new_id,
             }
-            self.db_connection.insert_structure(new_structure)
             # update the index entry if appropriate
-            if index_entry is not None:
-                self._update_head(index_entry, descriptor.location.branch, new_id)
+            self._save_structure(descriptor.location, index_entry, new_structure)
 
             # fetch and return the new item--fetching is unnecessary but a good qc step
             new_locator = BlockUsageLocator(descriptor.location)
@@ -1046,16 +1471,13 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
         # find course_index entry if applicable and structures entry
         index_entry = self._get_index_if_valid(xblock.location, force)
         structure = self._lookup_course(xblock.location)['structure']
-        new_structure = self._version_structure(structure, user_id)
+        new_structure = self._edit_structure(xblock.location, structure, user_id)
         new_id = new_structure['_id']
         is_updated = self._persist_subdag(xblock, user_id, new_structure['blocks'], new_id)
 
         if is_updated:
-            self.db_connection.insert_structure(new_structure)
-
             # update the index entry if appropriate
-            if index_entry is not None:
-                self._update_head(index_entry, xblock.location.branch, new_id)
+            self._save_structure(xblock.location, index_entry, new_structure)
 
             # fetch and return the new item--fetching is unnecessary but a good qc step
             return self.get_item(
@@ -1220,7 +1642,7 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
             self._delete_if_true_orphan(orphan, destination_structure)
 
         # update the db
-        self.db_connection.insert_structure(destination_structure)
+        self._insert_structure(destination_structure)
         self._update_head(index_entry, destination_course.branch, destination_structure['_id'])
 
     def update_course_index(self, updated_index_entry):
@@ -1254,7 +1676,7 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
         if original_structure['root'] == usage_locator.block_id:
             raise ValueError("Cannot delete the root of a course")
         index_entry = self._get_index_if_valid(usage_locator, force)
-        new_structure = self._version_structure(original_structure, user_id)
+        new_structure = self._edit_structure(usage_locator, original_structure, user_id)
         new_blocks = new_structure['blocks']
         new_id = new_structure['_id']
         parents = self.get_parent_locations(usage_locator)
@@ -1281,13 +1703,11 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
             del new_blocks[LocMapperStore.encode_key_for_mongo(usage_locator.block_id)]
 
         # update index if appropriate and structures
-        self.db_connection.insert_structure(new_structure)
+        self._save_structure(usage_locator, index_entry, new_structure)
 
         result = CourseLocator(version_guid=new_id)
 
-        # update the index entry if appropriate
         if index_entry is not None:
-            self._update_head(index_entry, usage_locator.branch, new_id)
             result.package_id = usage_locator.package_id
             result.branch = usage_locator.branch
 
@@ -1350,6 +1770,33 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
                 # migration where the old mongo published had pointers to privates
                 pass
 
+    def set_inherited_settings(self, structure):
+        """
+        Set each block's _inherited_settings, computing them w/ inherit_settings only once per structure version.
+        """
+        blocks = structure.get('blocks', {})
+        derived_data = self._get_derived_data(structure)
+        if 'inherited_settings' in derived_data:
+            for block_id, inherited_settings in derived_data['inherited_settings'].iteritems():
+                if block_id in blocks:
+                    blocks[block_id]['_inherited_settings'] = inherited_settings
+        else:
+            self.inherit_settings(blocks, blocks.get(LocMapperStore.encode_key_for_mongo(structure.get('root'))))
+            derived_data['inherited_settings'] = {
+                block_id: block['_inherited_settings']
+                for block_id, block in blocks.iteritems()
+                if '_inherited_settings' in block
+            }
+
+    def _get_descendant_ids(self, structure, block_id):
+        """
+        Return the ids of block_id and all of its descendants in structure, computed once per structure version.
+        """
+        all_descendant_ids = self._get_derived_data(structure).setdefault('descendant_ids', {})
+        if block_id not in all_descendant_ids:
+            all_descendant_ids[block_id] = self.descendants(structure['blocks'], block_id, None, {}).keys()
+        return all_descendant_ids[block_id]
+
     def descendants(self, block_map, block_id, depth, descendent_map):
         """
         adds block and its descendants out to depth to descendent_map
@@ -1409,9 +1856,83 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
                     block_id for block_id in block['fields']["children"]
                     if LocMapperStore.encode_key_for_mongo(block_id) in original_structure['blocks']
                 ]
-        self.db_connection.update_structure(original_structure)
         # clear cache again b/c inheritance may be wrong over orphans
-        self._clear_cache(original_structure['_id'])
+        self._update_structure_in_place(original_structure)
+
+    def _find_candidate_blocks(self, structure, qualifiers):
+        '''
+        Return the ids of the blocks of structure which may match qualifiers as per get_items, as
+        found in the structure's category and field value indexes, or None if none of the qualifiers
+        can use them.
+        '''
+        candidate_lists = []
+        if self._is_indexable(qualifiers.get('category')):
+            candidate_lists.append(self._get_category_index(structure).get(qualifiers['category'], []))
+        field_qualifiers = qualifiers.get('fields')
+        if isinstance(field_qualifiers, dict):
+            for field_name, criteria in field_qualifiers.iteritems():
+                if self._is_indexable(criteria):
+                    candidate_lists.append(self._get_field_index(structure, field_name).get(criteria, []))
+        if not candidate_lists:
+            return None
+
+        candidate_lists.sort(key=len)
+        other_sets = [set(block_ids) for block_ids in candidate_lists[1:]]
+        return [
+            block_id for block_id in candidate_lists[0]
+            if all(block_id in other_set for other_set in other_sets)
+        ]
+
+    @staticmethod
+    def _is_indexable(criteria):
+        '''
+        Whether blocks matching criteria can be looked up in an index: criteria must be a plain value
+        '''
+        if criteria is None or isinstance(criteria, dict):
+            return False
+        try:
+            hash(criteria)
+        except TypeError:
+            return False
+        return True
+
+    def _get_category_index(self, structure):
+        '''
+        Return the ids of the blocks of structure by category, built once per structure version
+        '''
+        derived_data = self._get_derived_data(structure)
+        if 'category_index' not in derived_data:
+            category_index = {}
+            for block_id, block in structure['blocks'].iteritems():
+                category_index.setdefault(block['category'], []).append(block_id)
+            derived_data['category_index'] = category_index
+        return derived_data['category_index']
+
+    def _get_field_index(self, structure, field_name):
+        '''
+        Return the ids of the blocks of structure by each plain value of their field_name field (or,
+        for lists, of its elements), built once per structure version
+        '''
+        field_indexes = self._get_derived_data(structure).setdefault('field_indexes', {})
+        if field_name not in field_indexes:
+            field_index = {}
+            for block_id, block in structure['blocks'].iteritems():
+                if field_name in block['fields']:
+                    for value in set(self._index_values(block['fields'][field_name])):
+                        field_index.setdefault(value, []).append(block_id)
+            field_indexes[field_name] = field_index
+        return field_indexes[field_name]
+
+    def _index_values(self, target):
+        '''
+        Yield the values of target which _value_matches would compare to a plain criteria
+        '''
+        if isinstance(target, list):
+            for element in target:
+                for value in self._index_values(element):
+                    yield value
+        elif self._is_indexable(target):
+            yield target
 
     def _block_matches(self, value, qualifiers):
         '''
@@ -1466,6 +1987,10 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
             else:
                 return None
         else:
+            bulk_write = self._get_bulk_write(locator)
+            if bulk_write is not None:
+                # the head, as far as the edits in bulk_write_operations are concerned
+                return bulk_write['index']
             index_entry = self.db_connection.get_course_index(locator.package_id)
             is_head = (
                 locator.version_guid is None or
@@ -1486,6 +2011,8 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
         :param user_id:
         """
         new_structure = copy.deepcopy(structure)
+        # the new version hasn't been written in place, even if structure has
+        new_structure.pop('written_in_place', None)
         new_structure['_id'] = ObjectId()
         new_structure['previous_version'] = structure['_id']
         new_structure['edited_by'] = user_id
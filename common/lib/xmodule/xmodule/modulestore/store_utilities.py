@@ -1,8 +1,11 @@
 import re
 import logging
+from contextlib import contextmanager
 
 from xmodule.contentstore.content import StaticContent
 from xmodule.modulestore import Location
+from xmodule.modulestore.exceptions import ItemNotFoundError
+from xmodule.modulestore.locator import Locator
 
 
 def _prefix_only_url_replace_regex(prefix):
@@ -98,6 +101,34 @@ def rewrite_nonportable_content_links(source_course_id, dest_course_id, text):
     return text
 
 
+@contextmanager
+def _no_bulk_write_operations():
+    yield
+
+
+def bulk_write_operations(modulestore, location):
+    """
+    Return the modulestore's context manager buffering the writes to location's
+    course, if it has one, or a context manager doing nothing.
+
+    For stores addressed by Locators, like split, location is translated with the
+    store's loc_mapper to the branch of the course its revision maps to. Nothing is
+    buffered if the course isn't mapped.
+    """
+    if not hasattr(modulestore, 'bulk_write_operations'):
+        return _no_bulk_write_operations()
+    if issubclass(modulestore.reference_type, Locator):
+        if getattr(modulestore, 'loc_mapper', None) is None:
+            return _no_bulk_write_operations()
+        try:
+            location = modulestore.loc_mapper.translate_location_to_course_locator(
+                None, location, published=location.revision != 'draft'
+            )
+        except ItemNotFoundError:
+            return _no_bulk_write_operations()
+    return modulestore.bulk_write_operations(location)
+
+
 def _clone_modules(modulestore, modules, source_location, dest_location):
     for module in modules:
         original_loc = Location(module.location)
@@ -169,10 +200,10 @@ def clone_course(modulestore, contentstore, source_location, dest_location, dele
     # Get all modules under this namespace which is (tag, org, course) tuple
 
     modules = modulestore.get_items([source_location.tag, source_location.org, source_location.course, None, None, None])
-    _clone_modules(modulestore, modules, source_location, dest_location)
-
-    modules = modulestore.get_items([source_location.tag, source_location.org, source_location.course, None, None, 'draft'])
-    _clone_modules(modulestore, modules, source_location, dest_location)
+    draft_modules = modulestore.get_items([source_location.tag, source_location.org, source_location.course, None, None, 'draft'])
+    with bulk_write_operations(modulestore, dest_location):
+        _clone_modules(modulestore, modules, source_location, dest_location)
+        _clone_modules(modulestore, draft_modules, source_location, dest_location)
 
     # now iterate through all of the assets and clone them
     # first the thumbnails
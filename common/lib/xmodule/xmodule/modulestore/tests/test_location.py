@@ -203,3 +203,35 @@ class TestLocations(TestCase):
         self.assertEqual(parsed['name'], 'myrun')
         with self.assertRaises(ValueError):
             Location.parse_course_id('notlegit.id/foo')
+
+    def test_cached_locations(self):
+        """
+        Locations constructed again from the same value are the same object
+        """
+        url = "tag://org/course/category/cached_name@revision"
+        self.assertIs(Location(url), Location(url))
+
+        loc = Location(['tag', 'org', 'course', 'category', 'cached_name'])
+        self.assertIs(loc, Location(('tag', 'org', 'course', 'category', 'cached_name', None)))
+        self.assertIs(loc, Location('tag', 'org', 'course', 'category', 'cached_name'))
+        self.assertIs(loc, Location({
+            'tag': 'tag',
+            'org': 'org',
+            'course': 'course',
+            'category': 'category',
+            'name': 'cached_name',
+        }))
+
+        # Invalid values still raise once they've been tried
+        for _ in range(2):
+            with self.assertRaises(InvalidLocationError):
+                Location("tag://org/course/category/cached name")
+            with self.assertRaises(TypeError):
+                Location({
+                    'tag': 'tag',
+                    'org': 'org',
+                    'course': 'course',
+                    'category': 'category',
+                    'name': 'cached_name',
+                    'extra': 'extra',
+                })
@@ -1,12 +1,16 @@
 from pprint import pprint
 # pylint: disable=E0611
 from nose.tools import assert_equals, assert_raises, \
-    assert_not_equals, assert_false
+    assert_not_equals, assert_false, assert_true
 from itertools import ifilter
 # pylint: enable=E0611
 import pymongo
+from pymongo.read_preferences import ReadPreference
 import logging
+import copy
+import threading
 from uuid import uuid4
+from mock import patch
 
 from xblock.fields import Scope
 from xblock.runtime import KeyValueStore
@@ -16,13 +20,14 @@ from xmodule.tests import DATA_DIR
 from xmodule.modulestore import Location, MONGO_MODULESTORE_TYPE
 from xmodule.modulestore.mongo import MongoModuleStore, MongoKeyValueStore
 from xmodule.modulestore.draft import DraftModuleStore
+from xmodule.modulestore.inheritance import InheritanceMixin
 from xmodule.modulestore.xml_importer import import_from_xml, perform_xlint
 from xmodule.contentstore.mongo import MongoContentStore
 
 from xmodule.modulestore.tests.test_modulestore import check_path_to_location
-from nose.tools import assert_in
+from nose.tools import assert_in, assert_not_in
 from xmodule.exceptions import NotFoundError
-from xmodule.modulestore.exceptions import InsufficientSpecificationError
+from xmodule.modulestore.exceptions import InsufficientSpecificationError, ItemNotFoundError
 
 log = logging.getLogger(__name__)
 
@@ -35,6 +40,39 @@ DEFAULT_CLASS = 'xmodule.raw_module.RawDescriptor'
 RENDER_TEMPLATE = lambda t_n, d, ctx = None, nsp = 'main': ''
 
 
+class MemoryCache(object):
+    """A stand-in for a django cache, keeping values in a dict"""
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def set(self, key, value, timeout=None):
+        self.data[key] = value
+
+    def get_many(self, keys):
+        return dict((key, self.data[key]) for key in keys if key in self.data)
+
+    def set_many(self, data, timeout=None):
+        self.data.update(data)
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def add(self, key, value, timeout=None):
+        if key in self.data:
+            return False
+        self.data[key] = value
+        return True
+
+    def incr(self, key, delta=1):
+        if key not in self.data:
+            raise ValueError("Key '%s' not found" % key)
+        self.data[key] += delta
+        return self.data[key]
+
+
 class TestMongoModuleStore(object):
     '''Tests!'''
     # Explicitly list the courses to load (don't want the big one)
@@ -310,6 +348,303 @@ class TestMongoModuleStore(object):
         assert_equals(len(course_locations), 1)
         assert_in(Location('i4x', 'edX', 'simple', 'course', '2012_Fall'), course_locations)
 
+    def test_update_cached_metadata_inheritance_tree(self):
+        """
+        Writing a container patches the cached inheritance tree, rather than recomputing it
+        """
+        doc_store_config = {
+            'host': HOST,
+            'db': DB,
+            'collection': COLLECTION,
+        }
+        store = MongoModuleStore(
+            doc_store_config, FS_ROOT, RENDER_TEMPLATE, default_class=DEFAULT_CLASS,
+            xblock_mixins=(InheritanceMixin,), metadata_inheritance_cache_subsystem=MemoryCache()
+        )
+        course_location = Location('i4x', 'edX', 'simple', 'course', '2012_Fall')
+        chapter_location = Location('i4x', 'edX', 'simple', 'chapter', 'chapter_2')
+        html_url = Location('i4x', 'edX', 'simple', 'html', 'test_html').url()
+        store.get_cached_metadata_inheritance_tree(course_location)
+
+        chapter = store.get_item(chapter_location)
+        chapter.showanswer = 'never'
+        with patch.object(store, 'compute_metadata_inheritance_tree') as mock_compute:
+            store.update_item(chapter)
+        assert_false(mock_compute.called)
+        tree = store.get_cached_metadata_inheritance_tree(course_location)
+        assert_equals(tree[html_url]['showanswer'], 'never')
+        assert_equals(tree, store.compute_metadata_inheritance_tree(course_location))
+
+        del chapter.showanswer
+        with patch.object(store, 'compute_metadata_inheritance_tree') as mock_compute:
+            store.update_item(chapter)
+        assert_false(mock_compute.called)
+        tree = store.get_cached_metadata_inheritance_tree(course_location)
+        assert_not_in('showanswer', tree[html_url])
+        assert_equals(tree, store.compute_metadata_inheritance_tree(course_location))
+
+        # Another process wrote to the course, and its tree isn't cached yet:
+        # the cached tree is out of date, and can't be patched
+        store.collection.update(
+            {'_id.category': 'chapter', '_id.name': 'chapter_2'}, {'$set': {'metadata.showanswer': 'always'}}
+        )
+        store._set_inheritance_version(chapter_location)
+        with patch.object(store, 'compute_metadata_inheritance_tree',
+                          wraps=store.compute_metadata_inheritance_tree) as mock_compute:
+            store.update_item(chapter)
+        assert_equals(mock_compute.call_count, 1)
+        tree = store.get_cached_metadata_inheritance_tree(course_location)
+        assert_not_in('showanswer', tree[html_url])
+        assert_equals(tree, store.compute_metadata_inheritance_tree(course_location))
+
+    def test_cached_reads_from_primary(self):
+        """
+        What's cached for all the processes is read from the primary
+        """
+        course_location = Location('i4x', 'edX', 'simple', 'course', '2012_Fall')
+        with patch.object(self.store.collection, 'find', wraps=self.store.collection.find) as mock_find:
+            self.store.compute_metadata_inheritance_tree(course_location)
+            self.store.compute_parent_index(course_location)
+        assert_equals(mock_find.call_count, 2)
+        for call in mock_find.call_args_list:
+            assert_equals(call[1]['read_preference'], ReadPreference.PRIMARY)
+
+    def test_item_cache(self):
+        """
+        Records are cached in process until any process writes to the course
+        """
+        doc_store_config = {
+            'host': HOST,
+            'db': DB,
+            'collection': COLLECTION,
+        }
+        # Two stores sharing a cache, like two processes would
+        cache = MemoryCache()
+        reader = MongoModuleStore(
+            doc_store_config, FS_ROOT, RENDER_TEMPLATE, default_class=DEFAULT_CLASS,
+            item_cache_size=100, metadata_inheritance_cache_subsystem=cache
+        )
+        writer = MongoModuleStore(
+            doc_store_config, FS_ROOT, RENDER_TEMPLATE, default_class=DEFAULT_CLASS,
+            metadata_inheritance_cache_subsystem=cache
+        )
+        location = Location('i4x', 'edX', 'simple', 'html', 'toylab')
+        original_name = reader.get_item(location).display_name
+        with patch.object(reader.collection, 'find') as mock_find:
+            assert_equals(reader.get_item(location).display_name, original_name)
+            assert_raises(ItemNotFoundError, reader.get_item, location.replace(name='no_such_item'))
+            assert_raises(ItemNotFoundError, reader.get_item, location.replace(name='no_such_item'))
+        assert_equals(mock_find.call_count, 1)
+
+        item = writer.get_item(location)
+        item.display_name = u'Cached name'
+        writer.update_item(item)
+        assert_equals(reader.get_item(location).display_name, u'Cached name')
+
+        item.display_name = original_name
+        writer.update_item(item)
+        assert_equals(reader.get_item(location).display_name, original_name)
+
+    def test_parent_index(self):
+        """
+        get_parent_locations uses a cached parent index, kept up to date by writes
+        """
+        doc_store_config = {
+            'host': HOST,
+            'db': DB,
+            'collection': COLLECTION,
+        }
+        store = MongoModuleStore(
+            doc_store_config, FS_ROOT, RENDER_TEMPLATE, default_class=DEFAULT_CLASS,
+            metadata_inheritance_cache_subsystem=MemoryCache()
+        )
+        sequential_location = Location('i4x', 'edX', 'simple', 'sequential', 'test_sequence')
+        vertical_location = Location('i4x', 'edX', 'simple', 'vertical', 'test_vertical')
+        html_location = Location('i4x', 'edX', 'simple', 'html', 'test_html')
+
+        for location in [sequential_location, vertical_location, html_location]:
+            assert_equals(store.get_parent_locations(location, None), self.store.get_parent_locations(location, None))
+        with patch.object(store.collection, 'find') as mock_find:
+            assert_equals(store.get_parent_locations(html_location, None), [vertical_location])
+        assert_false(mock_find.called)
+
+        check_path_to_location(store)
+
+        vertical = store.get_item(vertical_location)
+        vertical.children = []
+        store.update_item(vertical)
+        assert_equals(store.get_parent_locations(html_location, None), [])
+
+        vertical.children = [html_location.url()]
+        with patch.object(store, 'compute_parent_index') as mock_compute:
+            store.update_item(vertical)
+            assert_equals(store.get_parent_locations(html_location, None), [vertical_location])
+        assert_false(mock_compute.called)
+
+    def test_parent_index_too_large(self):
+        """
+        A parent index too large to be cached isn't computed for every lookup
+        """
+        doc_store_config = {
+            'host': HOST,
+            'db': DB,
+            'collection': COLLECTION,
+        }
+        store = MongoModuleStore(
+            doc_store_config, FS_ROOT, RENDER_TEMPLATE, default_class=DEFAULT_CLASS,
+            metadata_inheritance_cache_subsystem=MemoryCache()
+        )
+        vertical_location = Location('i4x', 'edX', 'simple', 'vertical', 'test_vertical')
+        html_location = Location('i4x', 'edX', 'simple', 'html', 'test_html')
+        with patch('xmodule.modulestore.mongo.base.PARENT_INDEX_MAX_SHARD_SIZE', 10):
+            assert_equals(store.get_parent_locations(html_location, None), [vertical_location])
+            with patch.object(store, 'compute_parent_index') as mock_compute:
+                assert_equals(store.get_parent_locations(html_location, None), [vertical_location])
+            assert_false(mock_compute.called)
+
+    def test_cache_children_of_course(self):
+        """
+        Loading all of a course reads it in one query, and finds the same items as
+        reading it level by level
+        """
+        for store, course in [(self.store, 'toy'), (self.draft_store, 'simple_with_draft')]:
+            course_item = store._find_one(Location('i4x', 'edX', course, 'course', '2012_Fall'))
+            with patch.object(store.collection, 'find', wraps=store.collection.find) as mock_find:
+                data = store._cache_children([copy.deepcopy(course_item)], depth=None)
+            assert_equals(mock_find.call_count, 1)
+
+            with patch.object(store, '_query_courses_for_cache_children', return_value=None):
+                expected = store._cache_children([copy.deepcopy(course_item)], depth=None)
+            assert_equals(data, expected)
+
+    def test_draft_reads_in_one_query(self):
+        """
+        The draft store reads the draft and the published version of items together
+        """
+        doc_store_config = {
+            'host': HOST,
+            'db': DB,
+            'collection': COLLECTION,
+        }
+        store = DraftModuleStore(
+            doc_store_config, FS_ROOT, RENDER_TEMPLATE, default_class=DEFAULT_CLASS,
+            metadata_inheritance_cache_subsystem=MemoryCache()
+        )
+        store.get_cached_metadata_inheritance_tree(Location('i4x', 'edX', 'simple_with_draft', 'course', '2012_Fall'))
+        vertical_location = Location('i4x', 'edX', 'simple_with_draft', 'vertical', 'test_vertical')
+        html_location = Location('i4x', 'edX', 'simple_with_draft', 'html', 'test_html')
+        with patch.object(store.collection, 'find', wraps=store.collection.find) as mock_find:
+            vertical = store.get_item(vertical_location)
+            html = store.get_item(html_location)
+        assert_equals(mock_find.call_count, 2)
+        assert_true(vertical.is_draft)
+        assert_equals(vertical.location, vertical_location)
+        assert_false(html.is_draft)
+
+        with patch.object(store.collection, 'find', wraps=store.collection.find) as mock_find:
+            verticals = store.get_items(vertical_location.replace(name=None))
+        assert_equals(mock_find.call_count, 1)
+        assert_equals([item.location for item in verticals], [vertical_location])
+        assert_true(verticals[0].is_draft)
+
+    def test_bulk_write_operations(self):
+        """
+        Writes are buffered in bulk write mode and sent when leaving it, and the
+        cached inheritance tree is refreshed once
+        """
+        doc_store_config = {
+            'host': HOST,
+            'db': DB,
+            'collection': COLLECTION,
+        }
+        store = MongoModuleStore(
+            doc_store_config, FS_ROOT, RENDER_TEMPLATE, default_class=DEFAULT_CLASS,
+            metadata_inheritance_cache_subsystem=MemoryCache()
+        )
+        course_location = Location('i4x', 'edX', 'simple', 'course', '2012_Fall')
+        vertical_location = Location('i4x', 'edX', 'simple', 'vertical', 'bulk_vertical')
+        html_location = Location('i4x', 'edX', 'simple', 'html', 'bulk_html')
+        store.get_cached_metadata_inheritance_tree(course_location)
+
+        with patch.object(store, 'refresh_cached_metadata_inheritance_tree',
+                          wraps=store.refresh_cached_metadata_inheritance_tree) as mock_refresh:
+            with store.bulk_write_operations(course_location):
+                vertical = store.create_xmodule(vertical_location)
+                vertical.children = [html_location.url()]
+                store.update_item(vertical)
+                html = store.create_xmodule(html_location)
+                html.display_name = u'Bulk html'
+                store.update_item(html)
+                assert_equals(store.collection.find({'_id.name': {'$in': ['bulk_vertical', 'bulk_html']}}).count(), 0)
+
+                # reads see the buffered writes
+                assert_equals(store.get_item(html_location).display_name, u'Bulk html')
+                assert_equals(store.get_parent_locations(html_location, None), [vertical_location])
+
+                html.display_name = u'Bulk html, renamed'
+                store.update_item(html)
+
+                # other threads' writes aren't buffered
+                other_html_location = html_location.replace(name='bulk_other_html')
+                thread = threading.Thread(target=lambda: store.update_item(store.create_xmodule(other_html_location)))
+                thread.start()
+                thread.join()
+                assert_equals(store.collection.find({'_id.name': 'bulk_other_html'}).count(), 1)
+                assert_equals(store.collection.find({'_id.name': 'bulk_html'}).count(), 0)
+            assert_equals(mock_refresh.call_count, 1)
+
+        assert_not_in('edX/simple', store.ignore_write_events_on_courses)
+        assert_equals(store.get_item(html_location).display_name, u'Bulk html, renamed')
+        store.delete_item(html_location)
+        store.delete_item(vertical_location)
+        store.delete_item(other_html_location)
+
+    def test_bulk_write_operations_with_reads(self):
+        """
+        The reads an import makes between its writes, like those of update_item on
+        a static tab, don't end the batches
+        """
+        doc_store_config = {
+            'host': HOST,
+            'db': DB,
+            'collection': COLLECTION,
+        }
+        store = MongoModuleStore(
+            doc_store_config, FS_ROOT, RENDER_TEMPLATE, default_class=DEFAULT_CLASS,
+            metadata_inheritance_cache_subsystem=MemoryCache()
+        )
+        course_location = Location('i4x', 'edX', 'simple', 'course', '2012_Fall')
+        vertical_location = Location('i4x', 'edX', 'simple', 'vertical', 'bulk_read_vertical')
+        html_locations = [
+            Location('i4x', 'edX', 'simple', 'html', 'bulk_read_html_{}'.format(index))
+            for index in range(3)
+        ]
+        tab_location = Location('i4x', 'edX', 'simple', 'static_tab', 'bulk_read_tab')
+
+        with patch.object(store.collection, 'insert', wraps=store.collection.insert) as mock_insert:
+            with store.bulk_write_operations(course_location):
+                vertical = store.create_xmodule(vertical_location)
+                vertical.children = [location.url() for location in html_locations]
+                store.update_item(vertical)
+                for location in html_locations:
+                    html = store.create_xmodule(location)
+                    html.display_name = location.name
+                    store.update_item(html)
+                    assert_equals(store.get_item(location).display_name, location.name)
+                    assert_equals(store.get_parent_locations(location, None), [vertical_location])
+                # looks the course up with get_items
+                store.update_item(store.create_xmodule(tab_location))
+                html_names = set(item.location.name for item in store.get_items(html_locations[0].replace(name=None)))
+                assert_true(html_names.issuperset(location.name for location in html_locations))
+
+                assert_equals(mock_insert.call_count, 0)
+                assert_equals(store.collection.find({'_id.name': {'$regex': '^bulk_read_'}}).count(), 0)
+            assert_equals(mock_insert.call_count, 1)
+
+        assert_equals(store.collection.find({'_id.name': {'$regex': '^bulk_read_'}}).count(), 5)
+        for location in html_locations + [vertical_location, tab_location]:
+            store.delete_item(location)
+
 
 class TestMongoKeyValueStore(object):
     """
@@ -8,6 +8,7 @@ from importlib import import_module
 from path import path
 import re
 import random
+from mock import patch, Mock
 
 from xblock.fields import Scope
 from xmodule.course_module import CourseDescriptor
@@ -19,6 +20,9 @@ from xmodule.x_module import XModuleMixin
 from xmodule.fields import Date, Timedelta
 from bson.objectid import ObjectId
 from xmodule.modulestore.split_mongo.split import SplitMongoModuleStore
+from xmodule.modulestore.store_utilities import bulk_write_operations
+from xmodule.modulestore import Location
+from xmodule.modulestore.tests.test_mongo import MemoryCache
 
 
 class SplitModuleTest(unittest.TestCase):
@@ -612,6 +616,42 @@ class SplitModuleCourseTests(SplitModuleTest):
         self.assertIn('chapter1', block_map)
         self.assertIn('problem3_2', block_map)
 
+    def test_structure_cache(self):
+        """
+        Test that structures are read once and that the cached copies aren't shared.
+        """
+        store = modulestore()
+        locator = CourseLocator(package_id='testx.GreekHero', branch='draft')
+        course = store.get_course(locator)
+        # pylint: disable=W0212
+        store._clear_cache(course.location.version_guid)
+        with patch.object(
+            store.db_connection, 'find_matching_structures', wraps=store.db_connection.find_matching_structures
+        ) as find_matching_structures:
+            first = store._lookup_course(locator)['structure']
+            first['blocks'].clear()
+            second = store._lookup_course(locator)['structure']
+        self.assertEqual(find_matching_structures.call_count, 1)
+        self.assertEqual(second['_id'], course.location.version_guid)
+        self.assertIn('chapter1', second['blocks'])
+
+    def test_derived_data_cache(self):
+        """
+        Test that the inherited settings and descendants are computed once per version
+        """
+        store = modulestore()
+        locator = BlockUsageLocator(package_id='testx.GreekHero', branch='draft', block_id='head12345')
+        course = store.get_item(locator, depth=None)
+        # pylint: disable=W0212
+        store._thread_course_cache().delete(course.location.version_guid)
+        with patch.object(store, 'inherit_settings') as inherit_settings:
+            with patch.object(store, 'descendants') as descendants:
+                course = store.get_item(locator, depth=None)
+                chapter = course.get_children()[0]
+        self.assertFalse(inherit_settings.called)
+        self.assertFalse(descendants.called)
+        self.assertEqual(chapter.start, course.start)
+
     def test_course_successors(self):
         """
         get_course_successors(course_locator, version_history_depth=1)
@@ -846,6 +886,29 @@ class SplitModuleItemTests(SplitModuleTest):
         self.assertEqual(len(matches), 1)
         self.assertEqual(matches[0].location.block_id, 'head12345')
 
+    def test_get_items_indexed(self):
+        '''
+        Test that get_items only tests the blocks found in the indexes
+        '''
+        store = modulestore()
+        locator = CourseLocator(package_id="testx.GreekHero", branch='draft')
+        with patch.object(store, '_block_matches', wraps=store._block_matches) as block_matches:
+            matches = store.get_items(locator, qualifiers={'category': 'chapter'})
+            self.assertEqual(len(matches), 3)
+            self.assertEqual(block_matches.call_count, 3)
+
+            block_matches.reset_mock()
+            matches = store.get_items(
+                locator, qualifiers={'category': 'course', 'fields': {'children': 'chapter2'}}
+            )
+            self.assertEqual([match.location.block_id for match in matches], ['head12345'])
+            self.assertEqual(block_matches.call_count, 1)
+
+            block_matches.reset_mock()
+            matches = store.get_items(locator, qualifiers={'fields': {'display_name': 'no such name'}})
+            self.assertEqual(matches, [])
+            self.assertEqual(block_matches.call_count, 0)
+
     def test_get_parents(self):
         '''
         get_parent_locations(locator, [block_id], [branch]): [BlockUsageLocator]
@@ -879,6 +942,30 @@ class SplitModuleItemTests(SplitModuleTest):
             expected_ids.remove(child.location.block_id)
         self.assertEqual(len(expected_ids), 0)
 
+    def test_prefetch_definitions(self):
+        """
+        Test that getting an item w/ depth reads its descendants' definitions in one query
+        """
+        store = modulestore()
+        locator = BlockUsageLocator(package_id="testx.GreekHero", block_id="head12345", branch='draft')
+        with patch.object(
+            store.db_connection, 'find_matching_definitions', wraps=store.db_connection.find_matching_definitions
+        ) as find_matching_definitions:
+            with patch.object(
+                store.db_connection, 'get_definition', wraps=store.db_connection.get_definition
+            ) as get_definition:
+                block = store.get_item(locator, depth=None)
+                for child in block.get_children():
+                    child.get_explicitly_set_fields_by_scope(Scope.content)
+                    for grandchild in child.get_children():
+                        grandchild.get_explicitly_set_fields_by_scope(Scope.content)
+        self.assertEqual(find_matching_definitions.call_count, 1)
+        self.assertEqual(get_definition.call_count, 0)
+        # the cached placeholders don't keep the definitions they handed out
+        for child in block.get_children():
+            # pylint: disable=W0212
+            self.assertIsNone(block.runtime.module_data[child.location.block_id]['definition'].prefetched)
+
 
 class TestItemCrud(SplitModuleTest):
     """
@@ -1111,6 +1198,143 @@ class TestItemCrud(SplitModuleTest):
         self.assertEqual(refetch_course.previous_version, course_block_update_version)
         self.assertEqual(refetch_course.update_version, transaction_guid)
 
+    def test_continue_version_not_cached(self):
+        """
+        Test that a structure continued in place is reread rather than served from the cache
+        """
+        store = modulestore()
+        user = random.getrandbits(32)
+        new_course = store.create_course('test_org.test_continue_cache', 'test_org', user)
+        locator = CourseLocator(package_id=new_course.location.package_id, branch=new_course.location.branch)
+        store.create_item(new_course.location, 'chapter', user, continue_version=True)
+        # pylint: disable=W0212
+        self.assertIsNone(store.structure_cache.get(new_course.location.version_guid))
+        store._lookup_course(locator)
+        new_ele = store.create_item(new_course.location, 'chapter', user, continue_version=True)
+        with patch.object(
+            store.db_connection, 'find_matching_structures', wraps=store.db_connection.find_matching_structures
+        ) as find_matching_structures:
+            structure = store._lookup_course(locator)['structure']
+            store._lookup_course(locator)
+        self.assertEqual(find_matching_structures.call_count, 2)
+        self.assertIn(new_ele.location.block_id, structure['blocks'])
+
+        # new versions of it are cached as usual
+        new_ele = store.create_item(new_course.location, 'chapter', user)
+        structure = store._lookup_course(locator)['structure']
+        self.assertEqual(structure['_id'], new_ele.location.version_guid)
+        self.assertNotIn('written_in_place', structure)
+        self.assertIsNotNone(store.structure_cache.get(new_ele.location.version_guid))
+
+    def test_continue_version_in_other_process(self):
+        """
+        Test that a structure continued in place isn't served from the caches of another process
+        which read it before
+        """
+        cache = MemoryCache()
+        stores = []
+        for _ in range(2):
+            # pylint: disable=W0142
+            store = SplitMongoModuleStore(
+                SplitModuleTest.MODULESTORE['DOC_STORE_CONFIG'],
+                render_template=render_to_template_mock,
+                **SplitModuleTest.MODULESTORE['OPTIONS']
+            )
+            store.metadata_inheritance_cache_subsystem = cache
+            stores.append(store)
+        user = random.getrandbits(32)
+        new_course = stores[0].create_course('test_org.test_continue_other', 'test_org', user)
+        locator = CourseLocator(package_id=new_course.location.package_id, branch=new_course.location.branch)
+        # pylint: disable=W0212
+        stores[1]._lookup_course(locator)
+        self.assertIsNotNone(stores[1].structure_cache.get(new_course.location.version_guid))
+
+        new_ele = stores[0].create_item(new_course.location, 'chapter', user, continue_version=True)
+        structure = stores[1]._lookup_course(locator)['structure']
+        self.assertEqual(structure['_id'], new_course.location.version_guid)
+        self.assertIn(new_ele.location.block_id, structure['blocks'])
+        self.assertIsNone(stores[1].structure_cache.get(new_course.location.version_guid))
+
+    def test_bulk_write_operations(self):
+        """
+        Test that the edits in bulk write mode make one new version of the course
+        """
+        store = modulestore()
+        locator = BlockUsageLocator(package_id="testx.GreekHero", branch='draft', block_id='head12345')
+        premod_course = store.get_course(locator)
+        with patch.object(
+            store.db_connection, 'insert_structure', wraps=store.db_connection.insert_structure
+        ) as insert_structure:
+            with store.bulk_write_operations(locator):
+                chapter = store.create_item(locator, 'chapter', 'bulk_user', fields={'display_name': 'chapter n'})
+                problem = store.create_item(
+                    chapter.location, 'problem', 'bulk_user', fields={'display_name': 'problem n'}
+                )
+                problem.display_name = 'renamed'
+                problem = store.update_item(problem, 'bulk_user')
+                self.assertEqual(problem.display_name, 'renamed')
+                self.assertEqual(insert_structure.call_count, 0)
+                self.assertEqual(
+                    store.get_course_index_info(locator)['versions']['draft'], premod_course.location.version_guid
+                )
+            self.assertEqual(insert_structure.call_count, 1)
+
+        course = store.get_course(locator)
+        self.assertEqual(
+            store.get_course_history_info(course.location)['previous_version'], premod_course.location.version_guid
+        )
+        self.assertIn(chapter.location.block_id, course.children)
+        problem = store.get_item(
+            BlockUsageLocator(package_id="testx.GreekHero", branch='draft', block_id=problem.location.block_id)
+        )
+        self.assertEqual(problem.display_name, 'renamed')
+        self.assertIsNone(problem.previous_version)
+        self.assertEqual(problem.update_version, course.location.version_guid)
+
+    def test_bulk_write_operations_by_location(self):
+        """
+        Test that store_utilities.bulk_write_operations translates a Location to the course's branch
+        """
+        store = modulestore()
+        locator = CourseLocator(package_id="testx.GreekHero", branch='draft')
+        location = Location('i4x', 'testx', 'GreekHero', 'course', 'head12345')
+        # pylint: disable=W0212
+        with patch.object(store, 'loc_mapper', Mock()) as loc_mapper:
+            loc_mapper.translate_location_to_course_locator.return_value = locator
+            with bulk_write_operations(store, location):
+                self.assertIsNotNone(store._get_bulk_write(locator))
+            loc_mapper.translate_location_to_course_locator.side_effect = ItemNotFoundError(location)
+            with bulk_write_operations(store, location):
+                self.assertIsNone(store._get_bulk_write(locator))
+        self.assertIsNone(store._get_bulk_write(locator))
+
+    def test_delta_structures(self):
+        """
+        Test that structures stored as deltas rebuild to the whole structure and compact to full ones
+        """
+        store = modulestore()
+        locator = BlockUsageLocator(package_id="testx.GreekHero", branch='draft', block_id='problem1')
+        problem = store.get_item(locator)
+        problem.display_name = 'delta'
+        with patch.object(store, 'structure_snapshot_interval', 10):
+            problem = store.update_item(problem, 'delta_user')
+        version_guid = problem.location.version_guid
+        delta = store.db_connection.get_structure_delta(version_guid)
+        self.assertIsNotNone(delta)
+        self.assertEqual(delta['depth'], 1)
+        self.assertEqual(store.db_connection.get_structure(version_guid)['blocks'].keys(), ['problem1'])
+
+        # pylint: disable=W0212
+        store._clear_cache()
+        structure = store._lookup_course(locator)['structure']
+        self.assertEqual(structure['blocks']['problem1']['fields']['display_name'], 'delta')
+        self.assertIn('head12345', structure['blocks'])
+        self.assertNotIn('delta', structure)
+
+        self.assertEqual(store.compact_structures(locator), 1)
+        self.assertIsNone(store.db_connection.get_structure_delta(version_guid))
+        self.assertEqual(store.db_connection.get_structure(version_guid)['blocks'], structure['blocks'])
+
     def test_update_metadata(self):
         """
         test updating an items metadata ensuring the definition doesn't version but the course does if it should
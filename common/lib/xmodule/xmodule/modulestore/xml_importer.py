@@ -12,7 +12,7 @@ from xblock.fields import Scope, Reference, ReferenceList, ReferenceValueDict
 from xmodule.contentstore.content import StaticContent
 from .inheritance import own_metadata
 from xmodule.errortracker import make_error_tracker
-from .store_utilities import rewrite_nonportable_content_links
+from .store_utilities import rewrite_nonportable_content_links, bulk_write_operations
 import xblock
 
 log = logging.getLogger(__name__)
@@ -288,28 +288,30 @@ def import_from_xml(
                     _namespace_rename, subpath=simport, verbose=verbose
                 )
 
-            # finally loop through all the modules
-            for module in xml_module_store.modules[course_id].itervalues():
-                if module.scope_ids.block_type == 'course':
-                    # we've already saved the course module up at the top
-                    # of the loop so just skip over it in the inner loop
-                    continue
+            # finally loop through all the modules, buffering the writes on stores
+            # which can send them in batches
+            with bulk_write_operations(store, target_location_namespace or course_location):
+                for module in xml_module_store.modules[course_id].itervalues():
+                    if module.scope_ids.block_type == 'course':
+                        # we've already saved the course module up at the top
+                        # of the loop so just skip over it in the inner loop
+                        continue
 
-                # remap module to the new namespace
-                if target_location_namespace is not None:
-                    module = remap_namespace(module, target_location_namespace)
+                    # remap module to the new namespace
+                    if target_location_namespace is not None:
+                        module = remap_namespace(module, target_location_namespace)
 
-                if verbose:
-                    log.debug('importing module location {loc}'.format(
-                        loc=module.location
-                    ))
+                    if verbose:
+                        log.debug('importing module location {loc}'.format(
+                            loc=module.location
+                        ))
 
-                import_module(
-                    module, store, course_data_path, static_content_store,
-                    course_location,
-                    target_location_namespace if target_location_namespace else course_location,
-                    do_import_static=do_import_static
-                )
+                    import_module(
+                        module, store, course_data_path, static_content_store,
+                        course_location,
+                        target_location_namespace if target_location_namespace else course_location,
+                        do_import_static=do_import_static
+                    )
 
             # now import any 'draft' items
             if draft_store is not None:
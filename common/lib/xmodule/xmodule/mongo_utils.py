@@ -0,0 +1,48 @@
+"""
+Common MongoDB connection functions.
+"""
+import pymongo
+from pymongo.read_preferences import ReadPreference
+
+
+def get_read_preference(read_preference):
+    """
+    Return the pymongo ReadPreference for read_preference, which is either one
+    already or the name of one (e.g. 'SECONDARY_PREFERRED'), as can be given in
+    json configuration.
+    """
+    if isinstance(read_preference, basestring):
+        try:
+            return getattr(ReadPreference, read_preference.upper())
+        except AttributeError:
+            raise ValueError(u"Unknown MongoDB read preference: {}".format(read_preference))
+    return read_preference
+
+
+def connect_to_mongodb(
+    db, host, port=27017, tz_aware=True, user=None, password=None, read_preference=None, replicaSet=None, **kwargs
+):
+    """
+    Return a pymongo Database for db, connected and authenticated as configured.
+
+    :param read_preference: where to send reads: a pymongo ReadPreference or its name.
+        Defaults to the primary.
+    :param replicaSet: the name of the replica set to connect to.  Reads only go to
+        secondaries when this is given, as then a MongoReplicaSetClient is used, with
+        host listing some of the members of the set as host:port pairs.
+
+    The other kwargs are passed on to the client, e.g. max_pool_size, socketTimeoutMS,
+    connectTimeoutMS, or w.
+    """
+    if read_preference is not None:
+        kwargs['read_preference'] = get_read_preference(read_preference)
+
+    if replicaSet is not None:
+        client = pymongo.MongoReplicaSetClient(host, tz_aware=tz_aware, replicaSet=replicaSet, **kwargs)
+    else:
+        client = pymongo.MongoClient(host=host, port=port, tz_aware=tz_aware, **kwargs)
+
+    database = pymongo.database.Database(client, db)
+    if user is not None and password is not None:
+        database.authenticate(user, password)
+    return database
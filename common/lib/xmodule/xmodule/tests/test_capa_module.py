@@ -11,7 +11,9 @@ import datetime
 import json
 import random
 import os
+import sys
 import textwrap
+import traceback
 import unittest
 
 from mock import Mock, patch
@@ -840,6 +842,28 @@ class CapaModuleTest(unittest.TestCase):
         # Expect that the number of attempts is NOT incremented
         self.assertEqual(module.attempts, 1)
 
+    def test_rescore_problem_unexpected_error(self):
+        module = CapaFactory.create(attempts=1, done=True)
+        module.system.DEBUG = False
+
+        # Unexpected errors are raised with their own traceback
+        with patch('capa.capa_problem.LoncapaProblem.rescore_existing_answers') as mock_rescore:
+            mock_rescore.side_effect = ValueError(u'test error')
+            try:
+                module.rescore_problem()
+            except ValueError:
+                frames = traceback.extract_tb(sys.exc_info()[2])
+            else:
+                self.fail("rescore_problem didn't raise")
+        self.assertNotEqual(frames[-1][2], 'rescore_problem')
+
+        # and in DEBUG mode, they're returned with it
+        module.system.DEBUG = True
+        with patch('capa.capa_problem.LoncapaProblem.rescore_existing_answers') as mock_rescore:
+            mock_rescore.side_effect = ValueError(u'test error')
+            result = module.rescore_problem()
+        self.assertTrue(result['success'].startswith(u'Error checking problem: test error\nTraceback:\n'))
+
     def test_rescore_problem_student_input_error(self):
         self._rescore_problem_error_helper(StudentInputError)
 
@@ -1190,6 +1214,48 @@ class CapaModuleTest(unittest.TestCase):
         # Assert that the encapsulated html contains the original html
         self.assertTrue(html in html_encapsulated)
 
+    def test_get_problem_html_cached(self):
+        module = CapaFactory.create()
+        cache = {}
+        module.system.set('problem_html_cache', Mock(
+            get=cache.get,
+            set=lambda key, value, timeout: cache.__setitem__(key, value),
+        ))
+
+        with patch('capa.capa_problem.LoncapaProblem.get_html') as mock_html:
+            mock_html.return_value = "<div>Test Problem HTML</div>"
+
+            html = module.get_problem_html()
+            self.assertEqual(module.get_problem_html(), html)
+            self.assertEqual(mock_html.call_count, 1)
+            self.assertEqual(len(cache), 1)
+
+            # A change to the student's state renders the problem again
+            module.lcp.student_answers = {'1_2_1': 'changed'}
+            module.get_problem_html()
+            self.assertEqual(mock_html.call_count, 2)
+
+            # So does a change to anything else shown with the problem
+            module.attempts += 1
+            module.get_problem_html()
+            self.assertEqual(mock_html.call_count, 3)
+            self.assertEqual(len(cache), 3)
+
+            # And a new release
+            module.system.set('problem_html_cache_version', 'new release')
+            module.get_problem_html()
+            self.assertEqual(mock_html.call_count, 4)
+            self.assertEqual(len(cache), 4)
+
+            # Or other urls for the course's static assets
+            module.system.set('problem_html_static_urls', {'static_asset_path': 'other_assets'})
+            module.get_problem_html()
+            self.assertEqual(mock_html.call_count, 5)
+            module.system.STATIC_URL = '/other_static/'
+            module.get_problem_html()
+            self.assertEqual(mock_html.call_count, 6)
+            self.assertEqual(len(cache), 6)
+
     def test_input_state_consistency(self):
         module1 = CapaFactory.create()
         module2 = CapaFactory.create()
@@ -0,0 +1,42 @@
+"""
+Tests for the MongoDB connection functions.
+"""
+import mock
+import unittest
+
+from pymongo.read_preferences import ReadPreference
+
+from xmodule.mongo_utils import connect_to_mongodb, get_read_preference
+
+
+class TestConnectToMongodb(unittest.TestCase):
+    """
+    Test `connect_to_mongodb` and `get_read_preference`.
+    """
+
+    def test_read_preference_names(self):
+        self.assertEqual(get_read_preference('SECONDARY_PREFERRED'), ReadPreference.SECONDARY_PREFERRED)
+        self.assertEqual(get_read_preference('primary'), ReadPreference.PRIMARY)
+        self.assertEqual(get_read_preference(ReadPreference.NEAREST), ReadPreference.NEAREST)
+        with self.assertRaises(ValueError):
+            get_read_preference('SOMEWHERE')
+
+    @mock.patch('xmodule.mongo_utils.pymongo')
+    def test_client_options(self, mock_pymongo):
+        connect_to_mongodb('db', 'localhost', read_preference='SECONDARY_PREFERRED', max_pool_size=20)
+        mock_pymongo.MongoClient.assert_called_once_with(
+            host='localhost', port=27017, tz_aware=True,
+            read_preference=ReadPreference.SECONDARY_PREFERRED, max_pool_size=20,
+        )
+        self.assertFalse(mock_pymongo.MongoReplicaSetClient.called)
+
+    @mock.patch('xmodule.mongo_utils.pymongo')
+    def test_replica_set(self, mock_pymongo):
+        database = connect_to_mongodb(
+            'db', 'mongo1:27017,mongo2:27017', replicaSet='rs0', user='user', password='password'
+        )
+        mock_pymongo.MongoReplicaSetClient.assert_called_once_with(
+            'mongo1:27017,mongo2:27017', tz_aware=True, replicaSet='rs0'
+        )
+        self.assertFalse(mock_pymongo.MongoClient.called)
+        database.authenticate.assert_called_once_with('user', 'password')
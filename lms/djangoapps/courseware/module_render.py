@@ -317,27 +317,7 @@ def get_module_system_for_user(user, field_data_cache,
         )
 
         student_module = field_data_cache.find_or_create(key)
-        # Update the grades
-        student_module.grade = event.get('value')
-        student_module.max_grade = event.get('max_value')
-        # Save all changes to the underlying KeyValueStore
-        student_module.save()
-
-        # Bin score into range and increment stats
-        score_bucket = get_score_bucket(student_module.grade, student_module.max_grade)
-        course_id_dict = Location.parse_course_id(course_id)
-
-        tags = [
-            u"org:{org}".format(**course_id_dict),
-            u"course:{course}".format(**course_id_dict),
-            u"run:{name}".format(**course_id_dict),
-            u"score_bucket:{0}".format(score_bucket)
-        ]
-
-        if grade_bucket_type is not None:
-            tags.append('type:%s' % grade_bucket_type)
-
-        dog_stats_api.increment("lms.courseware.question_answered", tags=tags)
+        save_grade(student_module, course_id, event.get('value'), event.get('max_value'), grade_bucket_type)
 
     def publish(block, event_type, event):
         """A function that allows XModules to publish events."""
@@ -502,6 +482,16 @@ def get_module_system_for_user(user, field_data_cache,
 
     system.set(u'user_is_staff', has_access(user, descriptor.location, u'staff', course_id))
 
+    if settings.FEATURES.get('ENABLE_PROBLEM_HTML_CACHE'):
+        # let capa problems keep their rendered html until the student's state changes
+        system.set('problem_html_cache', cache)
+        system.set('problem_html_cache_version', settings.PROBLEM_HTML_CACHE_VERSION)
+        # where the urls of the course's static assets point to
+        system.set('problem_html_static_urls', {
+            'data_directory': getattr(descriptor, 'data_dir', None),
+            'static_asset_path': static_asset_path or descriptor.static_asset_path,
+        })
+
     # make an ErrorDescriptor -- assuming that the descriptor's system is ok
     if has_access(user, descriptor.location, 'staff', course_id):
         system.error_descriptor_class = ErrorDescriptor
@@ -719,6 +709,34 @@ def _invoke_xblock_handler(request, course_id, usage_id, handler, suffix, user):
     return webob_to_django_response(resp)
 
 
+def save_grade(student_module, course_id, grade, max_grade, grade_bucket_type=None):
+    """
+    Saves the `grade` out of `max_grade` an XModule published for `student_module`,
+    and counts the answer in the stats, tagged with `grade_bucket_type` if given.
+    """
+    # Update the grades
+    student_module.grade = grade
+    student_module.max_grade = max_grade
+    # Save all changes to the underlying KeyValueStore
+    student_module.save()
+
+    # Bin score into range and increment stats
+    score_bucket = get_score_bucket(student_module.grade, student_module.max_grade)
+    course_id_dict = Location.parse_course_id(course_id)
+
+    tags = [
+        u"org:{org}".format(**course_id_dict),
+        u"course:{course}".format(**course_id_dict),
+        u"run:{name}".format(**course_id_dict),
+        u"score_bucket:{0}".format(score_bucket)
+    ]
+
+    if grade_bucket_type is not None:
+        tags.append('type:%s' % grade_bucket_type)
+
+    dog_stats_api.increment("lms.courseware.question_answered", tags=tags)
+
+
 def get_score_bucket(grade, max_grade):
     """
     Function to split arbitrary score ranges into 3 buckets.
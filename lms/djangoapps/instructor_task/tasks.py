@@ -5,6 +5,8 @@ running state of a course.
 At present, these tasks all operate on StudentModule objects in one way or another,
 so they share a visitor architecture.  Each task defines an "update function" that
 takes a module_descriptor, a particular StudentModule object, and xmodule_instance_args.
+Rescoring instead defines a "batch update function" that takes a list of StudentModule
+objects, so that work can be shared between students.
 
 A task may optionally specify a "filter function" that takes a query for StudentModule
 objects, and adds additional filter clauses.
@@ -27,7 +29,8 @@ from instructor_task.tasks_helper import (
     run_main_task,
     BaseInstructorTask,
     perform_module_state_update,
-    rescore_problem_module_state,
+    perform_module_state_batch_update,
+    rescore_problem_module_states,
     reset_attempts_module_state,
     delete_problem_module_state,
     push_grades_to_s3,
@@ -56,13 +59,13 @@ def rescore_problem(entry_id, xmodule_instance_args):
     """
     # Translators: This is a past-tense verb that is inserted into task progress messages as {action}.
     action_name = ugettext_noop('rescored')
-    update_fcn = partial(rescore_problem_module_state, xmodule_instance_args)
+    batch_update_fcn = partial(rescore_problem_module_states, xmodule_instance_args)
 
     def filter_fcn(modules_to_update):
         """Filter that matches problems which are marked as being done"""
         return modules_to_update.filter(state__contains='"done": true')
 
-    visit_fcn = partial(perform_module_state_update, update_fcn, filter_fcn)
+    visit_fcn = partial(perform_module_state_batch_update, batch_update_fcn, filter_fcn)
     return run_main_task(entry_id, visit_fcn, action_name)
 
 
@@ -3,8 +3,10 @@ This file contains tasks that are designed to perform background operations on t
 running state of a course.
 
 """
+import copy
 import json
 import urllib
+from collections import OrderedDict
 from datetime import datetime
 from time import time
 
@@ -16,13 +18,14 @@ from django.db import transaction, reset_queries
 from dogapi import dog_stats_api
 from pytz import UTC
 
+from capa.capa_problem import LoncapaProblem
 from xmodule.modulestore.django import modulestore
 from track.views import task_track
 
 from courseware.grades import iterate_grades_for
 from courseware.models import StudentModule
 from courseware.model_data import FieldDataCache
-from courseware.module_render import get_module_for_descriptor_internal
+from courseware.module_render import get_module_for_descriptor_internal, save_grade
 from instructor_task.models import ReportStore, InstructorTask, PROGRESS
 from student.models import CourseEnrollment
 
@@ -37,6 +40,9 @@ UPDATE_STATUS_SUCCEEDED = 'succeeded'
 UPDATE_STATUS_FAILED = 'failed'
 UPDATE_STATUS_SKIPPED = 'skipped'
 
+# define how many StudentModules are handed at once to batch update functions
+STUDENT_MODULE_BATCH_SIZE = 500
+
 
 class BaseInstructorTask(Task):
     """
@@ -240,6 +246,28 @@ def perform_module_state_update(update_fcn, filter_fcn, _entry_id, course_id, ta
     next level, so that it can set the failure modes and capture the error trace in the InstructorTask and the
     result object.
 
+    """
+    def batch_update_fcn(module_descriptor, modules_to_update):
+        """Applies `update_fcn` to each StudentModule of a batch."""
+        return [update_fcn(module_descriptor, module_to_update) for module_to_update in modules_to_update]
+
+    return perform_module_state_batch_update(
+        batch_update_fcn, filter_fcn, _entry_id, course_id, task_input, action_name, batch_size=1
+    )
+
+
+def perform_module_state_batch_update(batch_update_fcn, filter_fcn, _entry_id, course_id, task_input, action_name,
+                                      batch_size=STUDENT_MODULE_BATCH_SIZE):
+    """
+    Performs generic update by visiting StudentModule instances in batches with the batch_update_fcn provided.
+
+    StudentModule instances are selected as for `perform_module_state_update`, and the return value is
+    the same dict of task results.
+
+    The `batch_update_fcn` is called on lists of up to `batch_size` StudentModules.  It is passed the
+    module_descriptor for the module pointed to by the module_state_key and the list of StudentModules,
+    and returns a list with one update status for each StudentModule, in the same order.  Task progress
+    is updated after each batch.
     """
     # get start time for task:
     start_time = time()
@@ -272,48 +300,49 @@ def perform_module_state_update(update_fcn, filter_fcn, _entry_id, course_id, ta
         modules_to_update = filter_fcn(modules_to_update)
 
     # perform the main loop
-    num_attempted = 0
-    num_succeeded = 0
-    num_skipped = 0
-    num_failed = 0
-    num_total = modules_to_update.count()
-
-    def get_task_progress():
-        """Return a dict containing info about current task"""
-        current_time = time()
-        progress = {'action_name': action_name,
-                    'attempted': num_attempted,
-                    'succeeded': num_succeeded,
-                    'skipped': num_skipped,
-                    'failed': num_failed,
-                    'total': num_total,
-                    'duration_ms': int((current_time - start_time) * 1000),
-                    }
-        return progress
-
-    task_progress = get_task_progress()
-    _get_current_task().update_state(state=PROGRESS, meta=task_progress)
-    for module_to_update in modules_to_update:
-        num_attempted += 1
+    task_progress = {
+        'action_name': action_name,
+        'attempted': 0,
+        'succeeded': 0,
+        'skipped': 0,
+        'failed': 0,
+        'total': modules_to_update.count(),
+        'duration_ms': 0,
+    }
+    status_counts = {
+        UPDATE_STATUS_SUCCEEDED: 'succeeded',
+        UPDATE_STATUS_FAILED: 'failed',
+        UPDATE_STATUS_SKIPPED: 'skipped',
+    }
+
+    def update_batch(batch):
+        """Runs `batch_update_fcn` on a batch of StudentModules, and counts the results."""
         # There is no try here:  if there's an error, we let it throw, and the task will
         # be marked as FAILED, with a stack trace.
         with dog_stats_api.timer('instructor_tasks.module.time.step', tags=['action:{name}'.format(name=action_name)]):
-            update_status = update_fcn(module_descriptor, module_to_update)
-            if update_status == UPDATE_STATUS_SUCCEEDED:
-                # If the update_fcn returns true, then it performed some kind of work.
-                # Logging of failures is left to the update_fcn itself.
-                num_succeeded += 1
-            elif update_status == UPDATE_STATUS_FAILED:
-                num_failed += 1
-            elif update_status == UPDATE_STATUS_SKIPPED:
-                num_skipped += 1
-            else:
-                raise UpdateProblemModuleStateError("Unexpected update_status returned: {}".format(update_status))
+            update_statuses = batch_update_fcn(module_descriptor, batch)
+            for update_status in update_statuses:
+                task_progress['attempted'] += 1
+                # Logging of failures is left to the update function itself.
+                if update_status not in status_counts:
+                    raise UpdateProblemModuleStateError("Unexpected update_status returned: {}".format(update_status))
+                task_progress[status_counts[update_status]] += 1
 
         # update task status:
-        task_progress = get_task_progress()
-        _get_current_task().update_state(state=PROGRESS, meta=task_progress)
+        task_progress['duration_ms'] = int((time() - start_time) * 1000)
+        _get_current_task().update_state(state=PROGRESS, meta=dict(task_progress))
 
+    _get_current_task().update_state(state=PROGRESS, meta=dict(task_progress))
+    batch = []
+    for module_to_update in modules_to_update:
+        batch.append(module_to_update)
+        if len(batch) >= batch_size:
+            update_batch(batch)
+            batch = []
+    if batch:
+        update_batch(batch)
+
+    task_progress['duration_ms'] = int((time() - start_time) * 1000)
     return task_progress
 
 
@@ -391,6 +420,91 @@ def rescore_problem_module_state(xmodule_instance_args, module_descriptor, stude
     Returns True if problem was successfully rescored for the given student, and False
     if problem encountered some kind of error in rescoring.
     '''
+    update_status, _instance = _rescore_module_instance(xmodule_instance_args, module_descriptor, student_module)
+    return update_status
+
+
+@transaction.autocommit
+def rescore_problem_module_states(xmodule_instance_args, module_descriptor, student_modules):
+    '''
+    Takes an XModule descriptor and a list of corresponding StudentModule objects, and
+    performs rescoring on each student's problem submission.
+
+    Building a problem parses its XML and runs its scripts, but only depends on the
+    random seed, so the StudentModules are grouped by the seed stored in their state.
+    The first student of each group is rescored with a full module instance, exactly as
+    by `rescore_problem_module_state`.  The LoncapaProblem of that instance then rescores
+    the stored answers of all the other students in the group at once, and their new
+    states and grades are saved in a single transaction, through `save_grade` as the
+    grades their own instances would publish.
+
+    Throws the same exceptions as `rescore_problem_module_state`.
+
+    Returns a list of update statuses, one for each of the `student_modules`, in order.
+    '''
+    update_statuses = {}
+    modules_by_seed = OrderedDict()
+    for student_module in student_modules:
+        state = json.loads(student_module.state) if student_module.state else {}
+        modules_by_seed.setdefault(state.get('seed'), []).append((student_module, state))
+
+    for seed, modules in modules_by_seed.iteritems():
+        instance = None
+        shared_modules = []
+        for student_module, state in modules:
+            if instance is not None and _can_rescore_with_instance(instance, seed, state):
+                shared_modules.append((student_module, state))
+            else:
+                update_statuses[student_module.id], new_instance = _rescore_module_instance(
+                    xmodule_instance_args, module_descriptor, student_module
+                )
+                instance = instance or new_instance
+
+        if not shared_modules:
+            continue
+
+        # grade all the shared answers at once, so that check functions are run
+        # against all of them in a single sandboxed execution:
+        results = instance.lcp.rescore_states([state for _student_module, state in shared_modules])
+        rescored = []
+        fatal_error = None
+        for (student_module, state), result in zip(shared_modules, results):
+            update_status, events = _rescore_with_instance(instance, student_module, state, result)
+            rescored.append((student_module, update_status, events, instance.lcp.get_score()))
+            if update_status is None:
+                # as fatal as it is to rescore_problem_module_state: the students
+                # after this one aren't rescored
+                fatal_error = result
+                break
+            update_statuses[student_module.id] = update_status
+
+        # write back the new states and grades of the group in bulk, and only then
+        # track the rescoring:
+        with transaction.commit_on_success():
+            for student_module, update_status, _events, score in rescored:
+                if update_status == UPDATE_STATUS_SUCCEEDED:
+                    save_grade(student_module, student_module.course_id, score['score'], score['total'],
+                               grade_bucket_type='rescore')
+        for student_module, _update_status, events, _score in rescored:
+            track_function = _get_track_function_for_task(student_module.student, xmodule_instance_args)
+            for event_type, event_info in events:
+                # as the capa module's track_function_unmask does
+                event_unmasked = copy.deepcopy(event_info)
+                instance.unmask_event(event_unmasked)
+                track_function(event_type, event_unmasked)
+
+        if fatal_error is not None:
+            raise fatal_error[0], fatal_error[1], fatal_error[2]
+
+    return [update_statuses[student_module.id] for student_module in student_modules]
+
+
+def _rescore_module_instance(xmodule_instance_args, module_descriptor, student_module):
+    """
+    Rescores `student_module` with a new XModule instance.
+
+    Returns a tuple of the update status and the instance used for rescoring.
+    """
     # unpack the StudentModule:
     course_id = student_module.course_id
     student = student_module.student
@@ -413,6 +527,63 @@ def rescore_problem_module_state(xmodule_instance_args, module_descriptor, stude
 
     result = instance.rescore_problem()
     instance.save()
+    return _get_rescore_update_status(result, student_module), instance
+
+
+def _can_rescore_with_instance(instance, seed, state):
+    """
+    Checks whether the problem of an already rescored `instance` can also rescore `state`.
+
+    That requires a capa problem built with the same seed, and a state whose answers
+    can be rescored.  Anything else is left to a new module instance, which reports
+    the problem in the usual way.
+    """
+    lcp = getattr(instance, 'lcp', None)
+    return (
+        isinstance(lcp, LoncapaProblem) and
+        seed is not None and lcp.seed == seed and
+        state.get('done', False) and
+        # psychometrics are tracked through the runtime of each student's instance
+        not hasattr(instance.runtime, 'psychometrics_handler')
+    )
+
+
+def _rescore_with_instance(instance, student_module, state, result):
+    """
+    Applies the rescoring of the stored `state` of `student_module` with the problem of `instance`.
+
+    `result` is the new CorrectMap for `state`, or the exc_info of the exception raised while
+    grading it, as returned by the problem's `rescore_states`.
+
+    The result is applied by the capa module's `apply_rescore_result`, as by its `rescore_problem`.
+    The new state is set on `student_module` without saving it.  The new grade, which
+    `rescore_problem` publishes, is the score of the problem of `instance` afterwards.
+
+    Returns a tuple of the update status, or None if the exception should be re-raised, and
+    the list of (event_type, event_info) tracking events to emit once `student_module` is saved.
+    """
+    lcp = instance.lcp
+    lcp.load_state(state)
+    event_info = {'state': lcp.get_state(), 'problem_id': student_module.module_state_key}
+    response, events = instance.apply_rescore_result(
+        event_info, lcp.get_score(), result, attempts=state.get('attempts', 0)
+    )
+    if response is None:
+        return None, events
+
+    if not isinstance(result, tuple):
+        state.update(lcp.get_state())
+        student_module.state = json.dumps(state)
+    return _get_rescore_update_status(response, student_module), events
+
+
+def _get_rescore_update_status(result, student_module):
+    """
+    Converts the `result` of rescoring `student_module` into an update status, and logs it.
+    """
+    course_id = student_module.course_id
+    student = student_module.student
+    module_state_key = student_module.module_state_key
     if 'success' not in result:
         # don't consider these fatal, but false means that the individual call didn't complete:
         TASK_LOG.warning(u"error processing rescore call for course {course}, problem {loc} and student {student}: "
@@ -12,14 +12,16 @@ from mock import Mock, MagicMock, patch
 
 from celery.states import SUCCESS, FAILURE
 
+from xmodule.modulestore import Location
 from xmodule.modulestore.exceptions import ItemNotFoundError
 
 from courseware.models import StudentModule
+from courseware.module_render import get_module_for_descriptor_internal
 from courseware.tests.factories import StudentModuleFactory
 from student.tests.factories import UserFactory, CourseEnrollmentFactory
 
 from instructor_task.models import InstructorTask
-from instructor_task.tests.test_base import InstructorTaskModuleTestCase
+from instructor_task.tests.test_base import InstructorTaskModuleTestCase, OPTION_1, OPTION_2
 from instructor_task.tests.factories import InstructorTaskFactory
 from instructor_task.tasks import rescore_problem, reset_problem_attempts, delete_problem_state
 from instructor_task.tasks_helper import UpdateProblemModuleStateError
@@ -297,6 +299,66 @@ class TestRescoreInstructorTask(TestInstructorTasks):
         self.assertEquals(output.get('action_name'), 'rescored')
         self.assertGreater(output.get('duration_ms'), 0)
 
+    def test_rescoring_shares_problem_per_seed(self):
+        # Students sharing a seed should be rescored with a single module instance.
+        students = self._create_students_with_state(5)
+        answer_ids = ['{0}_{1}_1'.format(Location(self.problem_url).html_id(), num) for num in (2, 3)]
+        for num, student in enumerate(students):
+            answer = OPTION_1 if num % 2 == 0 else OPTION_2
+            state = {
+                'done': True,
+                'attempts': 1,
+                'seed': 1 if num < 3 else 2,
+                'student_answers': {answer_id: answer for answer_id in answer_ids},
+            }
+            StudentModule.objects.filter(student=student).update(state=json.dumps(state))
+
+        # the rescoring is tracked once the new grade is saved
+        tracked = []
+
+        def track(_request_info, task_info, event_type, event, page=None):  # pylint: disable=unused-argument
+            """Records the tracked rescoring, with the grade saved when it's tracked."""
+            if event_type == 'problem_rescore':
+                module = StudentModule.objects.get(student__username=task_info['student'],
+                                                   module_state_key=self.problem_url)
+                tracked.append((task_info['student'], event['new_score'], module.grade))
+
+        task_entry = self._create_input_entry()
+        with patch('instructor_task.tasks_helper.get_module_for_descriptor_internal',
+                   wraps=get_module_for_descriptor_internal) as mock_get_module:
+            with patch('instructor_task.tasks_helper.task_track', side_effect=track):
+                with patch('courseware.module_render.dog_stats_api.increment') as mock_increment:
+                    self._run_task_with_mock_celery(rescore_problem, task_entry.id, task_entry.task_id)
+        self.assertEquals(mock_get_module.call_count, 2)
+        # every student's grade is counted in the stats, as when it's published
+        answered = [call for call in mock_increment.call_args_list if call[0][0] == "lms.courseware.question_answered"]
+        self.assertEquals(len(answered), len(students))
+        for call in answered:
+            self.assertIn('type:rescore', call[1]['tags'])
+        self.assertEquals(sorted(username for username, _, _ in tracked),
+                          sorted(student.username for student in students))
+        for _username, new_score, saved_grade in tracked:
+            self.assertEquals(new_score, saved_grade)
+
+        # check return value
+        entry = InstructorTask.objects.get(id=task_entry.id)
+        output = json.loads(entry.task_output)
+        self.assertEquals(output.get('attempted'), len(students))
+        self.assertEquals(output.get('succeeded'), len(students))
+
+        # check the stored grades and states
+        for num, student in enumerate(students):
+            module = StudentModule.objects.get(course_id=self.course.id,
+                                               student=student,
+                                               module_state_key=self.problem_url)
+            expected_correctness = 'correct' if num % 2 == 0 else 'incorrect'
+            self.assertEquals(module.grade, 2 if num % 2 == 0 else 0)
+            self.assertEquals(module.max_grade, 2)
+            state = json.loads(module.state)
+            self.assertEquals(state['attempts'], 1)
+            for answer_id in answer_ids:
+                self.assertEquals(state['correct_map'][answer_id]['correctness'], expected_correctness)
+
 
 class TestResetAttemptsInstructorTask(TestInstructorTasks):
     """Tests instructor task that resets problem attempts."""
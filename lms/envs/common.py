@@ -30,6 +30,7 @@ import imp
 import json
 
 from path import path
+from dealer.git import git
 
 from .discussionsettings import *
 
@@ -88,6 +89,9 @@ FEATURES = {
 
     'ENABLE_PSYCHOMETRICS': False,  # real-time psychometrics (eg item response theory analysis in instructor dashboard)
 
+    # Cache the rendered html of capa problems, keyed by the student's state
+    'ENABLE_PROBLEM_HTML_CACHE': False,
+
     'ENABLE_DJANGO_ADMIN_SITE': True,  # set true to enable django's admin site, even on prod (e.g. for course ops)
     'ENABLE_SQL_TRACKING_LOGS': False,
     'ENABLE_LMS_MIGRATION': False,
@@ -466,6 +470,10 @@ DOC_STORE_CONFIG = {
     'db': 'xmodule',
     'collection': 'modulestore',
 }
+# The read preference of the modulestores and contentstore, unless their DOC_STORE_CONFIG
+# gives one (see xmodule.mongo_utils.connect_to_mongodb). The LMS only reads course content,
+# so it can read from secondaries, which needs a replicaSet in DOC_STORE_CONFIG.
+DOC_STORE_READ_PREFERENCE = 'SECONDARY_PREFERRED'
 
 ############# XBlock Configuration ##########
 
@@ -506,6 +514,12 @@ CODE_JAIL = {
 #   ]
 COURSES_WITH_UNSAFE_CODE = []
 
+########################### Problem html cache ################################
+
+# Part of the keys of the cached capa problem html (see ENABLE_PROBLEM_HTML_CACHE),
+# so that each release renders its own
+PROBLEM_HTML_CACHE_VERSION = git.revision
+
 ############################### DJANGO BUILT-INS ###############################
 # Change DEBUG/TEMPLATE_DEBUG in your environment settings files, not here
 DEBUG = False